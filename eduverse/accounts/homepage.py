@@ -0,0 +1,45 @@
+# accounts/homepage.py
+from django.conf import settings
+from django.core.cache import cache
+from courses.models import Course
+from live.models import LiveClass
+
+FEATURED_CACHE_KEY = 'homepage:featured'
+
+
+def chunk(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def build_featured_carousels():
+    """
+    Loads the capped featured lists and groups them into slides of 3.
+    Only the first HOMEPAGE_CAROUSEL_SIZE rows of each table are read.
+    """
+    limit = getattr(settings, 'HOMEPAGE_CAROUSEL_SIZE', 12)
+    chunk_size = 3
+    courses = list(
+        Course.objects.select_related('instructor').order_by(
+            '-rating_avg',  # Highest ratings first, unrated ones (0) last
+            '-created_at'  # Newest courses first among unrated ones
+        )[:limit]
+    )
+    live_classes = list(
+        LiveClass.objects.select_related('instructor').order_by('-created_at')[:limit]
+    )
+    return {
+        'chunked_courses': chunk(courses, chunk_size),
+        'chunked_live_classes': chunk(live_classes, chunk_size),
+    }
+
+
+def get_featured_carousels():
+    featured = cache.get(FEATURED_CACHE_KEY)
+    if featured is None:
+        featured = build_featured_carousels()
+        cache.set(FEATURED_CACHE_KEY, featured, getattr(settings, 'HOMEPAGE_CACHE_TIMEOUT', 60 * 15))
+    return featured
+
+
+def invalidate_featured_carousels():
+    cache.delete(FEATURED_CACHE_KEY)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:22
+
+import mediastore.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_profile_phone_number'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='image',
+            field=models.ImageField(default='default.jpg', storage=mediastore.storage.get_blob_storage, upload_to='profile_pics'),
+        ),
+    ]
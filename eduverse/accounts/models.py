@@ -1,12 +1,16 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from mediastore.storage import get_blob_storage
+from courses.models import Course, Review
+from live.models import LiveClass
+from .homepage import invalidate_featured_carousels
 # Create your models here.
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    image = models.ImageField(default='default.jpg', upload_to='profile_pics')
+    image = models.ImageField(default='default.jpg', upload_to='profile_pics', storage=get_blob_storage)
     bio = models.TextField(max_length=500, blank=True)
     location = models.CharField(max_length=30, blank=True)
     birth_date = models.DateField(null=True, blank=True)
@@ -22,4 +26,14 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+    instance.profile.save()
+
+# Any change to the featured catalog (or its ratings) drops the cached homepage carousels
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=LiveClass)
+@receiver(post_delete, sender=LiveClass)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def clear_homepage_cache(sender, **kwargs):
+    invalidate_featured_carousels()
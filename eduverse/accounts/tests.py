@@ -1,3 +1,36 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from courses.tests import QueryBudgetMixin, make_teacher, make_users, seed_courses, seed_reviews
+from live.tests import seed_live_classes
+from search.backends import get_backend
+from courses.models import Course
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid')
+class HomeViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        teacher = make_teacher('teacher')
+        courses = seed_courses(teacher, 200)
+        seed_live_classes(teacher, 200)
+        reviewers = make_users('reviewer', 20)
+        for course in courses[:20]:
+            seed_reviews(course, reviewers)
+        get_backend().rebuild(Course)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_homepage_cold_cache(self):
+        self.assertWithinBudget(reverse('home'), max_queries=2)
+
+    def test_homepage_warm_cache(self):
+        self.client.get(reverse('home'))
+        self.assertWithinBudget(reverse('home'), max_queries=0)
+
+    def test_homepage_search(self):
+        response = self.assertWithinBudget(reverse('home') + '?q=course', max_queries=2)
+        self.assertEqual(len(response.context['courses']), 100)
@@ -8,14 +8,17 @@ from django.http import HttpResponseForbidden
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
 from courses.models import Course
-from django.db.models import Q, Avg, F
+from django.db.models import Q
 from live.models import LiveClass
+from search.backends import get_backend
+from .homepage import get_featured_carousels
 
 # Create your views here.
 def home_view(request):
     """
     Handles both the default homepage and search results.
-    For the homepage, it shows the top 5 rated courses, or the 5 latest if none have ratings.
+    For the homepage, it shows the top rated courses (newest first among unrated ones)
+    and the latest live classes.
     """
     query = request.GET.get('q', '')
     context = {'query': query}
@@ -23,50 +26,16 @@ def home_view(request):
     if query:
         # --- IF A SEARCH IS PERFORMED ---
         # Only fetch search results and set the search flag to True.
-        search_results = Course.objects.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        )
+        # Results come back from the search index ordered by relevance.
+        search_results = get_backend().rank(Course.objects.select_related('instructor'), query)
         context['courses'] = search_results
         context['is_search'] = True # This is the crucial flag for the template
     else:
-        # --- NEW Featured Courses Logic ---
-        # 1. Primary: Try to get top 5 rated courses
-        top_rated_courses = Course.objects.annotate(
-            average_rating=Avg('reviews__rating')  # Calculate average rating
-        ).filter(
-            average_rating__isnull=False          # Exclude courses with no ratings
-        ).order_by(
-            '-average_rating'                     # Order by the highest rating first
-        )[:5]
-
-        # 2. Fallback: If no courses have ratings, get the 5 latest courses
-        if top_rated_courses.exists():
-            courses_to_display = top_rated_courses
-            all_courses = Course.objects.annotate(
-                average_rating=Avg('reviews__rating')
-            ).order_by(
-                F('average_rating').desc(nulls_last=True),  # Highest ratings first, unrated ones last
-                '-created_at'  # Newest courses first among unrated ones
-            )
-
-            # 2. Chunk the sorted list into groups of 3 for the carousel
-            chunk_size = 3
-            courses_to_display = list(all_courses)
-            chunked_courses = [courses_to_display[i:i + chunk_size] for i in
-                               range(0, len(courses_to_display), chunk_size)]
-
-            context['chunked_courses'] = chunked_courses
-            context['is_search'] = False
-
-
-            all_live_classes = LiveClass.objects.all().order_by('-created_at')
-            # Chunk them into groups of 3 for the carousel
-            live_classes_list = list(all_live_classes)
-            chunked_live_classes = [live_classes_list[i:i + chunk_size] for i in
-                                    range(0, len(live_classes_list), chunk_size)]
-
-            # Add the chunked live classes to the context
-            context['chunked_live_classes'] = chunked_live_classes
+        # --- Featured Courses & Live Classes ---
+        # Both carousels are capped at HOMEPAGE_CAROUSEL_SIZE and served from the cache;
+        # catalog and review signals clear the entry whenever something changes.
+        context.update(get_featured_carousels())
+        context['is_search'] = False
 
     return render(request, 'home.html', context)
 
@@ -0,0 +1,109 @@
+# assets/middleware.py
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.views.static import was_modified_since
+
+from .storage import ENCODINGS
+
+# ManifestStaticFilesStorage inserts a 12-character content hash before the extension
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def accepted_encodings(header):
+    """Encodings the client accepts, ignoring the ones it turned off with q=0."""
+    accepted = set()
+    for part in header.split(','):
+        encoding, _, params = part.partition(';')
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+class StaticAssetMiddleware:
+    """
+    Serves STATIC_ROOT itself, so production doesn't depend on a front
+    server being configured for it. Hashed files (everything {% static %}
+    links to once collectstatic has run) are sent as immutable for a year,
+    so browsers stop asking for them; the rest get STATIC_CACHE_MAX_AGE.
+    The precompressed .br/.gz variant is sent when the client accepts it.
+    With DEBUG on it steps aside, so runserver serves the current source
+    files through the staticfiles finders instead of a stale collection.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = '/' + settings.STATIC_URL.lstrip('/')
+
+    def __call__(self, request):
+        if settings.DEBUG:
+            return self.get_response(request)
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefix):
+            response = self.serve(request, request.path_info[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        if not settings.STATIC_ROOT or not name or name.endswith(('.gz', '.br')):
+            return None
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:  # ../ outside STATIC_ROOT
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        encoding = None
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        for candidate, suffix in ENCODINGS:
+            if candidate in accepted and os.path.isfile(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+
+        # Each encoding is its own representation, so it gets its own ETag
+        etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+        if HASHED_NAME.search(name):
+            cache_control = IMMUTABLE
+        else:
+            cache_control = f"public, max-age={getattr(settings, 'STATIC_CACHE_MAX_AGE', 60)}"
+        if 'If-None-Match' in request.headers:
+            not_modified = etag in request.headers['If-None-Match']
+        else:
+            not_modified = not was_modified_since(request.headers.get('If-Modified-Since'), stat.st_mtime)
+        if not_modified:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            response['Cache-Control'] = cache_control
+            patch_vary_headers(response, ['Accept-Encoding'])
+            return response
+
+        content_type, _ = mimetypes.guess_type(name)
+        response = FileResponse(open(path, 'rb'), content_type=content_type or 'application/octet-stream',
+                                filename=os.path.basename(name))
+        response['Last-Modified'] = formatdate(stat.st_mtime, usegmt=True)
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
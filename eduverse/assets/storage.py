@@ -0,0 +1,83 @@
+# assets/storage.py
+import gzip
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # optional; without it only .gz variants are built
+    brotli = None
+
+# Text formats worth compressing. Images and fonts are already compressed.
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico'}
+
+# Encodings in order of preference: (Content-Encoding, file suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def available_encodings():
+    return [(encoding, suffix) for encoding, suffix in ENCODINGS if encoding != 'br' or brotli is not None]
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    # mtime=0 keeps the output identical between builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage (content-hashed names like custom.3f2a9c1b4d5e.css) that
+    also writes a .gz - and a .br when brotli is installed - next to every
+    compressible file at collectstatic time. assets.middleware serves them.
+
+    Until collectstatic has run (runserver, tests) {% static %} falls back
+    to the plain name instead of raising.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        # Files that reference others (CSS) are yielded more than once; keep the final name
+        hashed = {}
+        for name, hashed_name, processed in super().post_process(paths, dry_run=dry_run, **options):
+            if isinstance(processed, Exception):
+                yield name, hashed_name, processed
+                continue
+            hashed[name] = hashed_name
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name, hashed_name in hashed.items():
+            for target in {name, hashed_name}:
+                self.compress_file(target)
+
+    def compress_file(self, name):
+        """Writes the compressed variants of one file. Returns whether any was kept."""
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+            return False
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < getattr(settings, 'STATIC_COMPRESS_MIN_SIZE', 256):
+            return False
+        kept = False
+        for encoding, suffix in available_encodings():
+            compressed = compress(data, encoding)
+            target = self.path(name + suffix)
+            # Not worth a second request-time branch for a few saved bytes
+            if len(compressed) >= len(data) * 0.95:
+                if os.path.exists(target):
+                    os.remove(target)
+                continue
+            with open(target, 'wb') as out:
+                out.write(compressed)
+            kept = True
+        return kept
@@ -0,0 +1,85 @@
+import gzip
+import os
+import tempfile
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+
+from .middleware import accepted_encodings
+
+CSS = 'body { background: url("../images/bg.png"); }\n' + '.card { margin: 0 auto; padding: 1rem; }\n' * 40
+
+
+class StaticAssetTests(TestCase):
+
+    def setUp(self):
+        source = tempfile.TemporaryDirectory()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(source.cleanup)
+        self.addCleanup(root.cleanup)
+        os.makedirs(os.path.join(source.name, 'css'))
+        os.makedirs(os.path.join(source.name, 'images'))
+        with open(os.path.join(source.name, 'css', 'custom.css'), 'w') as f:
+            f.write(CSS)
+        with open(os.path.join(source.name, 'images', 'bg.png'), 'wb') as f:
+            f.write(b'\x89PNG' + bytes(1000))
+
+        settings_override = override_settings(
+            STATIC_ROOT=root.name, STATICFILES_DIRS=[source.name],
+            STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'],
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.root = root.name
+
+    def collect(self):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        return staticfiles_storage.stored_name('css/custom.css')
+
+    def test_unhashed_name_before_collectstatic(self):
+        self.assertEqual(staticfiles_storage.stored_name('css/custom.css'), 'css/custom.css')
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        hashed = self.collect()
+        self.assertRegex(hashed, r'^css/custom\.[0-9a-f]{12}\.css$')
+        with gzip.open(os.path.join(self.root, hashed + '.gz')) as f:
+            self.assertIn(b'bg.', f.read())
+        # Images are left alone
+        image = staticfiles_storage.stored_name('images/bg.png')
+        self.assertFalse(os.path.exists(os.path.join(self.root, image + '.gz')))
+        html = Template("{% load static %}{% static 'css/custom.css' %}").render(Context())
+        self.assertEqual(html, f'/static/{hashed}')
+
+    def test_serves_precompressed_hashed_file_as_immutable(self):
+        hashed = self.collect()
+        response = self.client.get(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip, deflate, br;q=0')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)).decode(), open(
+            os.path.join(self.root, hashed)).read())
+
+        revalidated = self.client.get(f'/static/{hashed}', HTTP_ACCEPT_ENCODING='gzip',
+                                      HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_plain_file_and_missing_file(self):
+        self.collect()
+        response = self.client.get('/static/css/custom.css')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(self.client.get('/static/css/missing.css').status_code, 404)
+        self.assertEqual(self.client.get('/static/..%2F..%2Fmanage.py').status_code, 404)
+
+    def test_debug_leaves_static_files_to_runserver(self):
+        self.collect()
+        with override_settings(DEBUG=True):
+            response = self.client.get('/static/css/custom.css')
+        # Not the collected copy: the project's URLconf doesn't serve static files itself
+        self.assertEqual(response.status_code, 404)
+
+    def test_accepted_encodings(self):
+        self.assertEqual(accepted_encodings('gzip;q=0.5, br;q=0, identity'), {'gzip', 'identity'})
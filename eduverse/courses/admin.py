@@ -1,5 +1,6 @@
 # courses/admin.py
 from django.contrib import admin
+from earnings.exports import export_as_csv, export_as_jsonl
 from .models import Course, Module, CourseVideo, TextContent, Enrollment, UserProgress, Review
 
 # Inlines for a better admin experience
@@ -36,4 +37,5 @@ admin.site.register(Review)       # 👈 ADD THIS
 @admin.register(Enrollment)
 class EnrollmentAdmin(admin.ModelAdmin):
     list_display = ('user', 'course', 'amount_paid', 'platform_fee', 'enrolled_at')
-    list_filter = ('enrolled_at', 'course')
\ No newline at end of file
+    list_filter = ('enrolled_at', 'course')
+    actions = [export_as_csv, export_as_jsonl]
\ No newline at end of file
@@ -0,0 +1,101 @@
+# courses/curriculum.py
+import hashlib
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+
+from .models import Module, CourseVideo, TextContent
+
+
+def version_key(course_id):
+    return f'curriculum:{course_id}:version'
+
+
+def snapshot_key(course_id, version):
+    return f'curriculum:{course_id}:v{version}'
+
+
+def get_version(course_id):
+    version = cache.get(version_key(course_id))
+    if version is None:
+        version = 1
+        cache.add(version_key(course_id), version, None)
+    return version
+
+
+def bump_version(course_id):
+    """
+    Invalidates a course's snapshot by moving it to a new version number.
+    A builder that was still working from old data writes under the old
+    key, so it can never overwrite the fresh snapshot.
+    """
+    try:
+        cache.incr(version_key(course_id))
+    except ValueError:
+        cache.set(version_key(course_id), 2, None)
+
+
+def build_curriculum(course_id):
+    """
+    Reads the whole curriculum of a course in one pass (three flat queries)
+    and returns it as plain data:
+
+        {'item_count': 200, 'full_mask': ..., 'layout': 'md5 of the item order',
+         'positions': {(type_id, item_id): bit, ...},
+         'modules': [{'id', 'label', 'title', 'order', 'duration', 'mask', 'required_mask',
+                      'texts': [{'id', 'title', 'type_id', 'bit'}, ...],
+                      'videos': [{'id', 'title', 'type_id', 'duration', 'bit'}, ...]}, ...]}
+    """
+    text_type_id = ContentType.objects.get_for_model(TextContent).pk
+    video_type_id = ContentType.objects.get_for_model(CourseVideo).pk
+
+    modules = []
+    modules_by_id = {}
+    rows = Module.objects.filter(course_id=course_id).values_list('id', 'title', 'order', 'total_duration')
+    for module_id, title, order, total_duration in rows:
+        module = {'id': module_id, 'title': title, 'order': order, 'label': f"{order}. {title}",
+                  'duration': total_duration, 'texts': [], 'videos': []}
+        modules.append(module)
+        modules_by_id[module_id] = module
+
+    texts = TextContent.objects.filter(module__course_id=course_id).values_list('id', 'title', 'module_id')
+    for item_id, title, module_id in texts:
+        modules_by_id[module_id]['texts'].append({'id': item_id, 'title': title, 'type_id': text_type_id})
+    videos = CourseVideo.objects.filter(module__course_id=course_id).values_list('id', 'title', 'module_id', 'duration')
+    for item_id, title, module_id, duration in videos:
+        modules_by_id[module_id]['videos'].append(
+            {'id': item_id, 'title': title, 'type_id': video_type_id, 'duration': duration})
+
+    # Give every item a bit in the course's progress bitset, in display order.
+    # A module is unlocked once every bit of the modules before it is set.
+    positions = {}
+    required_mask = 0
+    for module in modules:
+        module['required_mask'] = required_mask
+        mask = 0
+        for item in module['texts'] + module['videos']:
+            item['bit'] = len(positions)
+            positions[(item['type_id'], item['id'])] = item['bit']
+            mask |= 1 << item['bit']
+        module['mask'] = mask
+        required_mask |= mask
+
+    layout = ','.join(f'{type_id}:{item_id}' for type_id, item_id in positions)
+    return {
+        'item_count': len(positions),
+        'modules': modules,
+        'positions': positions,
+        'full_mask': required_mask,
+        # Changes whenever items are added, removed or reordered, which makes stored bitsets stale
+        'layout': hashlib.md5(layout.encode()).hexdigest(),
+    }
+
+
+def get_curriculum(course_id):
+    key = snapshot_key(course_id, get_version(course_id))
+    curriculum = cache.get(key)
+    if curriculum is None:
+        curriculum = build_curriculum(course_id)
+        cache.set(key, curriculum, getattr(settings, 'CURRICULUM_CACHE_TIMEOUT', 60 * 60 * 24))
+    return curriculum
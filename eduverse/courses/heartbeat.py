@@ -0,0 +1,160 @@
+# courses/heartbeat.py
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+
+from .curriculum import get_curriculum
+from .models import CourseVideo, UserProgress, VideoWatchPosition
+from .progress import record_completion
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatBuffer:
+    """
+    Collects player heartbeats in memory and writes them out in batches.
+
+    Only the latest position per (user, video) is kept, so a viewer who
+    reports every few seconds costs one row write per flush interval, and
+    a flush is a handful of bulk statements however many viewers there are.
+    The buffer is per process, like the LocMemCache it stands in for;
+    each worker flushes its own share, from a timer thread and whenever a
+    heartbeat arrives after the interval is up.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._timer = None
+        self.last_flush = time.monotonic()
+
+    def record(self, user_id, video_id, position, duration):
+        if self._timer is None and getattr(settings, 'HEARTBEAT_FLUSH_THREAD', True):
+            self.start_timer()
+        with self._lock:
+            self._pending[(user_id, video_id)] = (position, duration)
+
+    def __contains__(self, key):
+        return key in self._pending
+
+    def __len__(self):
+        return len(self._pending)
+
+    def flush_due(self):
+        return time.monotonic() - self.last_flush >= getattr(settings, 'HEARTBEAT_FLUSH_INTERVAL', 10)
+
+    def flush(self):
+        """Writes every buffered position and returns how many rows were written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self.last_flush = time.monotonic()
+        if not pending:
+            return 0
+        try:
+            write_positions(pending)
+        except Exception:
+            # Put the batch back (newer heartbeats win) so the next flush retries it
+            with self._lock:
+                for key, value in pending.items():
+                    self._pending.setdefault(key, value)
+            raise
+        return len(pending)
+
+    def flush_if_due(self):
+        """
+        flush() once the interval is up. Errors are logged rather than raised,
+        so a heartbeat request never fails because of someone else's batch;
+        the positions stay buffered for the next try.
+        """
+        if not self.flush_due():
+            return 0
+        try:
+            return self.flush()
+        except Exception:
+            logger.exception("Could not flush %d buffered heartbeats", len(self))
+            return 0
+
+    def start_timer(self):
+        """Flushes every interval from a daemon thread, even if no more heartbeats come in."""
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Thread(target=self._run_timer, name='heartbeat-flush', daemon=True)
+        self._timer.start()
+
+    def _run_timer(self):
+        while True:
+            interval = getattr(settings, 'HEARTBEAT_FLUSH_INTERVAL', 10)
+            time.sleep(max(0.1, interval - (time.monotonic() - self.last_flush)))
+            self.flush_if_due()
+            close_old_connections()
+
+
+heartbeat_buffer = HeartbeatBuffer()
+
+
+@atexit.register
+def flush_on_exit():
+    # A worker shutting down still has up to one interval of positions in memory
+    try:
+        heartbeat_buffer.flush()
+    except Exception:
+        logger.exception("Could not flush buffered heartbeats on exit")
+
+
+def write_positions(pending):
+    """
+    `pending` maps (user_id, video_id) to (position, duration). The player's
+    duration is only used for videos that haven't been probed; otherwise the
+    probed one wins, so a client can't claim a 1-second video to complete it.
+    """
+    batch_size = getattr(settings, 'HEARTBEAT_BATCH_SIZE', 500)
+    probed = dict(CourseVideo.objects.filter(pk__in={video_id for _, video_id in pending}, duration__gt=0)
+                  .values_list('pk', 'duration'))
+    pending = {
+        (user_id, video_id): (min(position, probed.get(video_id, duration)), probed.get(video_id, duration))
+        for (user_id, video_id), (position, duration) in pending.items()
+    }
+    rows = [
+        VideoWatchPosition(user_id=user_id, video_id=video_id, position=position, duration=duration)
+        for (user_id, video_id), (position, duration) in pending.items()
+    ]
+    with transaction.atomic():
+        # One upsert per batch instead of a get_or_create per heartbeat
+        VideoWatchPosition.objects.bulk_create(
+            rows, batch_size=batch_size, update_conflicts=True, unique_fields=['user', 'video'],
+            update_fields=['position', 'duration', 'updated_at'],
+        )
+
+    ratio = getattr(settings, 'HEARTBEAT_COMPLETE_RATIO', 0.9)
+    finished = [key for key, (position, duration) in pending.items() if duration > 0 and position >= duration * ratio]
+    if finished:
+        complete_videos(finished)
+
+
+def complete_videos(pairs):
+    """Marks (user_id, video_id) pairs as complete, the same way the "mark as complete" button does."""
+    video_type_id = ContentType.objects.get_for_model(CourseVideo).pk
+    course_ids = dict(CourseVideo.objects.filter(pk__in={video_id for _, video_id in pairs})
+                      .values_list('pk', 'module__course_id'))
+    already_done = set(UserProgress.objects.filter(
+        content_type_id=video_type_id,
+        object_id__in=course_ids,
+        user_id__in={user_id for user_id, _ in pairs},
+    ).values_list('user_id', 'object_id'))
+    new_pairs = [(user_id, video_id) for user_id, video_id in pairs
+                 if video_id in course_ids and (user_id, video_id) not in already_done]
+    if not new_pairs:
+        return
+    UserProgress.objects.bulk_create([
+        UserProgress(user_id=user_id, course_id=course_ids[video_id], content_type_id=video_type_id, object_id=video_id)
+        for user_id, video_id in new_pairs
+    ], ignore_conflicts=True)
+    for user_id, video_id in new_pairs:
+        course_id = course_ids[video_id]
+        record_completion(user_id, course_id, get_curriculum(course_id), video_type_id, video_id)
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from courses.models import VideoUpload
+from courses.uploads import discard_upload
+
+
+class Command(BaseCommand):
+    help = "Deletes unfinished chunked video uploads (and their parts on disk) that have gone stale."
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=settings.VIDEO_UPLOAD_EXPIRY)
+        stale = VideoUpload.objects.exclude(status=VideoUpload.Status.COMPLETE).filter(updated_at__lt=cutoff)
+        count = 0
+        for upload in stale.iterator():
+            discard_upload(upload)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Removed {count} stale uploads."))
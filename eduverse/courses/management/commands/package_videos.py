@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from courses.models import CourseVideo
+from courses.packaging import ffmpeg_binary, package_video, requeue_stale
+
+
+class Command(BaseCommand):
+    help = "Builds HLS renditions for course videos that don't have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--retry-failed', action='store_true',
+                            help="Also retry videos whose packaging failed before.")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Package at most this many videos.")
+
+    def handle(self, *args, **options):
+        if ffmpeg_binary() is None:
+            raise CommandError("ffmpeg was not found; set FFMPEG_BINARY or install it.")
+        stale = requeue_stale()
+        if stale:
+            self.stdout.write(f"Re-queued {stale} videos whose packaging never finished.")
+        if options['retry_failed']:
+            CourseVideo.objects.filter(hls_status=CourseVideo.HLSStatus.FAILED).update(
+                hls_status=CourseVideo.HLSStatus.PENDING)
+
+        video_ids = CourseVideo.objects.filter(hls_status=CourseVideo.HLSStatus.PENDING) \
+            .order_by('pk').values_list('pk', flat=True)
+        if options['limit']:
+            video_ids = video_ids[:options['limit']]
+
+        results = {}
+        for video_id in list(video_ids):
+            status = package_video(video_id)
+            results[status] = results.get(status, 0) + 1
+            self.stdout.write(f"Video {video_id}: {status or 'taken by another worker'}")
+        ready = results.get(CourseVideo.HLSStatus.READY, 0)
+        failed = results.get(CourseVideo.HLSStatus.FAILED, 0)
+        self.stdout.write(self.style.SUCCESS(f"Packaged {ready} videos, {failed} failed."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from courses.models import CourseVideo
+from courses.probe import probe_video
+
+
+class Command(BaseCommand):
+    help = "Reads the duration, size and resolution of course videos that haven't been probed yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Probe every video again, not just the ones without metadata.")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Probe at most this many videos.")
+
+    def handle(self, *args, **options):
+        videos = CourseVideo.objects.order_by('pk')
+        if not options['all']:
+            videos = videos.filter(size__isnull=True)
+        video_ids = videos.values_list('pk', flat=True)
+        if options['limit']:
+            video_ids = video_ids[:options['limit']]
+
+        probed = unreadable = 0
+        for video_id in list(video_ids):
+            info = probe_video(video_id)
+            if info is None or info['duration'] is None:
+                unreadable += 1
+                self.stdout.write(f"Video {video_id}: duration unknown")
+            else:
+                probed += 1
+        self.stdout.write(self.style.SUCCESS(f"Probed {probed} videos, {unreadable} without a readable duration."))
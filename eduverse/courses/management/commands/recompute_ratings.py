@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from courses.models import Course, recompute_rating_aggregates
+from live.models import LiveClass
+
+
+class Command(BaseCommand):
+    help = "Recomputes the denormalized rating_avg/rating_count of courses and live classes from their reviews."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of rows written per bulk update.")
+
+    def handle(self, *args, **options):
+        for model in (Course, LiveClass):
+            with transaction.atomic():
+                updated = recompute_rating_aggregates(model, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f"Repaired {updated} {model._meta.label} rows."))
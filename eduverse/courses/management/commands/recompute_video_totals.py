@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from courses.models import recompute_video_totals
+
+
+class Command(BaseCommand):
+    help = "Recomputes the total_duration/total_video_size of modules and courses from their videos."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Number of rows written per bulk update.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = recompute_video_totals(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Repaired {updated} module/course rows."))
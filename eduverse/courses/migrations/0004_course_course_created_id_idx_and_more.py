@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0003_alter_userprogress_unique_together_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['created_at', 'id'], name='course_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['category', 'created_at', 'id'], name='course_cat_created_id_idx'),
+        ),
+    ]
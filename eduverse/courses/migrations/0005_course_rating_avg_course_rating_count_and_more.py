@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Review = apps.get_model('courses', 'Review')
+    Course = apps.get_model('courses', 'Course')
+    content_type = ContentType.objects.filter(app_label='courses', model='course').first()
+    if content_type is None:
+        return
+    totals = Review.objects.filter(content_type=content_type).order_by().values('object_id').annotate(
+        avg=models.Avg('rating'), count=models.Count('id')
+    )
+    for row in totals:
+        Course.objects.filter(pk=row['object_id']).update(rating_avg=row['avg'], rating_count=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('courses', '0004_course_course_created_id_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='rating_avg',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(fields=['rating_avg', 'created_at'], name='course_rating_idx'),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0007_videowatchposition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursevideo',
+            name='hls_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='hls_manifest',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='hls_status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:22
+
+import mediastore.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_videoupload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, storage=mediastore.storage.get_blob_storage, upload_to='course_thumbnails/'),
+        ),
+        migrations.AlterField(
+            model_name='coursevideo',
+            name='video_file',
+            field=models.FileField(storage=mediastore.storage.get_blob_storage, upload_to='course_videos/'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_blob_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='total_duration',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='total_video_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='size',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='coursevideo',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='total_duration',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='module',
+            name='total_video_size',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
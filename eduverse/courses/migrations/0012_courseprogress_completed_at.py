@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_video_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='courseprogress',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
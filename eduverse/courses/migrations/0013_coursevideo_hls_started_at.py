@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_courseprogress_completed_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coursevideo',
+            name='hls_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,8 +1,15 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models import Avg, Case, Count, F, FloatField, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.db.models.signals import pre_save, post_init, post_save, post_delete
+from django.dispatch import receiver
 from django.conf import settings
 from django.urls import reverse
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
+from mediastore.storage import get_blob_storage
 
 
 class Course(models.Model):
@@ -21,7 +28,7 @@ class Course(models.Model):
     )
     title = models.CharField(max_length=200)
     description = models.TextField()
-    thumbnail = models.ImageField(upload_to='course_thumbnails/', blank=True, null=True)
+    thumbnail = models.ImageField(upload_to='course_thumbnails/', storage=get_blob_storage, blank=True, null=True)
     price = models.DecimalField(max_digits=8, decimal_places=2)
     category = models.CharField(
         max_length=50,
@@ -31,9 +38,21 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     reviews = GenericRelation('Review')  # Connection to the Review model
+    # Denormalized from Review, kept current by the review signals below
+    rating_avg = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    # Sum of the probed video durations/sizes, kept current by apply_video_totals_change
+    total_duration = models.FloatField(default=0)  # seconds
+    total_video_size = models.PositiveBigIntegerField(default=0)  # bytes
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['rating_avg', 'created_at'], name='course_rating_idx'),
+            # Keyset pagination walks these (created_at, id) ranges
+            models.Index(fields=['created_at', 'id'], name='course_created_id_idx'),
+            models.Index(fields=['category', 'created_at', 'id'], name='course_cat_created_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -47,6 +66,8 @@ class Module(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     order = models.PositiveIntegerField(default=0)
+    total_duration = models.FloatField(default=0)  # seconds, see apply_video_totals_change
+    total_video_size = models.PositiveBigIntegerField(default=0)
 
     class Meta:
         ordering = ['order']
@@ -56,10 +77,26 @@ class Module(models.Model):
 
 
 class CourseVideo(models.Model):
+    class HLSStatus(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        PROCESSING = 'processing', 'Processing'
+        READY = 'ready', 'Ready'
+        FAILED = 'failed', 'Failed'
+
     module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='videos')
     title = models.CharField(max_length=200)
-    video_file = models.FileField(upload_to='course_videos/')
+    video_file = models.FileField(upload_to='course_videos/', storage=get_blob_storage)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Adaptive-bitrate renditions made by courses/packaging.py; the player uses them once READY
+    hls_status = models.CharField(max_length=20, choices=HLSStatus.choices, default=HLSStatus.PENDING, db_index=True)
+    hls_manifest = models.CharField(max_length=255, blank=True)  # master playlist, relative to MEDIA_ROOT
+    hls_error = models.TextField(blank=True)
+    hls_started_at = models.DateTimeField(null=True, blank=True)  # when the current packaging run claimed it
+    # Filled in once by courses/probe.py after upload; None until then
+    duration = models.FloatField(null=True, blank=True)  # seconds
+    size = models.PositiveBigIntegerField(null=True, blank=True)  # bytes
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
 
     class Meta:
         ordering = ['created_at']
@@ -116,6 +153,78 @@ class UserProgress(models.Model):
         unique_together = ('user', 'course', 'content_type', 'object_id')
 
 
+class CourseProgress(models.Model):
+    """
+    Compact copy of a user's UserProgress rows for one course: one bit per
+    content item, in the order of the course's curriculum snapshot.
+    UserProgress stays the source of truth; this row is rebuilt from it
+    whenever the curriculum layout changes.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='course_progress')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='progress_records')
+    completed_bits = models.BinaryField(default=b'')
+    layout = models.CharField(max_length=32, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)  # set once, when every item is done
+
+    class Meta:
+        unique_together = ('user', 'course')
+
+    def __str__(self):
+        return f"{self.user} progress in course {self.course_id}"
+
+    @property
+    def bits(self):
+        return int.from_bytes(bytes(self.completed_bits), 'little')
+
+    @bits.setter
+    def bits(self, value):
+        self.completed_bits = value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+class VideoUpload(models.Model):
+    """
+    A resumable, chunked video upload (see courses/uploads.py). Parts are
+    appended to a file under VIDEO_UPLOAD_TEMP_DIR; once every byte is in
+    and the checksum matches, the file becomes a CourseVideo.
+    """
+    class Status(models.TextChoices):
+        UPLOADING = 'uploading', 'Uploading'
+        COMPLETE = 'complete', 'Complete'
+        FAILED = 'failed', 'Failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    module = models.ForeignKey(Module, on_delete=models.CASCADE, related_name='video_uploads')
+    uploader = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='video_uploads')
+    title = models.CharField(max_length=200)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)  # bytes on disk, i.e. where the next chunk starts
+    sha256 = models.CharField(max_length=64, blank=True)  # expected checksum of the whole file, if the client sent one
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.UPLOADING)
+    video = models.OneToOneField(CourseVideo, on_delete=models.SET_NULL, null=True, blank=True, related_name='upload')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size} bytes)"
+
+
+class VideoWatchPosition(models.Model):
+    """Last reported playback position of a user in a course video, written in batches by the heartbeat buffer."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='watch_positions')
+    video = models.ForeignKey(CourseVideo, on_delete=models.CASCADE, related_name='watch_positions')
+    position = models.FloatField(default=0)  # seconds
+    duration = models.FloatField(default=0)  # seconds; the probed duration, else as reported by the player
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'video')
+
+    def __str__(self):
+        return f"{self.user} at {self.position:.0f}s of {self.video}"
+
+
 class Review(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
@@ -127,4 +236,198 @@ class Review(models.Model):
 
     class Meta:
         ordering = ['-created_at']
-        unique_together = ('user', 'content_type', 'object_id')
\ No newline at end of file
+        unique_together = ('user', 'content_type', 'object_id')
+
+
+def apply_rating_change(content_type_id, object_id, rating_delta, count_delta):
+    """
+    Folds one review change into the reviewed object's rating_avg/rating_count.
+
+    It is a single UPDATE built from F() expressions, so the read and the
+    write happen atomically in the database even under concurrent reviews.
+    """
+    model_class = ContentType.objects.get_for_id(content_type_id).model_class()
+    if model_class is None or not hasattr(model_class, 'rating_avg'):
+        return
+    new_count = F('rating_count') + count_delta
+    model_class._default_manager.filter(pk=object_id).update(
+        rating_avg=Case(
+            When(rating_count__lte=-count_delta, then=Value(0.0)),
+            default=(F('rating_avg') * F('rating_count') + rating_delta) / new_count,
+            output_field=FloatField(),
+        ),
+        rating_count=Case(
+            When(rating_count__lte=-count_delta, then=Value(0)),
+            default=new_count,
+        ),
+    )
+
+
+def recompute_rating_aggregates(model, batch_size=1000):
+    """
+    Rebuilds rating_avg/rating_count for every row of `model` from its reviews.
+    Only rows whose stored values drifted are written. Returns how many changed.
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    totals = {
+        row['object_id']: (row['avg'], row['count'])
+        for row in Review.objects.filter(content_type=content_type).order_by()
+        .values('object_id').annotate(avg=Avg('rating'), count=Count('id'))
+    }
+    changed = []
+    updated = 0
+    rows = model._default_manager.order_by().only('pk', 'rating_avg', 'rating_count')
+    for obj in rows.iterator(chunk_size=batch_size):
+        avg, count = totals.get(obj.pk, (0.0, 0))
+        if obj.rating_count != count or abs(obj.rating_avg - avg) > 1e-9:
+            obj.rating_avg, obj.rating_count = avg, count
+            changed.append(obj)
+        if len(changed) >= batch_size:
+            model._default_manager.bulk_update(changed, ['rating_avg', 'rating_count'])
+            updated += len(changed)
+            changed = []
+    if changed:
+        model._default_manager.bulk_update(changed, ['rating_avg', 'rating_count'])
+        updated += len(changed)
+    return updated
+
+
+def apply_video_totals_change(module_id, course_id, duration_delta, size_delta):
+    """
+    Adds a video's duration/size change to its module's and course's totals,
+    as F() updates so concurrent uploads and deletes never lose a change.
+    """
+    if not duration_delta and not size_delta:
+        return
+    changes = {
+        'total_duration': Greatest(F('total_duration') + duration_delta, Value(0.0)),
+        'total_video_size': Greatest(F('total_video_size') + size_delta, Value(0)),
+    }
+    Module.objects.filter(pk=module_id).update(**changes)
+    Course.objects.filter(pk=course_id).update(**changes)
+
+
+def recompute_video_totals(batch_size=1000):
+    """
+    Rebuilds every module's and course's total_duration/total_video_size from
+    the probed videos. Only rows that drifted are written. Returns how many changed.
+    """
+    updated = 0
+    for model, video_path in ((Module, 'module_id'), (Course, 'module__course_id')):
+        totals = {
+            row[video_path]: (row['duration'] or 0.0, row['size'] or 0)
+            for row in CourseVideo.objects.order_by().values(video_path)
+            .annotate(duration=Sum('duration'), size=Sum('size'))
+        }
+        changed = []
+        rows = model._default_manager.order_by().only('pk', 'total_duration', 'total_video_size')
+        for obj in rows.iterator(chunk_size=batch_size):
+            duration, size = totals.get(obj.pk, (0.0, 0))
+            if obj.total_video_size != size or abs(obj.total_duration - duration) > 1e-6:
+                obj.total_duration, obj.total_video_size = duration, size
+                changed.append(obj)
+            if len(changed) >= batch_size:
+                model._default_manager.bulk_update(changed, ['total_duration', 'total_video_size'])
+                updated += len(changed)
+                changed = []
+        if changed:
+            model._default_manager.bulk_update(changed, ['total_duration', 'total_video_size'])
+            updated += len(changed)
+    return updated
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, **kwargs):
+    # On edits we need the old rating to adjust the average by the difference
+    instance._previous_rating = None
+    if instance.pk:
+        instance._previous_rating = Review.objects.filter(pk=instance.pk).values_list('rating', flat=True).first()
+
+
+@receiver(post_save, sender=Review)
+def update_rating_on_save(sender, instance, created, **kwargs):
+    previous_rating = getattr(instance, '_previous_rating', None)
+    if created:
+        apply_rating_change(instance.content_type_id, instance.object_id, instance.rating, 1)
+    elif previous_rating is not None and previous_rating != instance.rating:
+        apply_rating_change(instance.content_type_id, instance.object_id, instance.rating - previous_rating, 0)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_delete(sender, instance, **kwargs):
+    apply_rating_change(instance.content_type_id, instance.object_id, -instance.rating, -1)
+
+
+def content_course_id(content):
+    """Course id of a CourseVideo/TextContent, without loading the module when it is already cached."""
+    if type(content).module.is_cached(content):
+        return content.module.course_id
+    return Module.objects.filter(pk=content.module_id).values_list('course_id', flat=True).first()
+
+
+# Curriculum snapshots (see courses/curriculum.py) are dropped whenever their structure changes
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+def invalidate_curriculum_for_module(sender, instance, **kwargs):
+    from .curriculum import bump_version
+    bump_version(instance.course_id)
+
+
+@receiver(post_save, sender=CourseVideo)
+@receiver(post_delete, sender=CourseVideo)
+@receiver(post_save, sender=TextContent)
+@receiver(post_delete, sender=TextContent)
+def invalidate_curriculum_for_content(sender, instance, **kwargs):
+    from .curriculum import bump_version
+    course_id = content_course_id(instance)
+    if course_id is not None:
+        bump_version(course_id)
+
+
+# New uploads and replaced files are queued for HLS packaging once the row is committed
+@receiver(post_save, sender=CourseVideo)
+def queue_hls_packaging(sender, instance, created, **kwargs):
+    from .packaging import enqueue_packaging, remove_renditions
+    previous = None if created else instance._packaged_file
+    replaced = previous is not None and instance.video_file.name != previous
+    instance._packaged_file = instance.video_file.name
+    if replaced:
+        # The old renditions are of the old file; until the new ones are ready the player uses the file itself
+        reset = {'hls_status': CourseVideo.HLSStatus.PENDING, 'hls_manifest': '', 'hls_error': '', 'hls_started_at': None}
+        sender.objects.filter(pk=instance.pk).update(**reset)
+        for field, value in reset.items():
+            setattr(instance, field, value)
+        transaction.on_commit(lambda: remove_renditions(instance.pk))
+    if created or replaced:
+        transaction.on_commit(lambda: enqueue_packaging(instance.pk))
+
+
+@receiver(post_delete, sender=CourseVideo)
+def remove_hls_renditions(sender, instance, **kwargs):
+    from .packaging import remove_renditions
+    transaction.on_commit(lambda: remove_renditions(instance.pk))
+
+
+# Metadata is probed (and HLS packaged, above) once per uploaded file; the module/course totals follow every change
+@receiver(post_init, sender=CourseVideo)
+def remember_video_file(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred video_file isn't loaded just for this
+    value = instance.__dict__.get('video_file')
+    instance._probed_file = instance._packaged_file = getattr(value, 'name', value)
+
+
+@receiver(post_save, sender=CourseVideo)
+def queue_video_probe(sender, instance, created, **kwargs):
+    replaced = instance._probed_file is not None and instance.video_file.name != instance._probed_file
+    instance._probed_file = instance.video_file.name
+    if created or replaced or instance.size is None:
+        from .probe import probe_video
+        transaction.on_commit(lambda: probe_video(instance.pk))
+
+
+@receiver(post_delete, sender=CourseVideo)
+def subtract_video_totals(sender, instance, **kwargs):
+    if instance.size is not None:
+        course_id = content_course_id(instance)
+        if course_id is not None:
+            apply_video_totals_change(instance.module_id, course_id, -(instance.duration or 0), -instance.size)
@@ -0,0 +1,155 @@
+# courses/packaging.py
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import CourseVideo
+from .probe import has_audio
+
+# (name, height, video bitrate, audio bitrate); overridable with settings.HLS_RENDITIONS
+DEFAULT_RENDITIONS = (
+    ('1080p', 1080, '5000k', '128k'),
+    ('720p', 720, '2800k', '128k'),
+    ('480p', 480, '1400k', '96k'),
+    ('360p', 360, '800k', '64k'),
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def renditions():
+    return getattr(settings, 'HLS_RENDITIONS', DEFAULT_RENDITIONS)
+
+
+def ffmpeg_binary():
+    return shutil.which(getattr(settings, 'FFMPEG_BINARY', 'ffmpeg'))
+
+
+def output_name(video_id):
+    """Directory of a video's renditions, relative to MEDIA_ROOT."""
+    return f'course_videos/hls/{video_id}'
+
+
+def output_dir(video_id):
+    return os.path.join(settings.MEDIA_ROOT, output_name(video_id))
+
+
+def ffmpeg_command(binary, source, destination, audio=True):
+    """
+    One ffmpeg run that decodes the source once and encodes every rendition,
+    writing <destination>/<name>.m3u8 + segments per rendition and a master.m3u8.
+    Renditions are never upscaled past the source height. Without `audio`
+    (a silent screen recording) the renditions are video only.
+    """
+    levels = renditions()
+    split = ''.join(f'[v{i}]' for i in range(len(levels)))
+    filters = [f'[0:v]split={len(levels)}{split}']
+    filters += [f'[v{i}]scale=w=-2:h=min(ih\\,{height})[v{i}out]' for i, (_, height, _, _) in enumerate(levels)]
+
+    command = [binary, '-y', '-hide_banner', '-loglevel', 'error', '-i', source,
+               '-filter_complex', ';'.join(filters)]
+    for i, (_, _, video_bitrate, audio_bitrate) in enumerate(levels):
+        command += [
+            '-map', f'[v{i}out]', f'-c:v:{i}', 'libx264', '-preset', 'veryfast',
+            f'-b:v:{i}', video_bitrate, f'-maxrate:v:{i}', video_bitrate, f'-bufsize:v:{i}', video_bitrate,
+        ]
+        if audio:
+            command += ['-map', '0:a:0?', f'-c:a:{i}', 'aac', f'-b:a:{i}', audio_bitrate]
+    segment_seconds = getattr(settings, 'HLS_SEGMENT_SECONDS', 6)
+    command += [
+        # Keyframe at every segment boundary so all renditions switch cleanly
+        '-force_key_frames', f'expr:gte(t,n_forced*{segment_seconds})',
+        '-f', 'hls', '-hls_time', str(segment_seconds), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(destination, '%v_%04d.ts'),
+        '-master_pl_name', 'master.m3u8',
+        '-var_stream_map', ' '.join(f'v:{i},{f"a:{i}," if audio else ""}name:{name}'
+                                    for i, (name, _, _, _) in enumerate(levels)),
+        os.path.join(destination, '%v.m3u8'),
+    ]
+    return command
+
+
+def package_video(video_id):
+    """
+    Builds the HLS renditions of one video. The PENDING -> PROCESSING update
+    is the claim, so two workers never package the same video.
+    Returns the final status, or None if there was nothing to claim or the
+    file was replaced while it ran.
+    """
+    binary = ffmpeg_binary()
+    if binary is None:
+        # Leave it pending; `package_videos` picks it up once ffmpeg is installed
+        return CourseVideo.HLSStatus.PENDING
+
+    claimed = CourseVideo.objects.filter(pk=video_id, hls_status=CourseVideo.HLSStatus.PENDING).update(
+        hls_status=CourseVideo.HLSStatus.PROCESSING, hls_error='', hls_started_at=timezone.now())
+    if not claimed:
+        return None
+
+    video = CourseVideo.objects.get(pk=video_id)
+    processing = CourseVideo.objects.filter(pk=video_id, hls_status=CourseVideo.HLSStatus.PROCESSING)
+    destination = output_dir(video_id)
+    shutil.rmtree(destination, ignore_errors=True)
+    os.makedirs(destination)
+    try:
+        source = video.video_file.path
+        subprocess.run(
+            ffmpeg_command(binary, source, destination, audio=has_audio(source)),
+            check=True, capture_output=True, text=True,
+            timeout=getattr(settings, 'HLS_TIMEOUT', 60 * 60),
+        )
+    except (OSError, subprocess.SubprocessError) as exc:
+        shutil.rmtree(destination, ignore_errors=True)
+        error = getattr(exc, 'stderr', None) or str(exc)
+        status = CourseVideo.HLSStatus.FAILED
+        finished = processing.update(hls_status=status, hls_error=error[-2000:])
+    else:
+        status = CourseVideo.HLSStatus.READY
+        finished = processing.update(hls_status=status, hls_manifest=f'{output_name(video_id)}/master.m3u8')
+    # Not PROCESSING any more: the file was replaced meanwhile and is queued again
+    return status if finished else None
+
+
+def requeue_stale():
+    """
+    Puts videos left PROCESSING by a worker that died (or a deploy that
+    killed it) back to PENDING, once they've been at it longer than any
+    ffmpeg run may take. Returns how many.
+    """
+    stale_after = getattr(settings, 'HLS_STALE_AFTER', 2 * getattr(settings, 'HLS_TIMEOUT', 60 * 60))
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return CourseVideo.objects.filter(hls_status=CourseVideo.HLSStatus.PROCESSING).filter(
+        Q(hls_started_at__lt=cutoff) | Q(hls_started_at__isnull=True),
+    ).update(hls_status=CourseVideo.HLSStatus.PENDING, hls_started_at=None)
+
+
+def _run_in_background(video_id):
+    try:
+        package_video(video_id)
+    finally:
+        close_old_connections()
+
+
+def enqueue_packaging(video_id):
+    """Packages a video on a small background pool so uploads return right away."""
+    global _executor
+    if ffmpeg_binary() is None:
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=getattr(settings, 'HLS_WORKERS', 1),
+                                           thread_name_prefix='hls-packaging')
+    _executor.submit(_run_in_background, video_id)
+
+
+def remove_renditions(video_id):
+    shutil.rmtree(output_dir(video_id), ignore_errors=True)
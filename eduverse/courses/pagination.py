@@ -0,0 +1,130 @@
+# courses/pagination.py
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields, model):
+    """Turns a cursor string back into python values for the ordering fields."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(raw_values, list) or len(raw_values) != len(fields):
+        raise InvalidCursor(cursor)
+    try:
+        return [model._meta.get_field(field).to_python(value) for field, value in zip(fields, raw_values)]
+    except Exception:
+        raise InvalidCursor(cursor)
+
+
+def keyset_condition(fields, values, descending, forward):
+    """
+    Builds the WHERE clause that selects rows strictly after (or before)
+    `values` in the (field1, field2, ...) ordering, e.g. for two fields:
+    a < a0 OR (a = a0 AND b < b0).
+    """
+    lookup = 'lt' if descending == forward else 'gt'
+    condition = Q()
+    for i, field in enumerate(fields):
+        step = Q(**{f'{field}__{lookup}': values[i]})
+        for previous_field, previous_value in zip(fields[:i], values[:i]):
+            step &= Q(**{previous_field: previous_value})
+        condition |= step
+    return condition
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, fields, request):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.fields = fields
+        self.request = request
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _cursor_for(self, obj):
+        values = []
+        for field in self.fields:
+            value = getattr(obj, field)
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return encode_cursor(values)
+
+    def _querystring(self, key, obj):
+        # Keep the current filters (q, category, ...) and swap in the new cursor.
+        params = self.request.GET.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[key] = self._cursor_for(obj)
+        return params.urlencode()
+
+    @property
+    def next_querystring(self):
+        if not self.has_next:
+            return ''
+        return self._querystring('after', self.object_list[-1])
+
+    @property
+    def previous_querystring(self):
+        if not self.has_previous:
+            return ''
+        return self._querystring('before', self.object_list[0])
+
+
+def keyset_paginate(request, queryset, ordering, per_page=None):
+    """
+    Cursor-based pagination over `ordering`, e.g. ('-created_at', '-id').
+
+    All fields share one direction and the last one must be unique,
+    so every row has a distinct position.
+    Pages are selected with a range condition on the ordering columns
+    instead of an OFFSET, so a deep page costs the same as the first one.
+    """
+    per_page = per_page or getattr(settings, 'CATALOG_PAGE_SIZE', 12)
+    fields = [field.lstrip('-') for field in ordering]
+    descending = ordering[0].startswith('-')
+    reversed_ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    try:
+        if after:
+            values = decode_cursor(after, fields, queryset.model)
+            queryset = queryset.filter(keyset_condition(fields, values, descending, forward=True))
+        elif before:
+            values = decode_cursor(before, fields, queryset.model)
+            queryset = queryset.filter(keyset_condition(fields, values, descending, forward=False))
+    except InvalidCursor:
+        # A tampered or stale cursor just falls back to the first page.
+        after = before = None
+
+    if before:
+        # Walk backwards from the cursor, then restore the display order.
+        rows = list(queryset.order_by(*reversed_ordering)[:per_page + 1])
+        has_previous = len(rows) > per_page
+        object_list = rows[:per_page][::-1]
+        has_next = True
+    else:
+        rows = list(queryset.order_by(*ordering)[:per_page + 1])
+        has_next = len(rows) > per_page
+        object_list = rows[:per_page]
+        has_previous = bool(after)
+
+    return KeysetPage(object_list, has_next, has_previous, fields, request)
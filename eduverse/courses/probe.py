@@ -0,0 +1,167 @@
+# courses/probe.py
+import json
+import shutil
+import struct
+import subprocess
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import CourseVideo, apply_video_totals_change
+
+# MP4/MOV boxes that only contain other boxes, and that we descend into
+CONTAINER_BOXES = {b'moov', b'trak'}
+
+
+class ProbeError(Exception):
+    pass
+
+
+def ffprobe(path, binary):
+    result = subprocess.run(
+        [binary, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', path],
+        check=True, capture_output=True, text=True, timeout=60,
+    )
+    info = json.loads(result.stdout)
+    video_streams = [s for s in info.get('streams', []) if s.get('codec_type') == 'video']
+    stream = video_streams[0] if video_streams else {}
+    duration = info.get('format', {}).get('duration') or stream.get('duration')
+    return {
+        'duration': float(duration) if duration else None,
+        'width': stream.get('width'),
+        'height': stream.get('height'),
+    }
+
+
+def iter_boxes(f, start, end):
+    """Yields (type, payload offset, payload end) for the boxes between start and end."""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        size, box_type = struct.unpack('>I4s', f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - offset  # runs to the end of the file
+        if size < header:
+            raise ProbeError("Corrupt box header")
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def mp4_header(path):
+    """
+    Reads duration and frame size straight from an MP4/MOV header
+    (moov/mvhd and the video track's tkhd), seeking past the media data.
+    Used when ffprobe isn't installed.
+    """
+    duration = width = height = None
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        stack = [(0, f.tell())]
+        while stack:
+            start, end = stack.pop()
+            for box_type, payload, box_end in iter_boxes(f, start, end):
+                if box_type in CONTAINER_BOXES:
+                    stack.append((payload, box_end))
+                elif box_type == b'mvhd':
+                    f.seek(payload)
+                    version = f.read(1)[0]
+                    if version == 1:
+                        f.seek(payload + 20)
+                        timescale, length = struct.unpack('>IQ', f.read(12))
+                    else:
+                        f.seek(payload + 12)
+                        timescale, length = struct.unpack('>II', f.read(8))
+                    if timescale:
+                        duration = length / timescale
+                elif box_type == b'tkhd':
+                    f.seek(payload)
+                    version = f.read(1)[0]
+                    # width/height are the last two 16.16 fixed-point fields of the box
+                    f.seek(payload + (88 if version == 1 else 76))
+                    track_width, track_height = struct.unpack('>II', f.read(8))
+                    if track_width and track_height and width is None:  # audio tracks are 0x0
+                        width, height = track_width >> 16, track_height >> 16
+    if duration is None:
+        raise ProbeError("No movie header found")
+    return {'duration': duration, 'width': width, 'height': height}
+
+
+def mp4_has_audio(path):
+    """Whether an MP4/MOV file has a sound track (a trak whose mdia/hdlr handler is 'soun')."""
+    with open(path, 'rb') as f:
+        f.seek(0, 2)
+        stack = [(0, f.tell())]
+        while stack:
+            start, end = stack.pop()
+            for box_type, payload, box_end in iter_boxes(f, start, end):
+                if box_type in CONTAINER_BOXES or box_type == b'mdia':
+                    stack.append((payload, box_end))
+                elif box_type == b'hdlr':
+                    f.seek(payload + 8)  # version/flags, pre_defined, then the handler type
+                    if f.read(4) == b'soun':
+                        return True
+    return False
+
+
+def has_audio(path):
+    """
+    Whether a video has an audio stream. Files that can't be read are
+    assumed to have one, which is what the packaging did before it asked.
+    """
+    binary = shutil.which(getattr(settings, 'FFPROBE_BINARY', 'ffprobe'))
+    try:
+        if binary:
+            result = subprocess.run(
+                [binary, '-v', 'error', '-select_streams', 'a', '-show_entries', 'stream=index',
+                 '-print_format', 'json', path],
+                check=True, capture_output=True, text=True, timeout=60,
+            )
+            return bool(json.loads(result.stdout).get('streams'))
+        return mp4_has_audio(path)
+    except (OSError, ValueError, ProbeError, subprocess.SubprocessError, struct.error):
+        return True
+
+
+def probe_file(path):
+    binary = shutil.which(getattr(settings, 'FFPROBE_BINARY', 'ffprobe'))
+    if binary:
+        return ffprobe(path, binary)
+    return mp4_header(path)
+
+
+def probe_video(video_id):
+    """
+    Stores a video's duration, size and resolution and adds the change to its
+    module and course totals. Unreadable files still get their size recorded.
+    """
+    video = CourseVideo.objects.select_related('module').filter(pk=video_id).first()
+    if video is None or not video.video_file:
+        return None
+    storage = video.video_file.storage
+    try:
+        size = storage.size(video.video_file.name)
+    except OSError:
+        return None
+    try:
+        info = probe_file(video.video_file.path)
+    except (OSError, ValueError, ProbeError, subprocess.SubprocessError, struct.error, IndexError):
+        info = {'duration': None, 'width': None, 'height': None}
+
+    with transaction.atomic():
+        # Lock the row so two probes of the same video can't both apply a delta
+        old = CourseVideo.objects.select_for_update().filter(pk=video_id).values('duration', 'size').first()
+        if old is None:
+            return None
+        CourseVideo.objects.filter(pk=video_id).update(size=size, **info)
+        apply_video_totals_change(
+            video.module_id, video.module.course_id,
+            (info['duration'] or 0) - (old['duration'] or 0), size - (old['size'] or 0),
+        )
+    # The curriculum snapshot shows per-video lengths
+    from .curriculum import bump_version
+    bump_version(video.module.course_id)
+    return info
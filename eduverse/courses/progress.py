@@ -0,0 +1,72 @@
+# courses/progress.py
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CourseProgress, UserProgress
+
+
+def bits_from_rows(curriculum, rows):
+    """Folds (content_type_id, object_id) pairs into a bitset; items no longer in the course are ignored."""
+    bits = 0
+    positions = curriculum['positions']
+    for key in rows:
+        bit = positions.get(key)
+        if bit is not None:
+            bits |= 1 << bit
+    return bits
+
+
+def rebuild_progress(user_id, course_id, curriculum):
+    rows = UserProgress.objects.filter(user_id=user_id, course_id=course_id).values_list('content_type_id', 'object_id')
+    progress = CourseProgress(user_id=user_id, course_id=course_id, layout=curriculum['layout'])
+    progress.bits = bits_from_rows(curriculum, rows)
+    # Single upsert, so two requests rebuilding at once can't trip over the unique constraint
+    CourseProgress.objects.bulk_create(
+        [progress], update_conflicts=True, unique_fields=['user', 'course'],
+        update_fields=['completed_bits', 'layout', 'updated_at'],
+    )
+    return progress.bits
+
+
+def get_progress_bits(user_id, course_id, curriculum):
+    """
+    Returns the user's completion bitset for the course. Normally a single
+    row read; the bitset is only rebuilt from UserProgress when it is missing
+    or was built against an older curriculum layout.
+    """
+    progress = CourseProgress.objects.filter(user_id=user_id, course_id=course_id).first()
+    if progress is None or progress.layout != curriculum['layout']:
+        return rebuild_progress(user_id, course_id, curriculum)
+    return progress.bits
+
+
+def record_completion(user_id, course_id, curriculum, content_type_id, object_id):
+    bit = curriculum['positions'].get((content_type_id, object_id))
+    with transaction.atomic():
+        progress, _ = CourseProgress.objects.select_for_update().get_or_create(user_id=user_id, course_id=course_id)
+        if bit is None or progress.layout != curriculum['layout']:
+            # Unknown item or stale layout: refold everything from UserProgress instead
+            bits = rebuild_progress(user_id, course_id, curriculum)
+        else:
+            progress.bits |= 1 << bit
+            progress.save(update_fields=['completed_bits', 'updated_at'])
+            bits = progress.bits
+        if progress.completed_at is None and is_complete(bits, curriculum):
+            # Saved on its own so receivers (metrics) can tell the course was just finished
+            progress.completed_at = timezone.now()
+            progress.save(update_fields=['completed_at'])
+        return bits
+
+
+def unlocked(bits, module):
+    return bits & module['required_mask'] == module['required_mask']
+
+
+def completion_percent(bits, curriculum):
+    if not curriculum['item_count']:
+        return 0
+    return round(100 * bits.bit_count() / curriculum['item_count'])
+
+
+def is_complete(bits, curriculum):
+    return curriculum['item_count'] > 0 and bits & curriculum['full_mask'] == curriculum['full_mask']
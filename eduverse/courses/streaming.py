@@ -0,0 +1,116 @@
+# courses/streaming.py
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import HttpResponse, StreamingHttpResponse
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Types the mimetypes module doesn't know on every platform
+CONTENT_TYPES = {
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.ts': 'video/mp2t',
+}
+
+
+class UnsatisfiableRange(ValueError):
+    pass
+
+
+def parse_range(header, size):
+    """
+    Turns a Range header into an inclusive (start, end) byte pair, or None
+    when the whole file should be sent. Only single ranges are supported;
+    browsers and players never ask for more than one when seeking.
+    """
+    match = RANGE_RE.match((header or '').strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # "bytes=-500" is the last 500 bytes
+        length = int(last)
+        if length == 0:
+            raise UnsatisfiableRange(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise UnsatisfiableRange(header)
+    return start, end
+
+
+def iter_file_range(path, start, length, chunk_size):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def sendfile_response(name, content_type):
+    """
+    Lets the front server send the bytes itself. nginx needs an internal
+    location mapped to MEDIA_ROOT at VIDEO_ACCEL_REDIRECT_PREFIX; Apache and
+    lighttpd need mod_xsendfile allowed on MEDIA_ROOT.
+    """
+    backend = settings.VIDEO_SENDFILE_BACKEND
+    response = HttpResponse(content_type=content_type)
+    if backend == 'nginx':
+        response['X-Accel-Redirect'] = settings.VIDEO_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(name)
+    elif backend == 'xsendfile':
+        response['X-Sendfile'] = default_storage.path(name)
+    else:
+        raise ValueError(f"Unknown VIDEO_SENDFILE_BACKEND: {backend!r}")
+    return response
+
+
+def stream_file(request, name):
+    """
+    Serves a file from media storage (`name` is relative to MEDIA_ROOT) with
+    Range/206 support, or hands it to the front server.
+    """
+    content_type = CONTENT_TYPES.get(os.path.splitext(name)[1]) or mimetypes.guess_type(name)[0] \
+        or 'application/octet-stream'
+    if getattr(settings, 'VIDEO_SENDFILE_BACKEND', None):
+        # The front server handles Range itself
+        response = sendfile_response(name, content_type)
+        response['Cache-Control'] = 'private'
+        return response
+
+    path = default_storage.path(name)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return HttpResponse(status=404)
+
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except UnsatisfiableRange:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1 if size else 0
+    chunk_size = getattr(settings, 'VIDEO_STREAM_CHUNK_SIZE', 64 * 1024)
+    response = StreamingHttpResponse(
+        iter_file_range(path, start, length, chunk_size),
+        status=206 if byte_range else 200,
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['Cache-Control'] = 'private'
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
@@ -0,0 +1,16 @@
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def duration(seconds):
+    """{{ course.total_duration|duration }} -> "1h 05m", "12:34" or "" when unknown."""
+    if not seconds:
+        return ''
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f'{hours}h {minutes:02d}m'
+    return f'{minutes}:{seconds:02d}'
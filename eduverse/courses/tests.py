@@ -1,3 +1,831 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.http import QueryDict
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from live.models import LiveClass
+from search.backends import get_backend
+from .heartbeat import HeartbeatBuffer, heartbeat_buffer
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_paginate
+from .packaging import ffmpeg_command, package_video, requeue_stale
+from .probe import has_audio, mp4_header, probe_video
+from teachers.models import TeacherApplication
+from .models import (Course, CourseProgress, Module, CourseVideo, TextContent, Enrollment, UserProgress, Review,
+                     VideoUpload, VideoWatchPosition, recompute_rating_aggregates, recompute_video_totals)
+
+
+# ---------- Shared seeding helpers (also used by the other apps' tests) ----------
+
+def make_user(username):
+    return User.objects.create_user(username, f'{username}@example.com', 'test-pass-123')
+
+
+def make_teacher(username):
+    teacher = make_user(username)
+    TeacherApplication.objects.create(
+        user=teacher, full_name=username, email=teacher.email, expertise='Testing',
+        status=TeacherApplication.Status.APPROVED,
+    )
+    return teacher
+
+
+def make_users(prefix, count):
+    User.objects.bulk_create([User(username=f'{prefix}{i}') for i in range(count)])
+    return list(User.objects.filter(username__startswith=prefix).order_by('pk'))
+
+
+def seed_courses(instructor, count, **fields):
+    Course.objects.bulk_create([
+        Course(instructor=instructor, title=f'Course {i}', description=f'Description for course {i}',
+               price=100 + i, **fields)
+        for i in range(count)
+    ])
+    return list(Course.objects.filter(instructor=instructor).order_by('pk'))
+
+
+def seed_curriculum(course, modules=10, items_per_module=10):
+    """Creates `modules` modules, each with `items_per_module` videos and as many text items."""
+    Module.objects.bulk_create([
+        Module(course=course, title=f'Module {m}', order=m) for m in range(modules)
+    ])
+    module_list = list(course.modules.order_by('order'))
+    CourseVideo.objects.bulk_create([
+        CourseVideo(module=module, title=f'Video {module.order}.{i}', video_file='course_videos/lecture.mp4')
+        for module in module_list for i in range(items_per_module)
+    ])
+    TextContent.objects.bulk_create([
+        TextContent(module=module, title=f'Text {module.order}.{i}', content='Lorem ipsum')
+        for module in module_list for i in range(items_per_module)
+    ])
+    return module_list
+
+
+def seed_reviews(obj, users):
+    content_type = ContentType.objects.get_for_model(obj)
+    Review.objects.bulk_create([
+        Review(content_type=content_type, object_id=obj.pk, user=user, rating=1 + i % 5, comment='Great')
+        for i, user in enumerate(users)
+    ])
+
+
+class QueryBudgetMixin:
+    """
+    Fails a test when a view needs more than a fixed number of queries or
+    takes longer than a wall-clock budget, so N+1 regressions show up in CI.
+    """
+    time_budget = 0.75  # seconds per request
+
+    def assertWithinBudget(self, url, max_queries, max_seconds=None):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = self.client.get(url)
+            elapsed = time.perf_counter() - start
+        self.assertEqual(response.status_code, 200)
+        queries = '\n'.join(query['sql'] for query in context.captured_queries)
+        self.assertLessEqual(
+            len(context.captured_queries), max_queries,
+            f"{url} ran {len(context.captured_queries)} queries (budget {max_queries}):\n{queries}",
+        )
+        self.assertLessEqual(elapsed, max_seconds or self.time_budget, f"{url} took {elapsed:.3f}s")
+        return response
+
+
+# The frontend session cookie name is switched by AdminSeparateSessionMiddleware
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid')
+class CourseViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.student = make_user('student')
+        cls.courses = seed_courses(cls.teacher, 60, category=Course.Category.PROGRAMMING)
+        cls.big_course = cls.courses[0]
+        cls.modules = seed_curriculum(cls.big_course, modules=10, items_per_module=10)
+
+        Enrollment.objects.bulk_create([
+            Enrollment(user=cls.student, course=course, amount_paid=course.price) for course in cls.courses[:40]
+        ])
+        # The student has finished the first half of the big course
+        video_type = ContentType.objects.get_for_model(CourseVideo)
+        text_type = ContentType.objects.get_for_model(TextContent)
+        finished_modules = cls.modules[:5]
+        UserProgress.objects.bulk_create(
+            [UserProgress(user=cls.student, course=cls.big_course, content_type=video_type, object_id=video.pk)
+             for video in CourseVideo.objects.filter(module__in=finished_modules)]
+            + [UserProgress(user=cls.student, course=cls.big_course, content_type=text_type, object_id=text.pk)
+               for text in TextContent.objects.filter(module__in=finished_modules)]
+        )
+        seed_reviews(cls.big_course, make_users('reviewer', 30))
+        # bulk_create skips the signals that keep the search index current
+        get_backend().rebuild(Course)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_course_list(self):
+        self.assertWithinBudget(reverse('courses:course_list'), max_queries=1)
+
+    def test_course_list_search_and_category(self):
+        url = reverse('courses:course_list') + '?q=course&category=programming-tech'
+        response = self.assertWithinBudget(url, max_queries=1)
+        self.assertEqual(len(response.context['courses']), 12)
+
+    def test_category_view(self):
+        self.assertWithinBudget(reverse('courses:category_view', args=['programming-tech']), max_queries=1)
+
+    def test_course_detail_for_enrolled_student(self):
+        self.client.force_login(self.student)
+        # Cold: builds the curriculum snapshot (3) and folds UserProgress into the bitset (2)
+        response = self.assertWithinBudget(reverse('courses:course_detail', args=[self.big_course.pk]), max_queries=12)
+        unlocked = [module['is_unlocked'] for module in response.context['modules']]
+        self.assertEqual(unlocked, [True] * 6 + [False] * 4)
+
+    def test_course_detail_reuses_curriculum_snapshot(self):
+        self.client.force_login(self.student)
+        url = reverse('courses:course_detail', args=[self.big_course.pk])
+        self.client.get(url)
+        # Warm snapshot and bitset: only session, user, course, enrollment, progress row and reviews are read
+        self.assertWithinBudget(url, max_queries=7)
+
+    def test_curriculum_snapshot_invalidated_on_change(self):
+        url = reverse('courses:course_detail', args=[self.big_course.pk])
+        self.client.get(url)
+        CourseVideo.objects.create(module=self.modules[-1], title='Bonus video', video_file='course_videos/bonus.mp4')
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['modules'][-1]['videos']), 11)
+
+    def test_course_detail_for_guest(self):
+        self.assertWithinBudget(reverse('courses:course_detail', args=[self.big_course.pk]), max_queries=5)
+
+    def test_my_courses(self):
+        self.client.force_login(self.student)
+        response = self.assertWithinBudget(reverse('courses:my_courses'), max_queries=5)
+        self.assertEqual(response.context['enrollment_count'], 40)
+        # Later pages don't count the enrollments again
+        url = reverse('courses:my_courses') + '?' + response.context['page'].next_querystring
+        response = self.assertWithinBudget(url, max_queries=4)
+        self.assertIsNone(response.context['enrollment_count'])
+
+    def test_manage_courses(self):
+        self.client.force_login(self.teacher)
+        self.assertWithinBudget(reverse('courses:manage_courses'), max_queries=5)
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid')
+class CourseProgressBitsetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.student = make_user('student')
+        cls.course = seed_courses(cls.teacher, 1)[0]
+        cls.modules = seed_curriculum(cls.course, modules=3, items_per_module=2)
+        Enrollment.objects.create(user=cls.student, course=cls.course, amount_paid=cls.course.price)
+        cls.video_type = ContentType.objects.get_for_model(CourseVideo)
+        cls.text_type = ContentType.objects.get_for_model(TextContent)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.student)
+        self.url = reverse('courses:course_detail', args=[self.course.pk])
+
+    def complete(self, content_type, items):
+        for item in items:
+            self.client.post(reverse('courses:mark_as_complete', args=[content_type.pk, item.pk]))
+
+    def complete_module(self, module):
+        self.complete(self.text_type, module.text_contents.all())
+        self.complete(self.video_type, module.videos.all())
+
+    def test_mark_as_complete_sets_bits(self):
+        self.complete_module(self.modules[0])
+        progress = CourseProgress.objects.get(user=self.student, course=self.course)
+        self.assertEqual(progress.bits, 0b1111)
+
+        response = self.client.get(self.url)
+        self.assertEqual([m['is_unlocked'] for m in response.context['modules']], [True, True, False])
+        self.assertEqual(response.context['completion_percent'], 33)
+        self.assertFalse(response.context['can_review'])
+
+    def test_finishing_every_item_allows_review(self):
+        for module in self.modules:
+            self.complete_module(module)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['completion_percent'], 100)
+        self.assertTrue(response.context['can_review'])
+
+    def test_bitset_rebuilt_after_curriculum_change(self):
+        self.complete_module(self.modules[0])
+        self.complete_module(self.modules[1])
+        # A new item in the first module shifts every later bit and re-locks what follows it
+        TextContent.objects.create(module=self.modules[0], title='Extra reading', content='...')
+        response = self.client.get(self.url)
+        self.assertEqual([m['is_unlocked'] for m in response.context['modules']], [True, False, False])
+        self.assertEqual(len(response.context['completed_content_ids']['video']), 4)
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.courses = seed_courses(cls.teacher, 10)
+        # Pairs of courses share a created_at, so only the id tells them apart
+        start = timezone.now()
+        for i, course in enumerate(cls.courses):
+            Course.objects.filter(pk=course.pk).update(created_at=start - timedelta(hours=i // 2))
+        cls.ordered = list(Course.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def paginate(self, query='', queryset=None):
+        request = RequestFactory().get('/courses/?' + query)
+        return keyset_paginate(request, queryset or Course.objects.all(), ('-created_at', '-id'), per_page=3)
+
+    def ids(self, page):
+        return [course.pk for course in page]
+
+    def test_walk_forward_and_back(self):
+        pages = [self.paginate()]
+        while pages[-1].has_next:
+            pages.append(self.paginate(pages[-1].next_querystring))
+        self.assertEqual([len(page) for page in pages], [3, 3, 3, 1])
+        self.assertEqual([pk for page in pages for pk in self.ids(page)], self.ordered)
+        self.assertEqual([page.has_previous for page in pages], [False, True, True, True])
+        self.assertEqual(pages[-1].next_querystring, '')
+
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.paginate(page.previous_querystring)
+            self.assertEqual(self.ids(page), self.ids(expected))
+            self.assertTrue(page.has_next)
+        self.assertFalse(page.has_previous)
+        self.assertEqual(page.previous_querystring, '')
+
+    def test_filters_are_carried_across_pages(self):
+        Course.objects.filter(pk__in=self.ordered[::2]).update(category=Course.Category.GRAPHICS)
+        design = Course.objects.filter(category=Course.Category.GRAPHICS)
+        first = self.paginate('category=graphics-design', design)
+        params = QueryDict(first.next_querystring)
+        self.assertEqual(params['category'], 'graphics-design')
+        second = self.paginate(first.next_querystring, design)
+        self.assertEqual(self.ids(first) + self.ids(second), self.ordered[::2])
+        # Going back swaps the cursor rather than piling one on
+        params = QueryDict(second.previous_querystring)
+        self.assertEqual((params['category'], 'after' in params), ('graphics-design', False))
+
+    def test_invalid_cursors_fall_back_to_the_first_page(self):
+        for cursor in ['garbage!', encode_cursor([1]), encode_cursor(['not a date', 1]),
+                       encode_cursor({'created_at': 1}), '']:
+            for key in ('after', 'before'):
+                page = self.paginate(f'{key}={cursor}')
+                self.assertEqual(self.ids(page), self.ordered[:3])
+                self.assertFalse(page.has_previous)
+
+    def test_cursor_round_trip(self):
+        page = self.paginate()
+        cursor = QueryDict(page.next_querystring)['after']
+        last = Course.objects.get(pk=self.ordered[2])
+        self.assertEqual(decode_cursor(cursor, ['created_at', 'id'], Course), [last.created_at, last.pk])
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(cursor + 'x', ['created_at', 'id'], Course)
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(cursor, ['created_at'], Course)
+
+
+class RatingAggregateTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.course, cls.other_course = seed_courses(cls.teacher, 2)
+        cls.live_class = LiveClass.objects.create(instructor=cls.teacher, title='Live Q&A', description='Questions',
+                                                  price=50, start_time=timezone.now() + timedelta(days=1))
+        cls.users = make_users('reviewer', 3)
+
+    def review(self, obj, user, rating):
+        return Review.objects.create(content_type=ContentType.objects.get_for_model(obj), object_id=obj.pk,
+                                     user=user, rating=rating)
+
+    def assertRating(self, obj, avg, count):
+        obj.refresh_from_db()
+        self.assertAlmostEqual(obj.rating_avg, avg)
+        self.assertEqual(obj.rating_count, count)
+
+    def test_create_edit_and_delete_keep_the_average(self):
+        first = self.review(self.course, self.users[0], 5)
+        self.assertRating(self.course, 5, 1)
+        second = self.review(self.course, self.users[1], 2)
+        self.assertRating(self.course, 3.5, 2)
+
+        second.rating = 4
+        second.save()
+        self.assertRating(self.course, 4.5, 2)
+        second.comment = 'Changed my mind about the wording only'
+        second.save()
+        self.assertRating(self.course, 4.5, 2)
+
+        first.delete()
+        self.assertRating(self.course, 4, 1)
+        second.delete()
+        self.assertRating(self.course, 0, 0)
+        self.assertRating(self.other_course, 0, 0)
+
+    def test_live_classes_are_rated_the_same_way(self):
+        self.review(self.live_class, self.users[0], 3)
+        self.review(self.live_class, self.users[1], 4)
+        self.assertRating(self.live_class, 3.5, 2)
+
+    def test_recompute_ratings_repairs_drift(self):
+        seed_reviews(self.course, self.users)  # bulk_create: no signals, so the aggregates are stale
+        self.review(self.live_class, self.users[0], 4)
+        Course.objects.filter(pk=self.other_course.pk).update(rating_avg=4.2, rating_count=7)
+        self.assertRating(self.course, 0, 0)
+
+        out = io.StringIO()
+        call_command('recompute_ratings', stdout=out)
+        self.assertIn('Repaired 2 courses.Course rows.', out.getvalue())
+        self.assertIn('Repaired 0 live.LiveClass rows.', out.getvalue())
+        self.assertRating(self.course, 2, 3)  # ratings 1, 2 and 3
+        self.assertRating(self.other_course, 0, 0)
+        self.assertRating(self.live_class, 4, 1)
+        # Nothing left to repair
+        self.assertEqual(recompute_rating_aggregates(Course), 0)
+
+
+# Flushes only happen when a test asks for them
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid', HEARTBEAT_FLUSH_INTERVAL=3600,
+                   HEARTBEAT_FLUSH_THREAD=False)
+class VideoHeartbeatTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.students = [make_user(f'student{i}') for i in range(3)]
+        cls.course = seed_courses(cls.teacher, 1)[0]
+        seed_curriculum(cls.course, modules=1, items_per_module=2)
+        cls.video = cls.course.modules.get().videos.first()
+        Enrollment.objects.bulk_create([
+            Enrollment(user=student, course=cls.course, amount_paid=cls.course.price) for student in cls.students
+        ])
+
+    def setUp(self):
+        cache.clear()
+        heartbeat_buffer.flush()
+        self.url = reverse('courses:video_heartbeat', args=[self.video.pk])
+
+    def tearDown(self):
+        heartbeat_buffer.flush()
+
+    def beat(self, user, position, duration=600):
+        self.client.force_login(user)
+        return self.client.post(self.url, {'position': position, 'duration': duration})
+
+    def test_heartbeats_are_coalesced_until_flush(self):
+        for student in self.students:
+            for position in (10, 20, 30):
+                self.assertEqual(self.beat(student, position).status_code, 200)
+        self.assertFalse(VideoWatchPosition.objects.exists())
+
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(heartbeat_buffer.flush(), 3)
+        self.assertLessEqual(len(context.captured_queries), 4)  # durations, savepoint, one upsert, release
+        self.assertEqual(sorted(VideoWatchPosition.objects.values_list('position', flat=True)), [30, 30, 30])
+
+    def test_buffered_heartbeat_skips_access_check(self):
+        self.beat(self.students[0], 5)
+        with CaptureQueriesContext(connection) as context:
+            self.client.post(self.url, {'position': 10, 'duration': 600})
+        # Only the session and user lookups remain
+        self.assertEqual(len(context.captured_queries), 2)
+
+    def test_watching_past_threshold_completes_video(self):
+        self.beat(self.students[0], 560)
+        self.beat(self.students[1], 100)
+        heartbeat_buffer.flush()
+        self.assertEqual(list(UserProgress.objects.values_list('user', 'object_id')), [(self.students[0].pk, self.video.pk)])
+        self.assertEqual(CourseProgress.objects.get(user=self.students[0], course=self.course).bits.bit_count(), 1)
+
+    def test_probed_duration_overrides_the_reported_one(self):
+        CourseVideo.objects.filter(pk=self.video.pk).update(duration=600)
+        # A spoofed 10-second duration doesn't complete a 10-minute video
+        self.beat(self.students[0], 9, duration=10)
+        self.beat(self.students[1], 900, duration=1000)
+        heartbeat_buffer.flush()
+        positions = dict(VideoWatchPosition.objects.values_list('user', 'position'))
+        self.assertEqual(positions, {self.students[0].pk: 9, self.students[1].pk: 600})
+        self.assertEqual(set(VideoWatchPosition.objects.values_list('duration', flat=True)), {600})
+        self.assertEqual(list(UserProgress.objects.values_list('user', flat=True)), [self.students[1].pk])
+
+    def test_rejects_bad_input_and_strangers(self):
+        self.assertEqual(self.beat(self.students[0], 'nan').status_code, 400)
+        self.assertEqual(self.beat(self.students[0], 'abc').status_code, 400)
+        self.assertEqual(self.beat(make_user('stranger'), 10).status_code, 403)
+        self.assertEqual(len(heartbeat_buffer), 0)
+
+    def test_failed_flush_is_logged_and_retried(self):
+        self.beat(self.students[0], 10)
+        with override_settings(HEARTBEAT_FLUSH_INTERVAL=0), \
+                mock.patch('courses.heartbeat.write_positions', side_effect=DatabaseError('disk I/O error')), \
+                self.assertLogs('courses.heartbeat', 'ERROR'):
+            self.assertEqual(self.beat(self.students[0], 20).status_code, 200)
+        self.assertEqual(len(heartbeat_buffer), 1)
+        self.assertEqual(heartbeat_buffer.flush(), 1)
+        self.assertEqual(VideoWatchPosition.objects.get().position, 20)
+
+    @override_settings(HEARTBEAT_FLUSH_INTERVAL=0.01)
+    def test_timer_thread_flushes_without_new_heartbeats(self):
+        buffer = HeartbeatBuffer()
+        flushed = threading.Event()
+        with mock.patch.object(buffer, 'flush', side_effect=flushed.set):
+            buffer.start_timer()
+            timer = buffer._timer
+            buffer.start_timer()  # only one thread per buffer
+            self.assertIs(buffer._timer, timer)
+            self.assertTrue(flushed.wait(5))
+
+
+class TemporaryMediaMixin:
+    """Points MEDIA_ROOT at a scratch directory holding course_videos/lecture.mp4."""
+    payload = bytes(range(256)) * 40  # 10240 bytes
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.TemporaryDirectory()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root.name)
+        cls.settings_override.enable()
+        os.makedirs(os.path.join(cls.media_root.name, 'course_videos'))
+        with open(os.path.join(cls.media_root.name, 'course_videos', 'lecture.mp4'), 'wb') as f:
+            f.write(cls.payload)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.media_root.cleanup()
+        super().tearDownClass()
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid')
+class VideoStreamingTests(TemporaryMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.student = make_user('student')
+        cls.course = seed_courses(cls.teacher, 1)[0]
+        seed_curriculum(cls.course, modules=1, items_per_module=1)
+        cls.video = CourseVideo.objects.get(module__course=cls.course)
+        Enrollment.objects.create(user=cls.student, course=cls.course, amount_paid=cls.course.price)
+
+    def setUp(self):
+        self.url = reverse('courses:stream_video', args=[self.video.pk])
+        self.client.force_login(self.student)
+
+    def test_full_download(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(b''.join(response.streaming_content), self.payload)
+
+    def test_range_requests(self):
+        for header, start, end in (('bytes=100-199', 100, 199), ('bytes=10000-', 10000, 10239), ('bytes=-40', 10200, 10239)):
+            response = self.client.get(self.url, HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/10240')
+            self.assertEqual(b''.join(response.streaming_content), self.payload[start:end + 1])
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=20000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10240')
+
+    def test_only_enrolled_users_and_instructor(self):
+        self.client.force_login(make_user('stranger'))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-0').status_code, 206)
+
+    @override_settings(VIDEO_SENDFILE_BACKEND='nginx')
+    def test_nginx_handoff(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/course_videos/lecture.mp4')
+        self.assertEqual(response.content, b'')
+
+
+# Stand-ins for ffmpeg: the real binary is exercised in deployment, these only check the bookkeeping.
+FAKE_FFMPEG = """#!/bin/sh
+for last; do :; done
+out=$(dirname "$last")
+printf '#EXTM3U\\n' > "$out/master.m3u8"
+printf 'segment' > "$out/720p_0000.ts"
+"""
+BROKEN_FFMPEG = """#!/bin/sh
+echo "Invalid data found when processing input" >&2
+exit 1
+"""
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid')
+class HLSPackagingTests(TemporaryMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.student = make_user('student')
+        cls.course = seed_courses(cls.teacher, 1)[0]
+        seed_curriculum(cls.course, modules=1, items_per_module=1)
+        cls.video = CourseVideo.objects.get(module__course=cls.course)
+        Enrollment.objects.create(user=cls.student, course=cls.course, amount_paid=cls.course.price)
+
+    def fake_ffmpeg(self, script):
+        path = os.path.join(self.media_root.name, 'ffmpeg')
+        with open(path, 'w') as f:
+            f.write(script)
+        os.chmod(path, 0o755)
+        return override_settings(FFMPEG_BINARY=path)
+
+    def test_command_maps_every_rendition(self):
+        command = ffmpeg_command('ffmpeg', 'in.mp4', '/out')
+        stream_map = command[command.index('-var_stream_map') + 1]
+        self.assertEqual(stream_map, 'v:0,a:0,name:1080p v:1,a:1,name:720p v:2,a:2,name:480p v:3,a:3,name:360p')
+        self.assertEqual(command[-1], '/out/%v.m3u8')
+        self.assertIn('0:a:0?', command)
+
+    def test_silent_video_gets_video_only_renditions(self):
+        command = ffmpeg_command('ffmpeg', 'in.mp4', '/out', audio=False)
+        stream_map = command[command.index('-var_stream_map') + 1]
+        self.assertEqual(stream_map, 'v:0,name:1080p v:1,name:720p v:2,name:480p v:3,name:360p')
+        self.assertNotIn('0:a:0?', command)
+
+    @override_settings(FFPROBE_BINARY='/nonexistent/ffprobe')
+    def test_audio_track_is_read_from_the_mp4_header(self):
+        silent = os.path.join(self.media_root.name, 'silent.mp4')
+        with open(silent, 'wb') as f:
+            f.write(fake_mp4(10, 640, 360))
+        self.assertFalse(has_audio(silent))
+        sound = mp4_box(b'trak', mp4_box(b'mdia', mp4_box(b'hdlr', bytes(8) + b'soun' + bytes(12))))
+        with_audio = os.path.join(self.media_root.name, 'talk.mp4')
+        with open(with_audio, 'wb') as f:
+            f.write(mp4_box(b'moov', sound))
+        self.assertTrue(has_audio(with_audio))
+
+    def test_stuck_processing_is_requeued(self):
+        CourseVideo.objects.filter(pk=self.video.pk).update(
+            hls_status=CourseVideo.HLSStatus.PROCESSING, hls_started_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(requeue_stale(), 0)  # still running, as far as anyone knows
+        CourseVideo.objects.filter(pk=self.video.pk).update(hls_started_at=timezone.now() - timedelta(hours=3))
+        self.assertEqual(requeue_stale(), 1)
+        self.video.refresh_from_db()
+        self.assertEqual((self.video.hls_status, self.video.hls_started_at), (CourseVideo.HLSStatus.PENDING, None))
+
+    @override_settings(FFMPEG_BINARY='/nonexistent/ffmpeg')
+    def test_missing_ffmpeg_leaves_video_pending(self):
+        self.assertEqual(package_video(self.video.pk), CourseVideo.HLSStatus.PENDING)
+
+    def test_successful_packaging_switches_player_to_manifest(self):
+        with self.fake_ffmpeg(FAKE_FFMPEG):
+            self.assertEqual(package_video(self.video.pk), CourseVideo.HLSStatus.READY)
+            # Already packaged: nothing left to claim
+            self.assertIsNone(package_video(self.video.pk))
+        self.video.refresh_from_db()
+        self.assertEqual(self.video.hls_manifest, f'course_videos/hls/{self.video.pk}/master.m3u8')
+
+        self.client.force_login(self.student)
+        manifest_url = reverse('courses:hls_file', args=[self.video.pk, 'master.m3u8'])
+        page = self.client.get(reverse('courses:content_detail', args=[self.video.get_content_type_id(), self.video.pk]))
+        self.assertContains(page, f'data-hls-url="{manifest_url}"')
+
+        response = self.client.get(manifest_url)
+        self.assertEqual(response['Content-Type'], 'application/vnd.apple.mpegurl')
+        self.assertEqual(b''.join(response.streaming_content), b'#EXTM3U\n')
+        self.assertEqual(self.client.get(reverse('courses:hls_file', args=[self.video.pk, 'notes.txt'])).status_code, 404)
+
+        self.client.force_login(make_user('stranger'))
+        self.assertEqual(self.client.get(manifest_url).status_code, 403)
+
+    def test_replaced_file_is_packaged_again(self):
+        with self.fake_ffmpeg(FAKE_FFMPEG):
+            package_video(self.video.pk)
+        renditions = os.path.join(self.media_root.name, 'course_videos', 'hls', str(self.video.pk))
+        video = CourseVideo.objects.get(pk=self.video.pk)
+        with mock.patch('courses.packaging.enqueue_packaging') as enqueue, self.captureOnCommitCallbacks(execute=True):
+            video.title = 'Renamed'
+            video.save()
+            self.assertEqual(CourseVideo.objects.get(pk=video.pk).hls_status, CourseVideo.HLSStatus.READY)
+
+            video.video_file = 'course_videos/lecture-v2.mp4'
+            video.save()
+        enqueue.assert_called_once_with(video.pk)  # for the new file only, not the title change
+        video.refresh_from_db()
+        self.assertEqual((video.hls_status, video.hls_manifest), (CourseVideo.HLSStatus.PENDING, ''))
+        self.assertFalse(os.path.exists(renditions))
+
+    def test_packaging_a_replaced_file_is_not_marked_ready(self):
+        replace = CourseVideo.objects.filter(pk=self.video.pk).update
+        with self.fake_ffmpeg(FAKE_FFMPEG), \
+                mock.patch('courses.packaging.has_audio', side_effect=lambda source: replace(hls_status='pending')):
+            self.assertIsNone(package_video(self.video.pk))
+        self.video.refresh_from_db()
+        self.assertEqual((self.video.hls_status, self.video.hls_manifest), (CourseVideo.HLSStatus.PENDING, ''))
+
+    def test_failed_packaging_records_error(self):
+        with self.fake_ffmpeg(BROKEN_FFMPEG):
+            self.assertEqual(package_video(self.video.pk), CourseVideo.HLSStatus.FAILED)
+        self.video.refresh_from_db()
+        self.assertIn('Invalid data', self.video.hls_error)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root.name, 'course_videos', 'hls', str(self.video.pk))))
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid', VIDEO_UPLOAD_CHUNK_SIZE=4096)
+class ChunkedVideoUploadTests(TemporaryMediaMixin, TestCase):
+    data = os.urandom(10000)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.course = seed_courses(cls.teacher, 1)[0]
+        cls.module = Module.objects.create(course=cls.course, title='Intro', order=1)
+
+    def setUp(self):
+        self.temp_override = override_settings(VIDEO_UPLOAD_TEMP_DIR=os.path.join(self.media_root.name, 'parts'))
+        self.temp_override.enable()
+        self.addCleanup(self.temp_override.disable)
+        self.client.force_login(self.teacher)
+
+    def start(self, **extra):
+        fields = {'title': 'Lecture 1', 'filename': 'lecture 1.mp4', 'size': len(self.data),
+                  'sha256': hashlib.sha256(self.data).hexdigest()}
+        fields.update(extra)
+        return self.client.post(reverse('courses:start_video_upload', args=[self.module.pk]), fields)
+
+    def put_chunk(self, url, offset, chunk, checksum=None):
+        return self.client.put(url, chunk, content_type='application/octet-stream', headers={
+            'Upload-Offset': str(offset),
+            'Upload-Checksum': checksum or hashlib.sha256(chunk).hexdigest(),
+        })
+
+    def test_upload_in_chunks_creates_video(self):
+        state = self.start().json()
+        self.assertEqual((state['offset'], state['chunk_size']), (0, 4096))
+        while state['status'] == 'uploading':
+            response = self.put_chunk(state['url'], state['offset'], self.data[state['offset']:state['offset'] + 4096])
+            self.assertEqual(response.status_code, 200)
+            state = response.json()
+
+        self.assertEqual(state['redirect'], reverse('courses:manage_course_content', args=[self.course.pk]))
+        upload = VideoUpload.objects.get()
+        self.assertEqual(upload.status, VideoUpload.Status.COMPLETE)
+        with upload.video.video_file.open('rb') as f:
+            self.assertEqual(f.read(), self.data)
+        self.assertEqual(upload.video.title, 'Lecture 1')
+        self.assertFalse(os.listdir(os.path.join(self.media_root.name, 'parts')))
+
+    def test_resume_after_a_bad_chunk(self):
+        url = self.start().json()['url']
+        self.assertEqual(self.put_chunk(url, 0, self.data[:4096]).status_code, 200)
+        # Corrupted in transit: rejected and the offset stays put
+        response = self.put_chunk(url, 4096, self.data[4096:8192], checksum='0' * 64)
+        self.assertEqual(response.status_code, 422)
+        # Replayed from a stale offset: the server says where to continue
+        response = self.put_chunk(url, 0, self.data[:4096])
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 4096))
+        self.assertEqual(self.client.get(url).json()['offset'], 4096)
+        self.assertNotIn('redirect', self.client.get(url).json())
+
+        self.put_chunk(url, 4096, self.data[4096:8192])
+        self.assertEqual(self.put_chunk(url, 8192, self.data[8192:]).json()['status'], 'complete')
+
+    def test_whole_file_checksum_mismatch_fails_upload(self):
+        state = self.start(sha256='f' * 64).json()
+        for offset in range(0, len(self.data), 4096):
+            response = self.put_chunk(state['url'], offset, self.data[offset:offset + 4096])
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json()['status'], 'failed')
+        self.assertFalse(CourseVideo.objects.exists())
+
+    def test_retried_finish_returns_the_same_video(self):
+        url = self.start().json()['url']
+        self.put_chunk(url, 0, self.data[:4096])
+        self.put_chunk(url, 4096, self.data[4096:8192])
+        done = self.put_chunk(url, 8192, self.data[8192:]).json()
+        # The client missed the reply and sends the finishing PUT (or the last chunk) again
+        for retry in (b'', self.data[8192:]):
+            response = self.put_chunk(url, len(self.data) - len(retry), retry)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), done)
+        self.assertEqual(CourseVideo.objects.count(), 1)
+
+    def test_only_one_request_finishes_an_upload(self):
+        url = self.start().json()['url']
+        self.put_chunk(url, 0, self.data[:4096])
+        self.put_chunk(url, 4096, self.data[4096:8192])
+        # Another request claimed the upload and is still building the video
+        VideoUpload.objects.update(received=len(self.data), status=VideoUpload.Status.COMPLETE)
+        response = self.put_chunk(url, len(self.data), b'')
+        self.assertEqual((response.status_code, response.json()['status']), (409, 'complete'))
+        self.assertNotIn('redirect', response.json())
+        self.assertFalse(CourseVideo.objects.exists())
+        # The page polls the upload until the other request has created the video
+        video = CourseVideo.objects.create(module=self.module, title='Lecture 1', video_file='course_videos/a.mp4')
+        VideoUpload.objects.update(video=video)
+        self.assertEqual(self.client.get(url).json()['redirect'],
+                         reverse('courses:manage_course_content', args=[self.course.pk]))
+        self.client.delete(url)
+
+    def test_whole_file_checksum_is_required(self):
+        for sha256 in ('', 'not-a-checksum', 'f' * 63):
+            response = self.start(sha256=sha256)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('sha256', response.json()['error'])
+        self.assertFalse(VideoUpload.objects.exists())
+
+    def test_only_the_instructor_can_upload(self):
+        self.assertEqual(self.start(size=10 * 1024 ** 4).status_code, 400)
+        self.client.force_login(make_user('student'))
+        self.assertEqual(self.start().status_code, 403)
+
+
+def mp4_box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def fake_mp4(seconds, width, height):
+    """The boxes probe.mp4_header reads: ftyp, moov(mvhd, audio + video trak/tkhd), then mdat."""
+    mvhd = struct.pack('>4xIIII', 0, 0, 1000, int(seconds * 1000)) + bytes(80)
+
+    def trak(w, h):
+        tkhd = struct.pack('>4x5I8x8x36x', 0, 0, 1, 0, 0) + struct.pack('>II', w << 16, h << 16)
+        return mp4_box(b'trak', mp4_box(b'tkhd', tkhd))
+
+    moov = mp4_box(b'moov', mp4_box(b'mvhd', mvhd) + trak(0, 0) + trak(width, height))
+    return mp4_box(b'ftyp', b'isom\x00\x00\x02\x00') + moov + mp4_box(b'mdat', bytes(4096))
+
+
+@override_settings(FFPROBE_BINARY='/nonexistent/ffprobe')
+class VideoMetadataTests(TemporaryMediaMixin, TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.mp4_path = os.path.join(cls.media_root.name, 'course_videos', 'short.mp4')
+        with open(cls.mp4_path, 'wb') as f:
+            f.write(fake_mp4(95.5, 1280, 720))
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.course = seed_courses(cls.teacher, 1)[0]
+        cls.module = seed_curriculum(cls.course, modules=1, items_per_module=0)[0]
+
+    def add_video(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return CourseVideo.objects.create(module=self.module, title=name, video_file=f'course_videos/{name}')
+
+    def test_mp4_header(self):
+        self.assertEqual(mp4_header(self.mp4_path), {'duration': 95.5, 'width': 1280, 'height': 720})
+
+    def test_totals_follow_uploads_and_deletes(self):
+        short = self.add_video('short.mp4')
+        # Not an MP4 at all: size is still counted, duration stays unknown
+        self.add_video('lecture.mp4')
+        short.refresh_from_db()
+        self.assertEqual((short.duration, short.width, short.height), (95.5, 1280, 720))
+        self.module.refresh_from_db()
+        self.course.refresh_from_db()
+        for obj in (self.module, self.course):
+            self.assertEqual(obj.total_duration, 95.5)
+            self.assertEqual(obj.total_video_size, short.size + len(self.payload))
+
+        # Probing again doesn't count the video twice
+        probe_video(short.pk)
+        short.delete()
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.total_duration, self.course.total_video_size), (0, len(self.payload)))
+
+        self.client.force_login(self.teacher)
+        self.add_video('short.mp4')
+        response = self.client.get(self.course.get_absolute_url())
+        self.assertContains(response, '1:36 of video')
+
+    def test_recompute_repairs_drifted_totals(self):
+        self.add_video('short.mp4')
+        Course.objects.filter(pk=self.course.pk).update(total_duration=5000, total_video_size=1)
+        self.assertEqual(recompute_video_totals(), 1)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.total_duration, 95.5)
+        self.assertEqual(recompute_video_totals(), 0)
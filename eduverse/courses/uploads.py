@@ -0,0 +1,178 @@
+# courses/uploads.py
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CourseVideo, VideoUpload
+
+# How much of the request body is read into memory at a time while writing a chunk
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    status = 400
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        if status is not None:
+            self.status = status
+
+
+class AssembledFile(File):
+    """
+    A finished upload on local disk. Exposing temporary_file_path() lets
+    the storage move the file into MEDIA_ROOT instead of copying it.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def temp_dir():
+    return getattr(settings, 'VIDEO_UPLOAD_TEMP_DIR', os.path.join(settings.BASE_DIR, 'upload_parts'))
+
+
+def part_path(upload):
+    return os.path.join(temp_dir(), f'{upload.pk}.part')
+
+
+def start_upload(module, user, title, filename, size, sha256):
+    max_size = getattr(settings, 'VIDEO_UPLOAD_MAX_SIZE', 5 * 1024 ** 3)
+    if size <= 0 or size > max_size:
+        raise UploadError(f"File size must be between 1 byte and {max_size} bytes.")
+    # finish_upload() checks the assembled file against it
+    if not re.fullmatch(r'[0-9a-fA-F]{64}', sha256):
+        raise UploadError("sha256 must be the file's SHA-256 as 64 hex digits.")
+    upload = VideoUpload.objects.create(
+        module=module, uploader=user, title=title, filename=os.path.basename(filename), size=size,
+        sha256=sha256.lower(),
+    )
+    os.makedirs(temp_dir(), exist_ok=True)
+    open(part_path(upload), 'wb').close()
+    return upload
+
+
+def write_chunk(upload, offset, stream, length, checksum=''):
+    """
+    Appends `length` bytes from `stream` (the request, read incrementally)
+    at `offset`, which must be where the previous chunk ended. The chunk is
+    checked against its own SHA-256 before the offset moves, so a corrupted
+    chunk is simply sent again.
+    """
+    if upload.status != VideoUpload.Status.UPLOADING:
+        raise UploadError("This upload is already finished.", status=409)
+    if offset != upload.received:
+        raise UploadError(f"Expected offset {upload.received}.", status=409)
+    max_chunk = getattr(settings, 'VIDEO_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)
+    if length <= 0 or length > max_chunk or offset + length > upload.size:
+        raise UploadError(f"Chunks must be 1 to {max_chunk} bytes and stay within the file size.")
+
+    digest = hashlib.sha256()
+    written = 0
+    with open(part_path(upload), 'r+b') as part:
+        part.seek(offset)
+        while written < length:
+            data = stream.read(min(COPY_BUFFER_SIZE, length - written))
+            if not data:
+                break
+            digest.update(data)
+            part.write(data)
+            written += len(data)
+        # Drop anything past the accepted bytes (left over from an interrupted chunk)
+        part.truncate(offset + written if written == length else offset)
+
+    if written != length:
+        raise UploadError("The chunk ended early; send it again from the same offset.")
+    if checksum and digest.hexdigest() != checksum.lower():
+        with open(part_path(upload), 'r+b') as part:
+            part.truncate(offset)
+        raise UploadError("Chunk checksum mismatch; send it again.", status=422)
+
+    # Only one request can move the offset from here, even if two sent the same chunk
+    moved = VideoUpload.objects.filter(pk=upload.pk, received=offset).update(
+        received=offset + length, updated_at=timezone.now())
+    if not moved:
+        raise UploadError("Another request already wrote this chunk.", status=409)
+    upload.received = offset + length
+    return upload
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def claim_upload(upload):
+    """
+    Moves a fully received upload from UPLOADING to COMPLETE under a row
+    lock, so only one request goes on to build its video. Returns False if
+    it was already complete (the caller's `upload` then has its video).
+    """
+    with transaction.atomic():
+        locked = VideoUpload.objects.select_for_update().select_related('video').get(pk=upload.pk)
+        upload.status, upload.video, upload.received = locked.status, locked.video, locked.received
+        if locked.status == VideoUpload.Status.COMPLETE:
+            if locked.video is None:
+                raise UploadError("This upload is being finished by another request.", status=409)
+            return False
+        if locked.status != VideoUpload.Status.UPLOADING:
+            raise UploadError("This upload failed; start it over.", status=409)
+        if locked.received != locked.size:
+            raise UploadError(f"{locked.size - locked.received} bytes are still missing.", status=409)
+        VideoUpload.objects.filter(pk=upload.pk).update(status=VideoUpload.Status.COMPLETE, updated_at=timezone.now())
+    upload.status = VideoUpload.Status.COMPLETE
+    return True
+
+
+def finish_upload(upload):
+    """
+    Verifies the whole file and turns it into a CourseVideo. Finishing an
+    already finished upload (a retried last request) returns its video.
+    """
+    if not claim_upload(upload):
+        return upload.video
+    path = part_path(upload)
+    try:
+        checksum = file_sha256(path)
+        if upload.sha256 and checksum != upload.sha256:
+            VideoUpload.objects.filter(pk=upload.pk).update(status=VideoUpload.Status.FAILED)
+            upload.status = VideoUpload.Status.FAILED
+            os.remove(path)
+            raise UploadError("File checksum mismatch; the upload has to start over.", status=422)
+
+        field = CourseVideo._meta.get_field('video_file')
+        with open(path, 'rb') as f:
+            assembled = AssembledFile(f)
+            assembled.sha256 = checksum  # already computed; saves the storage a second pass over the file
+            name = field.storage.save(field.generate_filename(None, upload.filename), assembled)
+    except (OSError, UploadError):
+        if upload.status == VideoUpload.Status.COMPLETE:
+            # Give it back, so the client can retry the finish
+            VideoUpload.objects.filter(pk=upload.pk).update(status=VideoUpload.Status.UPLOADING)
+            upload.status = VideoUpload.Status.UPLOADING
+        raise
+    if os.path.exists(path):
+        # Storages that copy rather than move leave the part behind
+        os.remove(path)
+    with transaction.atomic():
+        video = CourseVideo.objects.create(module=upload.module, title=upload.title, video_file=name)
+        upload.video = video
+        upload.sha256 = checksum
+        upload.save(update_fields=['video', 'sha256', 'status', 'updated_at'])
+    return video
+
+
+def discard_upload(upload):
+    try:
+        os.remove(part_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
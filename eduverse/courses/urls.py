@@ -40,9 +40,14 @@ urlpatterns = [
     path('manage/<int:course_pk>/content/', views.manage_course_content_view, name='manage_course_content'),
     path('module/<int:module_pk>/add-video/', views.add_video_view, name='add_video_to_module'),
     path('module/<int:module_pk>/add-text/', views.add_text_content_view, name='add_text_to_module'),
+    path('module/<int:module_pk>/uploads/', views.start_video_upload_view, name='start_video_upload'),
+    path('uploads/<uuid:upload_id>/', views.video_upload_view, name='video_upload'),
     path('mark-complete/<int:content_type_id>/<int:pk>/', views.mark_as_complete_view, name='mark_as_complete'),
     path('review/add/<str:model_name>/<int:pk>/', views.add_review_view, name='add_review'),
     path('content/<int:content_type_id>/<int:pk>/', views.content_detail_view, name='content_detail'),
+    path('video/<int:pk>/stream/', views.stream_video_view, name='stream_video'),
+    path('video/<int:pk>/hls/<str:name>', views.hls_file_view, name='hls_file'),
+    path('video/<int:pk>/heartbeat/', views.video_heartbeat_view, name='video_heartbeat'),
 
 
 
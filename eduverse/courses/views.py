@@ -1,3 +1,5 @@
+import math
+
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
@@ -5,17 +7,33 @@ from .forms import CourseForm
 from .forms import ModuleForm, VideoForm, TextContentForm
 from .forms import ReviewForm
 from django.contrib.contenttypes.models import ContentType
-from .models import Module, CourseVideo, TextContent, Enrollment, UserProgress, Review
-from django.db.models import Q
+from .models import Module, CourseVideo, TextContent, Enrollment, UserProgress, Review, VideoUpload
+from django.db import transaction
+from django.http import Http404, HttpResponseForbidden, HttpResponseNotAllowed, JsonResponse
+from django.urls import reverse
+from django.conf import settings
+from django.views.decorators.http import require_POST
+from django.db.models import Count, Q
 from .models import Course
 from teachers.models import TeacherApplication
 from .models import Course, Module # Make sure Module is imported
+from search.backends import get_backend
+from .pagination import keyset_paginate
+from .curriculum import get_curriculum
+from .heartbeat import heartbeat_buffer
+from .packaging import output_name
+from .streaming import stream_file
+from .uploads import UploadError, discard_upload, finish_upload, start_upload, write_chunk
+from .progress import completion_percent, get_progress_bits, is_complete, record_completion, unlocked
+
+# Newest courses first; the id breaks ties so every course has a stable cursor position.
+COURSE_ORDERING = ('-created_at', '-id')
 
 
 def course_list(request):
     """Display all courses, with optional search and filtering."""
     # Start with the base queryset of all courses
-    queryset = Course.objects.all()
+    queryset = Course.objects.select_related('instructor')
 
     # Get search and filter parameters from the GET request
     query = request.GET.get('q', '')
@@ -24,12 +42,9 @@ def course_list(request):
     # --- FIX: APPLY THE FILTERS ---
 
     # 1. Apply the search filter if a query exists
-    # This searches for the query string in both the title and description (case-insensitive)
+    # The search index matches the query against both the title and description
     if query:
-        queryset = queryset.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query)
-        )
+        queryset = get_backend().filter(queryset, query)
 
     # 2. Apply the category filter if a category is selected
     if category:
@@ -37,12 +52,16 @@ def course_list(request):
 
     # --- END OF FIX ---
 
+    # Only the current page of courses is loaded from the database
+    page = keyset_paginate(request, queryset, COURSE_ORDERING)
+
     latest_teacher_app = None
     if request.user.is_authenticated:
         latest_teacher_app = TeacherApplication.objects.filter(user=request.user).order_by("-submitted_at").first()
 
     context = {
-        'courses': queryset,  # Pass the now-filtered queryset to the template
+        'courses': page.object_list,  # Pass the current page of the filtered courses
+        'page': page,
         'categories': Course.Category.choices,
         'current_query': query,
         'current_category': category,
@@ -54,58 +73,42 @@ def course_list(request):
 # courses/views.py
 
 def course_detail(request, pk):
-    course = get_object_or_404(Course, pk=pk)
-    modules = course.modules.all().prefetch_related('videos', 'text_contents')
+    course = get_object_or_404(Course.objects.select_related('instructor'), pk=pk)
+    # Plain-data snapshot of the modules and their content, shared by every visitor
+    curriculum = get_curriculum(course.pk)
+    modules = [dict(module) for module in curriculum['modules']]
 
     # Set default values for guests
     is_enrolled = False
-    completed_content_ids = {}
+    bits = 0
     can_review = False
 
     # Only run user-specific checks if the user is logged in
     if request.user.is_authenticated:
         is_enrolled = Enrollment.objects.filter(user=request.user, course=course).exists()
-
-        progress = UserProgress.objects.filter(user=request.user, course=course)
-        completed_content_ids['text'] = {p.object_id for p in progress if p.content_type.model == 'textcontent'}
-        completed_content_ids['video'] = {p.object_id for p in progress if p.content_type.model == 'coursevideo'}
+        # One compact row instead of every UserProgress row for this course
+        bits = get_progress_bits(request.user.pk, course.pk, curriculum)
 
         # --- THIS IS THE KEY LOGIC FOR REVIEWS ---
-        if is_enrolled:
-            # 1. Count all content items in the course
-            all_content_count = sum(m.videos.count() + m.text_contents.count() for m in modules)
+        # Everything complete AND the user hasn't already reviewed
+        if is_enrolled and is_complete(bits, curriculum):
+            if not course.reviews.filter(user=request.user).exists():
+                can_review = True
 
-            # 2. Count all completed items for this user
-            completed_count = len(completed_content_ids.get('text', [])) + len(completed_content_ids.get('video', []))
-
-            # 3. Check if everything is complete AND the user hasn't already reviewed
-            if all_content_count > 0 and all_content_count == completed_count:
-                if not course.reviews.filter(user=request.user).exists():
-                    can_review = True
-
-    # --- Logic for unlocking modules (remains the same) ---
-    unlocked = True
+    # --- Logic for unlocking modules: a module opens once every earlier one is finished ---
+    completed_content_ids = {'text': set(), 'video': set()}
     for module in modules:
-        module.is_unlocked = unlocked
-        if unlocked:
-            all_content_complete = True
-            for video in module.videos.all():
-                if video.id not in completed_content_ids.get('video', set()):
-                    all_content_complete = False;
-                    break
-            if not all_content_complete: unlocked = False; continue
-
-            for text in module.text_contents.all():
-                if text.id not in completed_content_ids.get('text', set()):
-                    all_content_complete = False;
-                    break
-            unlocked = all_content_complete
+        module['is_unlocked'] = unlocked(bits, module)
+        for key, items in (('text', module['texts']), ('video', module['videos'])):
+            completed_content_ids[key].update(item['id'] for item in items if bits >> item['bit'] & 1)
 
     context = {
         'course': course,
         'modules': modules,
+        'reviews': course.reviews.select_related('user'),
         'is_enrolled': is_enrolled,
         'completed_content_ids': completed_content_ids,
+        'completion_percent': completion_percent(bits, curriculum),
         'review_form': ReviewForm(),
         'can_review': can_review,
     }
@@ -207,9 +210,17 @@ def enroll_course(request, pk):
 @login_required
 def my_courses(request):
     """Display all created courses"""
-    courses = Course.objects.all()
-    enrollments = Enrollment.objects.filter(user=request.user)
-    return render(request, 'courses/my_courses.html', {'enrollments': enrollments})
+    enrollments = Enrollment.objects.filter(user=request.user).select_related('course')
+    page = keyset_paginate(request, enrollments, ('-enrolled_at', '-id'))
+    # The total is only shown on the first page, and needs no query when everything fits on it
+    enrollment_count = None
+    if not page.has_previous:
+        enrollment_count = enrollments.count() if page.has_next else len(page)
+    return render(request, 'courses/my_courses.html', {
+        'enrollments': page.object_list,
+        'enrollment_count': enrollment_count,
+        'page': page,
+    })
 
 
 def category_view(request, category_name):
@@ -220,10 +231,12 @@ def category_view(request, category_name):
     category_display_name = dict(Course.Category.choices).get(category_name)
 
     # Filter the courses that match the category
-    courses_in_category = Course.objects.filter(category=category_name)
+    courses_in_category = Course.objects.filter(category=category_name).select_related('instructor')
+    page = keyset_paginate(request, courses_in_category, COURSE_ORDERING)
 
     context = {
-        'courses': courses_in_category,
+        'courses': page.object_list,
+        'page': page,
         'category_name': category_display_name,
     }
     return render(request, 'courses/category_page.html', context)
@@ -245,10 +258,15 @@ def manage_courses_view(request):
         return redirect("home")
 
     # Get all courses created by this user
-    instructor_courses = Course.objects.filter(instructor=request.user)
+    instructor_courses = Course.objects.filter(instructor=request.user).annotate(
+        module_count=Count('modules', distinct=True),
+        enrollment_count=Count('course_enrollments', distinct=True),
+    )
+    page = keyset_paginate(request, instructor_courses, COURSE_ORDERING)
 
     context = {
-        'courses': instructor_courses,
+        'courses': page.object_list,
+        'page': page,
     }
     return render(request, 'courses/manage_courses.html', context)
 
@@ -311,6 +329,84 @@ def add_video_view(request, module_pk):
     return render(request, 'courses/add_content_form.html', context)
 
 
+def upload_state(upload):
+    state = {
+        'id': str(upload.pk),
+        'offset': upload.received,
+        'size': upload.size,
+        'status': upload.status,
+        'chunk_size': settings.VIDEO_UPLOAD_CHUNK_SIZE,
+        'url': reverse('courses:video_upload', args=[upload.pk]),
+    }
+    # Only once the video exists; a complete upload without it is still being finished
+    if upload.video_id is not None:
+        state['redirect'] = reverse('courses:manage_course_content', args=[upload.module.course_id])
+    return state
+
+
+@login_required
+@require_POST
+def start_video_upload_view(request, module_pk):
+    """
+    Starts a resumable upload: the client then PUTs the file in chunks to
+    the returned url (see video_upload_view) instead of one huge POST.
+    """
+    module = get_object_or_404(Module.objects.select_related('course'), pk=module_pk)
+    if request.user != module.course.instructor:
+        return JsonResponse({'error': "You are not authorized to add content to this course."}, status=403)
+    title = request.POST.get('title', '').strip()
+    filename = request.POST.get('filename', '').strip()
+    if not title or not filename:
+        return JsonResponse({'error': "title and filename are required"}, status=400)
+    try:
+        size = int(request.POST.get('size', ''))
+        upload = start_upload(module, request.user, title, filename, size, request.POST.get('sha256', ''))
+    except ValueError:
+        return JsonResponse({'error': "size must be a number"}, status=400)
+    except UploadError as exc:
+        return JsonResponse({'error': str(exc)}, status=exc.status)
+    return JsonResponse(upload_state(upload), status=201)
+
+
+@login_required
+def video_upload_view(request, upload_id):
+    """
+    GET    -> where to resume (offset), or once the video exists where to go next (redirect)
+    PUT    -> one chunk as the raw body, with Upload-Offset and Upload-Checksum (sha256) headers;
+              the last chunk also verifies the file and creates the CourseVideo
+    DELETE -> abandon the upload
+    """
+    upload = get_object_or_404(VideoUpload, pk=upload_id, uploader=request.user)
+    if request.method == 'GET':
+        return JsonResponse(upload_state(upload))
+    if request.method == 'DELETE':
+        discard_upload(upload)
+        return JsonResponse({'status': 'deleted'})
+    if request.method != 'PUT':
+        return HttpResponseNotAllowed(['GET', 'PUT', 'DELETE'])
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        return JsonResponse({'error': "Upload-Offset and Content-Length are required"}, status=400)
+    try:
+        # The body is read straight from the request stream, never as request.body.
+        # An empty PUT at the end retries a finish that failed after the last chunk landed,
+        # and any PUT to a finished upload just gets its final state again.
+        finished = upload.status == VideoUpload.Status.COMPLETE
+        if not finished and not (length == 0 and offset == upload.received == upload.size):
+            write_chunk(upload, offset, request, length, request.headers.get('Upload-Checksum', ''))
+        if finished or upload.received == upload.size:
+            finish_upload(upload)
+            return JsonResponse(upload_state(upload))
+    except UploadError as exc:
+        state = upload_state(VideoUpload.objects.get(pk=upload.pk))
+        state['error'] = str(exc)
+        return JsonResponse(state, status=exc.status)
+    return JsonResponse(upload_state(upload))
+
+
 @login_required
 def add_text_content_view(request, module_pk):
     module = get_object_or_404(Module, pk=module_pk)
@@ -345,12 +441,15 @@ def mark_as_complete_view(request, content_type_id, pk): # <-- RENAMED HERE
     model_class = content_type.model_class()
     content_object = get_object_or_404(model_class, pk=pk)
     course = content_object.module.course
-    UserProgress.objects.get_or_create(
+    _, created = UserProgress.objects.get_or_create(
         user=request.user,
         course=course,  # This line is crucial
         content_type=content_type,
         object_id=pk
     )
+    if created:
+        # Keep the compact progress bitset in step with the new row
+        record_completion(request.user.pk, course.pk, get_curriculum(course.pk), content_type.pk, int(pk))
     if isinstance(content_object, (CourseVideo, TextContent)):
         return redirect('courses:course_detail', pk=content_object.module.course.pk)
     return redirect('home')
@@ -366,10 +465,69 @@ def add_review_view(request, model_name, pk):
             review = form.save(commit=False)
             review.user = request.user
             review.content_object = obj
-            review.save()
+            # The review and the rating aggregates it updates commit together
+            with transaction.atomic():
+                review.save()
             messages.success(request, "Your review has been submitted. Thank you!")
     return redirect(obj.get_absolute_url())
 
+def can_watch(user, course):
+    return user.pk == course.instructor_id or Enrollment.objects.filter(user=user, course=course).exists()
+
+
+@login_required
+def stream_video_view(request, pk):
+    """
+    Serves a course video to enrolled students and the instructor, with
+    Range support so seeking doesn't restart the download.
+    """
+    video = get_object_or_404(CourseVideo.objects.select_related('module__course'), pk=pk)
+    if not can_watch(request.user, video.module.course):
+        return HttpResponseForbidden("You are not enrolled in this course.")
+    return stream_file(request, video.video_file.name)
+
+
+@login_required
+def hls_file_view(request, pk, name):
+    """Serves the HLS playlists and segments of a video, with the same access rules as the MP4."""
+    video = get_object_or_404(
+        CourseVideo.objects.select_related('module__course'), pk=pk, hls_status=CourseVideo.HLSStatus.READY)
+    if name.startswith('.') or not name.endswith(('.m3u8', '.ts')):
+        raise Http404
+    if not can_watch(request.user, video.module.course):
+        return HttpResponseForbidden("You are not enrolled in this course.")
+    return stream_file(request, f'{output_name(video.pk)}/{name}')
+
+
+@login_required
+@require_POST
+def video_heartbeat_view(request, pk):
+    """
+    Receives the player's position every few seconds. Positions are only
+    buffered here; they reach the database in batches (see courses/heartbeat.py).
+    """
+    try:
+        position = float(request.POST.get('position', ''))
+        duration = float(request.POST.get('duration', ''))
+    except ValueError:
+        return JsonResponse({'error': 'position and duration must be numbers'}, status=400)
+    if not (math.isfinite(position) and math.isfinite(duration)) or position < 0 or duration < 0:
+        return JsonResponse({'error': 'position and duration must be positive'}, status=400)
+
+    key = (request.user.pk, pk)
+    # Access is checked once per flush window; later heartbeats for a buffered video skip the query
+    if key not in heartbeat_buffer:
+        allowed = CourseVideo.objects.filter(pk=pk).filter(
+            Q(module__course__course_enrollments__user=request.user) | Q(module__course__instructor=request.user)
+        ).exists()
+        if not allowed:
+            return JsonResponse({'error': 'not enrolled'}, status=403)
+
+    heartbeat_buffer.record(request.user.pk, pk, min(position, duration), duration)
+    heartbeat_buffer.flush_if_due()
+    return JsonResponse({'status': 'ok'})
+
+
 @login_required
 def content_detail_view(request, content_type_id, pk):
     """
@@ -1,10 +1,29 @@
 # earnings/admin.py
 from django.contrib import admin
-from .models import Earning, Withdrawal
+from .exports import export_as_csv, export_as_jsonl
+from .models import Earning, TeacherBalance, Withdrawal
 
 @admin.register(Withdrawal)
 class WithdrawalAdmin(admin.ModelAdmin):
     list_display = ('teacher', 'amount', 'status', 'requested_at', 'processed_at')
     list_filter = ('status',)
     list_editable = ('status',) # Allows you to change the status directly in the list
-    search_fields = ('teacher__username',)
\ No newline at end of file
+    search_fields = ('teacher__username',)
+    actions = [export_as_csv, export_as_jsonl]
+
+
+@admin.register(Earning)
+class EarningAdmin(admin.ModelAdmin):
+    list_display = ('teacher', 'amount', 'timestamp')
+    list_filter = ('timestamp',)
+    list_select_related = ('teacher',)
+    search_fields = ('teacher__username',)
+    actions = [export_as_csv, export_as_jsonl]
+
+
+@admin.register(TeacherBalance)
+class TeacherBalanceAdmin(admin.ModelAdmin):
+    list_display = ('teacher', 'total_earned', 'total_withdrawn', 'pending', 'available', 'updated_at')
+    search_fields = ('teacher__username',)
+    # Maintained by the Earning/Withdrawal signals; `manage.py rebuild_balances` repairs it
+    readonly_fields = ('teacher', 'total_earned', 'total_withdrawn', 'pending', 'updated_at')
@@ -0,0 +1,35 @@
+# earnings/balance.py
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import TeacherBalance, Withdrawal, rebuild_balance
+
+
+class InsufficientBalance(Exception):
+    pass
+
+
+def get_balance(teacher_id):
+    """The teacher's balance row, built from history the first time it's needed."""
+    balance = TeacherBalance.objects.filter(teacher_id=teacher_id).first()
+    if balance is None:
+        balance = rebuild_balance(teacher_id)
+    return balance
+
+
+def request_withdrawal(teacher_id, amount):
+    """
+    Creates a pending withdrawal, reserving the amount. The balance row stays
+    locked from the check until the reservation is written (by the Withdrawal
+    post_save signal), so two requests at once can't both spend the same money.
+    """
+    amount = Decimal(amount)
+    if amount <= 0:
+        raise InsufficientBalance("Enter an amount greater than zero.")
+    with transaction.atomic():
+        get_balance(teacher_id)
+        balance = TeacherBalance.objects.select_for_update().get(teacher_id=teacher_id)
+        if amount > balance.available:
+            raise InsufficientBalance(f"You can withdraw at most BDT. {balance.available:.2f}.")
+        return Withdrawal.objects.create(teacher_id=teacher_id, amount=amount)
@@ -0,0 +1,118 @@
+# earnings/exports.py
+import csv
+import json
+from operator import attrgetter
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from courses.models import Enrollment
+from live.models import LiveClassEnrollment
+from .models import Earning, Withdrawal
+
+
+class ExportSpec:
+    """What one export reads: the model, the joins it needs and its (header, attribute path) columns."""
+
+    def __init__(self, model, select_related, columns, date_field):
+        self.model = model
+        self.select_related = select_related
+        self.headers = [header for header, _ in columns]
+        self.getters = [attrgetter(path) for _, path in columns]
+        self.date_field = date_field
+
+    def queryset(self):
+        return self.model._default_manager.all()
+
+    def rows(self, queryset, chunk_size=None):
+        """Yields one list of values per row; only chunk_size model instances are in memory at a time."""
+        chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+        queryset = queryset.select_related(*self.select_related).order_by('pk')
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            yield [getter(obj) for getter in self.getters]
+
+
+EXPORTS = {
+    'enrollments': ExportSpec(Enrollment, ['user', 'course__instructor'], [
+        ('id', 'pk'), ('enrolled_at', 'enrolled_at'), ('user_id', 'user_id'), ('username', 'user.username'),
+        ('email', 'user.email'), ('course_id', 'course_id'), ('course', 'course.title'),
+        ('instructor', 'course.instructor.username'), ('amount_paid', 'amount_paid'),
+        ('instructor_share', 'instructor_share'), ('platform_fee', 'platform_fee'),
+    ], 'enrolled_at'),
+    'live_enrollments': ExportSpec(LiveClassEnrollment, ['user', 'live_class__instructor'], [
+        ('id', 'pk'), ('enrolled_at', 'enrolled_at'), ('user_id', 'user_id'), ('username', 'user.username'),
+        ('email', 'user.email'), ('live_class_id', 'live_class_id'), ('live_class', 'live_class.title'),
+        ('instructor', 'live_class.instructor.username'), ('amount_paid', 'amount_paid'),
+        ('instructor_share', 'instructor_share'), ('platform_fee', 'platform_fee'),
+    ], 'enrolled_at'),
+    'earnings': ExportSpec(Earning, ['teacher'], [
+        ('id', 'pk'), ('timestamp', 'timestamp'), ('teacher_id', 'teacher_id'), ('teacher', 'teacher.username'),
+        ('amount', 'amount'), ('source_type_id', 'content_type_id'), ('source_id', 'object_id'),
+    ], 'timestamp'),
+    'withdrawals': ExportSpec(Withdrawal, ['teacher'], [
+        ('id', 'pk'), ('requested_at', 'requested_at'), ('processed_at', 'processed_at'),
+        ('teacher_id', 'teacher_id'), ('teacher', 'teacher.username'), ('amount', 'amount'), ('status', 'status'),
+    ], 'requested_at'),
+}
+
+
+def spec_for_model(model):
+    return next(spec for spec in EXPORTS.values() if spec.model is model)
+
+
+class Echo:
+    """csv.writer target that hands each formatted line straight back instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    # Keep spreadsheets from running titles/usernames as formulas
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        return "'" + value
+    return value
+
+
+def csv_lines(spec, queryset, chunk_size=None):
+    writer = csv.writer(Echo())
+    yield writer.writerow(spec.headers)
+    for row in spec.rows(queryset, chunk_size):
+        yield writer.writerow([csv_cell(value) for value in row])
+
+
+def jsonl_lines(spec, queryset, chunk_size=None):
+    for row in spec.rows(queryset, chunk_size):
+        yield json.dumps(dict(zip(spec.headers, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'jsonl': (jsonl_lines, 'application/x-ndjson'),
+}
+
+
+def export_response(spec, queryset, fmt):
+    """A download that streams rows as they're read, whatever the size of the queryset."""
+    lines, content_type = FORMATS[fmt]
+    response = StreamingHttpResponse(lines(spec, queryset), content_type=content_type)
+    filename = f"{spec.model._meta.model_name}-{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@admin.action(description="Export selected rows as CSV")
+def export_as_csv(modeladmin, request, queryset):
+    return export_response(spec_for_model(queryset.model), queryset, 'csv')
+
+
+@admin.action(description="Export selected rows as JSON lines")
+def export_as_jsonl(modeladmin, request, queryset):
+    return export_response(spec_for_model(queryset.model), queryset, 'jsonl')
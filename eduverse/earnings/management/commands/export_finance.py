@@ -0,0 +1,46 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from earnings.exports import EXPORTS, FORMATS
+
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"{value!r} is not a YYYY-MM-DD date.")
+
+
+class Command(BaseCommand):
+    help = "Streams enrollments, live class enrollments, earnings or withdrawals to a CSV/JSON lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('export', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', '-o', default='-', help="File to write; '-' (default) for stdout.")
+        parser.add_argument('--since', type=parse_date, help="Only rows from this date on (YYYY-MM-DD).")
+        parser.add_argument('--until', type=parse_date, help="Only rows before this date (YYYY-MM-DD).")
+        parser.add_argument('--chunk-size', type=int, default=None, help="Rows fetched per database round trip.")
+
+    def handle(self, *args, **options):
+        spec = EXPORTS[options['export']]
+        queryset = spec.queryset()
+        for option, lookup in (('since', 'gte'), ('until', 'lt')):
+            if options[option]:
+                start_of_day = datetime.datetime.combine(options[option], datetime.time(), timezone.get_current_timezone())
+                queryset = queryset.filter(**{f'{spec.date_field}__{lookup}': start_of_day})
+
+        lines, _ = FORMATS[options['format']]
+        if options['output'] == '-':
+            for line in lines(spec, queryset, options['chunk_size']):
+                self.stdout.write(line, ending='')
+            return
+        written = 0
+        with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+            for line in lines(spec, queryset, options['chunk_size']):
+                output.write(line)
+                written += 1
+        if options['format'] == 'csv':
+            written -= 1  # header
+        self.stderr.write(self.style.SUCCESS(f"Wrote {written} rows to {options['output']}."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from earnings.models import Earning, TeacherBalance, Withdrawal, rebuild_balance
+
+
+class Command(BaseCommand):
+    help = "Recomputes every TeacherBalance row from the Earning and Withdrawal history."
+
+    def handle(self, *args, **options):
+        teacher_ids = set(Earning.objects.values_list('teacher_id', flat=True).distinct())
+        teacher_ids |= set(Withdrawal.objects.values_list('teacher_id', flat=True).distinct())
+        teacher_ids |= set(TeacherBalance.objects.values_list('teacher_id', flat=True))
+        for teacher_id in sorted(teacher_ids):
+            rebuild_balance(teacher_id)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(teacher_ids)} teacher balances."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from earnings.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the daily/monthly earnings rollup tables from the Earning history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teacher', type=int, default=None,
+                            help="Only rebuild this teacher's rows (user id).")
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help="Number of earnings read per query.")
+
+    def handle(self, *args, **options):
+        daily, monthly = rebuild_rollups(teacher_id=options['teacher'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {daily} daily and {monthly} monthly rollup rows."))
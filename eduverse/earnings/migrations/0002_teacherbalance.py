@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('earnings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeacherBalance',
+            fields=[
+                ('teacher', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='balance', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_earned', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_withdrawn', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('pending', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('earnings', '0002_teacherbalance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyEarning',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_type', models.CharField(choices=[('course', 'Course'), ('live', 'Live class'), ('other', 'Other')], max_length=10)),
+                ('product_id', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sales', models.IntegerField(default=0)),
+                ('day', models.DateField()),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('teacher', 'day', 'product_type', 'product_id'), name='unique_daily_earning')],
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyEarning',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_type', models.CharField(choices=[('course', 'Course'), ('live', 'Live class'), ('other', 'Other')], max_length=10)),
+                ('product_id', models.PositiveIntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('sales', models.IntegerField(default=0)),
+                ('month', models.DateField()),
+                ('teacher', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('teacher', 'month', 'product_type', 'product_id'), name='unique_monthly_earning')],
+            },
+        ),
+    ]
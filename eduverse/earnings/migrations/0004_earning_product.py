@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:19
+
+from django.db import migrations, models
+
+
+def populate_earning_products(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Earning = apps.get_model('earnings', 'Earning')
+    sources = (
+        ('courses', 'enrollment', 'course', 'course_id'),
+        ('live', 'liveclassenrollment', 'live', 'live_class_id'),
+    )
+    for app_label, model_name, product_type, field in sources:
+        content_type = ContentType.objects.filter(app_label=app_label, model=model_name).first()
+        if content_type is None:
+            continue
+        Enrollment = apps.get_model(app_label, model_name)
+        earnings = list(Earning.objects.filter(content_type=content_type).values_list('pk', 'object_id'))
+        products = dict(Enrollment.objects.filter(pk__in=[object_id for _, object_id in earnings])
+                        .values_list('pk', field))
+        for pk, object_id in earnings:
+            if object_id in products:
+                Earning.objects.filter(pk=pk).update(product_type=product_type, product_id=products[object_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('courses', '0013_coursevideo_hls_started_at'),
+        ('live', '0007_blob_storage'),
+        ('earnings', '0003_dailyearning_monthlyearning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='earning',
+            name='product_id',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='earning',
+            name='product_type',
+            field=models.CharField(choices=[('course', 'Course'), ('live', 'Live class'), ('other', 'Other')], default='other', max_length=10),
+        ),
+        migrations.RunPython(populate_earning_products, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,22 @@
 # earnings/models.py
+from collections import defaultdict
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import F, Q, Sum
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 
 
+class Product(models.TextChoices):
+    COURSE = 'course', 'Course'
+    LIVE = 'live', 'Live class'
+    OTHER = 'other', 'Other'  # earnings without a source enrollment
+
+
 class Earning(models.Model):
     teacher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
@@ -14,6 +26,10 @@ class Earning(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.SET_NULL, null=True)
     object_id = models.PositiveIntegerField(null=True)
     source_enrollment = GenericForeignKey('content_type', 'object_id')
+    # What was sold, copied from the source when the earning is made, so the
+    # rollups can still find it after the enrollment is gone
+    product_type = models.CharField(max_length=10, choices=Product.choices, default=Product.OTHER)
+    product_id = models.PositiveIntegerField(default=0)  # Course/LiveClass pk; 0 for OTHER
 
     def __str__(self):
         return f"{self.teacher.username} earned {self.amount}"
@@ -32,4 +48,184 @@ class Withdrawal(models.Model):
     processed_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
-        return f"Withdrawal of {self.amount} by {self.teacher.username} ({self.status})"
\ No newline at end of file
+        return f"Withdrawal of {self.amount} by {self.teacher.username} ({self.status})"
+
+
+
+class EarningRollup(models.Model):
+    """Earnings summed per teacher, product and period. See earnings/rollups.py."""
+    Product = Product
+
+    teacher = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    product_type = models.CharField(max_length=10, choices=Product.choices)
+    product_id = models.PositiveIntegerField(default=0)  # Course/LiveClass pk; 0 for OTHER
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    sales = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class DailyEarning(EarningRollup):
+    day = models.DateField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['teacher', 'day', 'product_type', 'product_id'],
+                                               name='unique_daily_earning')]
+
+
+class MonthlyEarning(EarningRollup):
+    month = models.DateField()  # first day of the month
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['teacher', 'month', 'product_type', 'product_id'],
+                                               name='unique_monthly_earning')]
+
+
+class TeacherBalance(models.Model):
+    """
+    A teacher's running totals, kept current by the Earning/Withdrawal signals
+    below so the earnings page reads one row instead of aggregating history.
+    Withdrawals lock this row while they check and reserve funds.
+    """
+    teacher = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='balance')
+    total_earned = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_withdrawn = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # approved withdrawals
+    pending = models.DecimalField(max_digits=12, decimal_places=2, default=0)  # reserved by pending withdrawals
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.teacher.username}: {self.available} available"
+
+    @property
+    def available(self):
+        return self.total_earned - self.total_withdrawn - self.pending
+
+
+def rebuild_balance(teacher_id):
+    """Recomputes a teacher's balance row from the full Earning/Withdrawal history (upsert)."""
+    earned = Earning.objects.filter(teacher_id=teacher_id).aggregate(total=Sum('amount'))['total']
+    withdrawals = Withdrawal.objects.filter(teacher_id=teacher_id).aggregate(
+        withdrawn=Sum('amount', filter=Q(status=Withdrawal.Status.APPROVED)),
+        pending=Sum('amount', filter=Q(status=Withdrawal.Status.PENDING)),
+    )
+    balance = TeacherBalance(teacher_id=teacher_id, total_earned=earned or 0,
+                             total_withdrawn=withdrawals['withdrawn'] or 0, pending=withdrawals['pending'] or 0)
+    TeacherBalance.objects.bulk_create(
+        [balance], update_conflicts=True, unique_fields=['teacher'],
+        update_fields=['total_earned', 'total_withdrawn', 'pending', 'updated_at'],
+    )
+    return balance
+
+
+def apply_balance_change(teacher_id, earned=0, withdrawn=0, pending=0):
+    """
+    Adds to a teacher's totals with F() updates. A teacher without a row yet
+    gets one built from history, which already includes the change.
+    """
+    if not (earned or withdrawn or pending):
+        return
+    updated = TeacherBalance.objects.filter(teacher_id=teacher_id).update(
+        total_earned=F('total_earned') + earned,
+        total_withdrawn=F('total_withdrawn') + withdrawn,
+        pending=F('pending') + pending,
+    )
+    if not updated:
+        rebuild_balance(teacher_id)
+
+
+def bulk_create_earnings(earnings):
+    """
+    Earning.objects.bulk_create() plus what the post_save receivers below
+    would have done row by row: one balance and one rollup update per teacher/product.
+    """
+    from .rollups import assign_products
+    assign_products(earnings)
+    Earning.objects.bulk_create(earnings)
+    earned = defaultdict(Decimal)
+    for earning in earnings:
+        earned[earning.teacher_id] += Decimal(earning.amount)
+    for teacher_id, amount in earned.items():
+        apply_balance_change(teacher_id, earned=amount)
+    from .rollups import apply_earnings
+    apply_earnings(earnings)
+    return earnings
+
+
+def withdrawal_effect(status, amount):
+    """(withdrawn, pending) a withdrawal in this status adds to the balance. Rejected ones add nothing."""
+    if status == Withdrawal.Status.APPROVED:
+        return amount, Decimal(0)
+    if status == Withdrawal.Status.PENDING:
+        return Decimal(0), amount
+    return Decimal(0), Decimal(0)
+
+
+def deleted_with_teacher(origin):
+    # The teacher's own delete cascades here after their balance and rollup rows are already gone;
+    # adjusting them would recreate rows for a user that is about to disappear
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+    return model._meta.label == settings.AUTH_USER_MODEL
+
+
+@receiver(pre_save, sender=Earning)
+def remember_earning_product(sender, instance, **kwargs):
+    if instance._state.adding:
+        from .rollups import assign_products
+        assign_products([instance])
+
+
+@receiver(post_save, sender=Earning)
+def add_earning_to_balance(sender, instance, created, **kwargs):
+    if created:
+        apply_balance_change(instance.teacher_id, earned=instance.amount)
+
+
+@receiver(post_delete, sender=Earning)
+def remove_earning_from_balance(sender, instance, origin=None, **kwargs):
+    if deleted_with_teacher(origin):
+        return
+    apply_balance_change(instance.teacher_id, earned=-instance.amount)
+
+
+@receiver(post_save, sender=Earning)
+def add_earning_to_rollups(sender, instance, created, **kwargs):
+    if created:
+        from .rollups import apply_earning
+        apply_earning(instance, 1)
+
+
+@receiver(post_delete, sender=Earning)
+def remove_earning_from_rollups(sender, instance, origin=None, **kwargs):
+    if deleted_with_teacher(origin):
+        return
+    from .rollups import apply_earning
+    apply_earning(instance, -1)
+
+
+@receiver(pre_save, sender=Withdrawal)
+def remember_previous_withdrawal(sender, instance, **kwargs):
+    # Approving/rejecting moves the amount between pending and withdrawn (or back to available)
+    instance._previous = None
+    if instance.pk:
+        instance._previous = Withdrawal.objects.filter(pk=instance.pk).values_list('status', 'amount').first()
+
+
+@receiver(post_save, sender=Withdrawal)
+def update_balance_on_withdrawal(sender, instance, created, **kwargs):
+    withdrawn, pending = withdrawal_effect(instance.status, Decimal(instance.amount))
+    if instance._previous is not None:
+        old_withdrawn, old_pending = withdrawal_effect(*instance._previous)
+        withdrawn, pending = withdrawn - old_withdrawn, pending - old_pending
+    apply_balance_change(instance.teacher_id, withdrawn=withdrawn, pending=pending)
+
+
+@receiver(post_delete, sender=Withdrawal)
+def remove_withdrawal_from_balance(sender, instance, origin=None, **kwargs):
+    if deleted_with_teacher(origin):
+        return
+    withdrawn, pending = withdrawal_effect(instance.status, instance.amount)
+    apply_balance_change(instance.teacher_id, withdrawn=-withdrawn, pending=-pending)
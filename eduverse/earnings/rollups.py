@@ -0,0 +1,156 @@
+# earnings/rollups.py
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from courses.models import Enrollment
+from live.models import LiveClassEnrollment
+from .models import DailyEarning, Earning, EarningRollup, MonthlyEarning
+
+Product = EarningRollup.Product
+
+# Enrollment model -> (product type, field holding the product id)
+ENROLLMENT_PRODUCTS = {
+    Enrollment: (Product.COURSE, 'course_id'),
+    LiveClassEnrollment: (Product.LIVE, 'live_class_id'),
+}
+
+
+def cents(value):
+    # SQLite returns sums of decimals without their scale
+    return Decimal(value or 0).quantize(Decimal('0.01'))
+
+
+def periods(timestamp):
+    """(day, first day of the month) an earning counts towards, in the site's time zone."""
+    day = timezone.localdate(timestamp)
+    return day, day.replace(day=1)
+
+
+def resolve_products(pairs):
+    """
+    Maps (content_type_id, object_id) of earning sources to (product type, product id),
+    with one query per enrollment model. Missing sources map to (OTHER, 0).
+    """
+    wanted = defaultdict(set)
+    for content_type_id, object_id in pairs:
+        if content_type_id and object_id:
+            wanted[content_type_id].add(object_id)
+    products = {}
+    for model, (product_type, field) in ENROLLMENT_PRODUCTS.items():
+        content_type_id = ContentType.objects.get_for_model(model).pk
+        if wanted.get(content_type_id):
+            rows = model.objects.filter(pk__in=wanted[content_type_id]).values_list('pk', field)
+            products.update({(content_type_id, pk): (product_type, product_id) for pk, product_id in rows})
+    return {pair: products.get(pair, (Product.OTHER, 0)) for pair in pairs}
+
+
+def product_of(earning):
+    """(product type, product id) of an earning's source enrollment, resolved through the database if needed."""
+    source_field = Earning._meta.get_field('source_enrollment')
+    if source_field.is_cached(earning):
+        enrollment = earning.source_enrollment
+        if type(enrollment) in ENROLLMENT_PRODUCTS:
+            product_type, field = ENROLLMENT_PRODUCTS[type(enrollment)]
+            return product_type, getattr(enrollment, field)
+    pair = (earning.content_type_id, earning.object_id)
+    return resolve_products([pair])[pair]
+
+
+def assign_products(earnings):
+    """Fills in product_type/product_id of new earnings from their sources, where not set already."""
+    for earning in earnings:
+        if earning.product_type == Product.OTHER and earning.object_id:
+            earning.product_type, earning.product_id = product_of(earning)
+
+
+def add_to_rollup(model, key, amount, sales):
+    """F() increment of one rollup row, creating it on first use."""
+    changes = {'amount': F('amount') + amount, 'sales': F('sales') + sales}
+    if model.objects.filter(**key).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, amount=amount, sales=sales)
+    except IntegrityError:
+        # Another sale created the row first
+        model.objects.filter(**key).update(**changes)
+
+
+def apply_earning(earning, sign):
+    """Adds (sign=1) or removes (sign=-1) one earning from its daily and monthly rows."""
+    day, month = periods(earning.timestamp)
+    key = {'teacher_id': earning.teacher_id, 'product_type': earning.product_type, 'product_id': earning.product_id}
+    amount = Decimal(earning.amount) * sign
+    add_to_rollup(DailyEarning, {**key, 'day': day}, amount, sign)
+    add_to_rollup(MonthlyEarning, {**key, 'month': month}, amount, sign)
+
+
+def apply_earnings(earnings):
+    """apply_earning() for many new earnings at once: one increment per rollup row they touch."""
+    totals = defaultdict(lambda: [Decimal(0), 0])
+    for earning in earnings:
+        row = totals[(earning.teacher_id, earning.product_type, earning.product_id, *periods(earning.timestamp))]
+        row[0] += Decimal(earning.amount)
+        row[1] += 1
+    for (teacher_id, product_type, product_id, day, month), (amount, sales) in totals.items():
+        key = {'teacher_id': teacher_id, 'product_type': product_type, 'product_id': product_id}
+        add_to_rollup(DailyEarning, {**key, 'day': day}, amount, sales)
+        add_to_rollup(MonthlyEarning, {**key, 'month': month}, amount, sales)
+
+
+def rebuild_rollups(teacher_id=None, batch_size=2000):
+    """
+    Recomputes the rollup tables from every Earning (optionally one teacher's).
+    Earnings are read in batches and summed in memory; the number of rollup
+    rows, not earnings, bounds the memory used. Returns (daily rows, monthly rows).
+    """
+    earnings = Earning.objects.order_by('pk').values_list('pk', 'teacher_id', 'amount', 'timestamp',
+                                                           'product_type', 'product_id')
+    if teacher_id is not None:
+        earnings = earnings.filter(teacher_id=teacher_id)
+    daily = defaultdict(lambda: [Decimal(0), 0])
+    monthly = defaultdict(lambda: [Decimal(0), 0])
+    last_pk = 0
+    while True:
+        batch = list(earnings.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            break
+        last_pk = batch[-1][0]
+        for _, teacher, amount, timestamp, product_type, product_id in batch:
+            day, month = periods(timestamp)
+            for totals, period in ((daily, day), (monthly, month)):
+                row = totals[(teacher, product_type, product_id, period)]
+                row[0] += amount
+                row[1] += 1
+
+    with transaction.atomic():
+        for model, totals, period_field in ((DailyEarning, daily, 'day'), (MonthlyEarning, monthly, 'month')):
+            stale = model.objects.all() if teacher_id is None else model.objects.filter(teacher_id=teacher_id)
+            stale.delete()
+            model.objects.bulk_create([
+                model(teacher_id=teacher, product_type=product_type, product_id=product_id,
+                      amount=amount, sales=sales, **{period_field: period})
+                for (teacher, product_type, product_id, period), (amount, sales) in totals.items()
+            ], batch_size=batch_size)
+    return len(daily), len(monthly)
+
+
+def earnings_series(teacher_id, period, start, end, product=None):
+    """
+    Totals per day or month between start and end (inclusive) from the rollup
+    tables, oldest first: [{'date': date, 'amount': Decimal, 'sales': int}, ...].
+    `product` is an optional (product type, product id) filter.
+    """
+    model, field = (MonthlyEarning, 'month') if period == 'month' else (DailyEarning, 'day')
+    if period == 'month':
+        start = start.replace(day=1)
+    rows = model.objects.filter(teacher_id=teacher_id, **{f'{field}__range': (start, end)})
+    if product is not None:
+        rows = rows.filter(product_type=product[0], product_id=product[1])
+    rows = rows.values(field).annotate(total=Sum('amount'), count=Sum('sales')).order_by(field)
+    return [{'date': row[field], 'amount': cents(row['total']), 'sales': row['count']} for row in rows if row['count']]
@@ -1,3 +1,201 @@
-from django.test import TestCase
+import csv
+import datetime
+import io
+import json
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.models import Enrollment
+from courses.tests import QueryBudgetMixin, make_teacher, make_user, seed_courses
+from .exports import EXPORTS, csv_lines
+from .balance import InsufficientBalance, get_balance, request_withdrawal
+from .models import DailyEarning, Earning, MonthlyEarning, TeacherBalance, Withdrawal, rebuild_balance
+from .rollups import rebuild_rollups
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid')
+class EarningsViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        Earning.objects.bulk_create([Earning(teacher=cls.teacher, amount=Decimal('80.00')) for _ in range(500)])
+        Withdrawal.objects.bulk_create([
+            Withdrawal(teacher=cls.teacher, amount=Decimal('10.00'), status=status)
+            for status in [Withdrawal.Status.APPROVED] * 20 + [Withdrawal.Status.PENDING] * 5
+        ])
+
+    def test_earnings_page(self):
+        self.client.force_login(self.teacher)
+        # First view builds the balance row from history (the rows above skipped the signals)
+        response = self.assertWithinBudget(reverse('earnings:earnings_page'), max_queries=10)
+        self.assertEqual(response.context['current_balance'], Decimal('39750.00'))
+        # From then on it's one row read instead of the aggregates
+        response = self.assertWithinBudget(reverse('earnings:earnings_page'), max_queries=7)
+        self.assertEqual(response.context['pending_withdrawal'], Decimal('50.00'))
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid')
+class TeacherBalanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+
+    def balance(self):
+        return TeacherBalance.objects.get(teacher=self.teacher)
+
+    def test_balance_follows_earnings_and_withdrawals(self):
+        earning = Earning.objects.create(teacher=self.teacher, amount=Decimal('100.00'))
+        Earning.objects.create(teacher=self.teacher, amount=Decimal('60.00'))
+        first = request_withdrawal(self.teacher.pk, '50')
+        second = request_withdrawal(self.teacher.pk, '30')
+        self.assertEqual((self.balance().pending, self.balance().available), (80, 80))
+
+        first.status = Withdrawal.Status.APPROVED
+        first.save()
+        second.status = Withdrawal.Status.REJECTED
+        second.save()
+        earning.delete()
+        balance = self.balance()
+        self.assertEqual((balance.total_earned, balance.total_withdrawn, balance.pending), (60, 50, 0))
+        rebuilt = rebuild_balance(self.teacher.pk)
+        self.assertEqual((rebuilt.total_earned, rebuilt.total_withdrawn, rebuilt.pending), (60, 50, 0))
+
+    def test_withdrawals_cannot_overdraw(self):
+        Earning.objects.create(teacher=self.teacher, amount=Decimal('100.00'))
+        request_withdrawal(self.teacher.pk, '70')
+        with self.assertRaises(InsufficientBalance):
+            request_withdrawal(self.teacher.pk, '31')
+        with self.assertRaises(InsufficientBalance):
+            request_withdrawal(self.teacher.pk, '-5')
+
+        self.client.force_login(self.teacher)
+        response = self.client.post(reverse('earnings:earnings_page'), {'amount': '30.01'}, follow=True)
+        self.assertContains(response, 'at most BDT. 30.00')
+        self.client.post(reverse('earnings:earnings_page'), {'amount': '30'})
+        self.assertEqual(get_balance(self.teacher.pk).available, 0)
+        self.assertEqual(Withdrawal.objects.count(), 2)
+
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid')
+class EarningRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.courses = seed_courses(cls.teacher, 2)
+        # Three sales spread over two months, plus one earning with no source
+        sales = []
+        for i, (course, day) in enumerate([(cls.courses[0], '2025-01-05'), (cls.courses[0], '2025-01-05'),
+                                           (cls.courses[1], '2025-02-10')]):
+            enrollment = Enrollment.objects.create(user=make_user(f'student{i}'), course=course, amount_paid=100)
+            sales.append((Earning.objects.create(teacher=cls.teacher, amount=80, source_enrollment=enrollment), day))
+        sales.append((Earning.objects.create(teacher=cls.teacher, amount=5), '2025-02-11'))
+        for earning, day in sales:
+            Earning.objects.filter(pk=earning.pk).update(
+                timestamp=datetime.datetime.fromisoformat(f'{day}T10:00:00+00:00'))
+        # The rows were written with today's date before the timestamps moved
+        rebuild_rollups()
+
+    def chart(self, **params):
+        self.client.force_login(self.teacher)
+        return self.client.get(reverse('earnings:earnings_chart'), params)
+
+    def test_rollups_are_updated_on_each_sale(self):
+        course = self.courses[1]
+        enrollment = Enrollment.objects.create(user=make_user('late'), course=course, amount_paid=100)
+        earning = Earning.objects.create(teacher=self.teacher, amount=80, source_enrollment=enrollment)
+        today = timezone.localdate()
+        row = DailyEarning.objects.get(teacher=self.teacher, day=today, product_id=course.pk)
+        self.assertEqual((row.product_type, row.amount, row.sales), ('course', 80, 1))
+        earning.delete()
+        row = MonthlyEarning.objects.get(teacher=self.teacher, month=today.replace(day=1), product_id=course.pk)
+        self.assertEqual((row.amount, row.sales), (0, 0))
+
+    def test_earning_removed_after_its_enrollment_leaves_the_right_rollup(self):
+        course = self.courses[0]
+        enrollment = Enrollment.objects.create(user=make_user('refunded'), course=course, amount_paid=100)
+        earning = Earning.objects.create(teacher=self.teacher, amount=80, source_enrollment=enrollment)
+        self.assertEqual((earning.product_type, earning.product_id), ('course', course.pk))
+        enrollment.delete()
+        Earning.objects.get(pk=earning.pk).delete()
+        month = timezone.localdate().replace(day=1)
+        row = MonthlyEarning.objects.get(teacher=self.teacher, month=month, product_id=course.pk)
+        self.assertEqual((row.amount, row.sales), (0, 0))
+        self.assertFalse(MonthlyEarning.objects.filter(teacher=self.teacher, month=month, product_type='other')
+                         .exclude(sales=0).exists())
+        # The rebuild agrees with the incremental updates
+        before = set(MonthlyEarning.objects.exclude(sales=0).values_list('product_type', 'product_id', 'amount'))
+        rebuild_rollups()
+        self.assertEqual(set(MonthlyEarning.objects.values_list('product_type', 'product_id', 'amount')), before)
+
+    def test_monthly_chart(self):
+        data = self.chart(start='2025-01-01', end='2025-03-31').json()
+        self.assertEqual(data['points'], [
+            {'date': '2025-01-01', 'amount': '160.00', 'sales': 2},
+            {'date': '2025-02-01', 'amount': '85.00', 'sales': 2},
+        ])
+        self.assertEqual([(p['title'], p['amount']) for p in data['products']],
+                         [('Course 0', '160.00'), ('Course 1', '80.00'), ('Other', '5.00')])
+
+    def test_daily_chart_for_one_product(self):
+        data = self.chart(period='day', start='2025-01-01', end='2025-03-31',
+                          product=f'course:{self.courses[1].pk}').json()
+        self.assertEqual(data['points'], [{'date': '2025-02-10', 'amount': '80.00', 'sales': 1}])
+
+        self.assertEqual(self.chart(period='week').status_code, 400)
+        self.assertEqual(self.chart(period='day', start='2020-01-01', end='2025-01-01').status_code, 400)
+        self.assertEqual(self.chart(product='course').status_code, 400)
+        self.client.force_login(make_user('other'))
+        self.assertEqual(self.client.get(reverse('earnings:earnings_chart'), {'start': '2025-01-01'}).json()['points'], [])
+
+
+
+class FinanceExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        course = seed_courses(cls.teacher, 1)[0]
+        course.title = '=HYPERLINK("x")'
+        course.save()
+        for i in range(5):
+            Enrollment.objects.create(user=make_user(f'student{i}'), course=course, amount_paid=100)
+        Withdrawal.objects.create(teacher=cls.teacher, amount=Decimal('25.50'))
+
+    def test_csv_rows_come_from_one_query(self):
+        spec = EXPORTS['enrollments']
+        with self.assertNumQueries(1):
+            rows = list(csv.reader(io.StringIO(''.join(csv_lines(spec, spec.queryset(), chunk_size=2)))))
+        self.assertEqual(rows[0][:4], ['id', 'enrolled_at', 'user_id', 'username'])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual((rows[1][3], rows[1][6], rows[1][7]), ('student0', '\'=HYPERLINK("x")', 'teacher'))
+
+    @override_settings(SESSION_COOKIE_NAME='admin_sessionid')
+    def test_admin_action_streams_selected_rows(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin)
+        selected = list(Enrollment.objects.order_by('pk').values_list('pk', flat=True)[:2])
+        response = self.client.post(reverse('admin:courses_enrollment_changelist'),
+                                    {'action': 'export_as_jsonl', '_selected_action': selected})
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="enrollment-', response['Content-Disposition'])
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], selected)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('export_finance', 'withdrawals', '--format', 'jsonl', stdout=out)
+        row = json.loads(out.getvalue())
+        self.assertEqual((row['teacher'], row['amount'], row['status']), ('teacher', '25.50', 'pending'))
+
+        out = io.StringIO()
+        call_command('export_finance', 'withdrawals', '--since', '2999-01-01', stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), ['id,requested_at,processed_at,teacher_id,teacher,amount,status'])
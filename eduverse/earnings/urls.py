@@ -4,4 +4,5 @@ from . import views
 app_name = 'earnings'
 urlpatterns = [
     path('', views.earnings_view, name='earnings_page'),
+    path('chart/', views.earnings_chart_view, name='earnings_chart'),
 ]
\ No newline at end of file
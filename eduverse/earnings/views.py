@@ -1,8 +1,24 @@
 # earnings/views.py
+import datetime
+from decimal import Decimal, InvalidOperation
+
 from django.shortcuts import render, redirect
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db.models import Sum
-from .models import Earning, Withdrawal
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from courses.models import Course
+from live.models import LiveClass
+from .balance import InsufficientBalance, get_balance, request_withdrawal
+from .models import DailyEarning, EarningRollup, Earning, MonthlyEarning, Withdrawal
+from .rollups import cents, earnings_series
+
+# Default window of the chart endpoint, and the longest daily range it serves
+DEFAULT_CHART_DAYS = 90
+DEFAULT_CHART_MONTHS = 24
+MAX_CHART_DAYS = 731
 
 
 @login_required
@@ -11,29 +27,88 @@ def earnings_view(request):
     if request.method == 'POST':
         amount = request.POST.get('amount')
         if amount:
-            Withdrawal.objects.create(teacher=request.user, amount=amount)
-            # Add a success message
+            try:
+                request_withdrawal(request.user.id, Decimal(amount).quantize(Decimal('0.01')))
+                messages.success(request, "Your withdrawal request has been submitted.")
+            except InsufficientBalance as e:
+                messages.error(request, str(e))
+            except InvalidOperation:
+                messages.error(request, "Enter a valid amount.")
             return redirect('earnings:earnings_page')
 
-    # Calculate totals
-    total_earnings = Earning.objects.filter(teacher=request.user).aggregate(total=Sum('amount'))['total'] or 0
-    total_withdrawn = Withdrawal.objects.filter(teacher=request.user, status='approved').aggregate(total=Sum('amount'))[
-                          'total'] or 0
-    pending_withdrawal = \
-    Withdrawal.objects.filter(teacher=request.user, status='pending').aggregate(total=Sum('amount'))['total'] or 0
-
-    current_balance = total_earnings - total_withdrawn - pending_withdrawal
+    # Totals come from the teacher's balance row (see TeacherBalance)
+    balance = get_balance(request.user.id)
 
     # Get transaction history
     recent_earnings = Earning.objects.filter(teacher=request.user).order_by('-timestamp')[:10]
     withdrawal_history = Withdrawal.objects.filter(teacher=request.user).order_by('-requested_at')
+    # Last 12 months, newest first, from the monthly rollup
+    today = timezone.localdate()
+    monthly_earnings = earnings_series(request.user.id, 'month', months_before(today, 11), today)[::-1]
 
     context = {
-        'total_earnings': total_earnings,
-        'total_withdrawn': total_withdrawn,
-        'current_balance': current_balance,
-        'pending_withdrawal': pending_withdrawal,
+        'total_earnings': balance.total_earned,
+        'total_withdrawn': balance.total_withdrawn,
+        'current_balance': balance.available,
+        'pending_withdrawal': balance.pending,
         'recent_earnings': recent_earnings,
         'withdrawal_history': withdrawal_history,
+        'monthly_earnings': monthly_earnings,
+    }
+    return render(request, 'earnings/earnings_page.html', context)
+
+
+def months_before(day, months):
+    month_index = day.year * 12 + day.month - 1 - months
+    return datetime.date(month_index // 12, month_index % 12 + 1, 1)
+
+
+@require_GET
+@login_required
+def earnings_chart_view(request):
+    """
+    Time series of the signed-in teacher's earnings, read from the rollup tables:
+    ?period=day|month&start=2025-01-01&end=2025-12-31&product=course:12
+    """
+    period = request.GET.get('period', 'month')
+    if period not in ('day', 'month'):
+        return JsonResponse({'error': "period must be 'day' or 'month'"}, status=400)
+    try:
+        end = datetime.date.fromisoformat(request.GET['end']) if 'end' in request.GET else timezone.localdate()
+        if 'start' in request.GET:
+            start = datetime.date.fromisoformat(request.GET['start'])
+        elif period == 'day':
+            start = end - datetime.timedelta(days=DEFAULT_CHART_DAYS - 1)
+        else:
+            start = months_before(end, DEFAULT_CHART_MONTHS - 1)
+        product = None
+        if request.GET.get('product'):
+            product_type, product_id = request.GET['product'].split(':')
+            if product_type not in EarningRollup.Product.values:
+                raise ValueError(product_type)
+            product = (product_type, int(product_id))
+    except ValueError:
+        return JsonResponse({'error': "Use YYYY-MM-DD dates and product=<type>:<id>."}, status=400)
+    if start > end or (period == 'day' and (end - start).days >= MAX_CHART_DAYS):
+        return JsonResponse({'error': f"Daily ranges are limited to {MAX_CHART_DAYS} days."}, status=400)
+
+    points = earnings_series(request.user.id, period, start, end, product)
+
+    # Per-product totals over the same range, for the chart legend
+    model, field = (MonthlyEarning, 'month') if period == 'month' else (DailyEarning, 'day')
+    range_start = start.replace(day=1) if period == 'month' else start
+    totals = model.objects.filter(teacher=request.user, **{f'{field}__range': (range_start, end)}) \
+        .values('product_type', 'product_id').annotate(amount=Sum('amount'), sales=Sum('sales')) \
+        .order_by('-amount')
+    titles = {
+        EarningRollup.Product.COURSE: dict(Course.objects.filter(
+            pk__in=[t['product_id'] for t in totals if t['product_type'] == 'course']).values_list('pk', 'title')),
+        EarningRollup.Product.LIVE: dict(LiveClass.objects.filter(
+            pk__in=[t['product_id'] for t in totals if t['product_type'] == 'live']).values_list('pk', 'title')),
     }
-    return render(request, 'earnings/earnings_page.html', context)
\ No newline at end of file
+    products = [
+        {'type': t['product_type'], 'id': t['product_id'], 'amount': cents(t['amount']), 'sales': t['sales'],
+         'title': titles.get(t['product_type'], {}).get(t['product_id'], 'Other')}
+        for t in totals if t['sales']
+    ]
+    return JsonResponse({'period': period, 'start': start, 'end': end, 'points': points, 'products': products})
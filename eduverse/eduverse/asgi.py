@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eduverse.settings')
 
 application = get_asgi_application()
+
+# Serving processes keep the search typeahead index warm in the background
+from search.suggest import start_suggestion_refresher  # noqa: E402
+
+start_suggestion_refresher()
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.humanize',
     'accounts',
     'teachers',
     'courses',
@@ -44,11 +45,18 @@ INSTALLED_APPS = [
     'live',
     'messaging',
     'earnings',
+    'search',
+    'thumbnails',
+    'mediastore',
+    'assets',
+    'metrics',
 
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Answers /static/ requests before sessions/auth run (assets/middleware.py)
+    'assets.middleware.StaticAssetMiddleware',
 
     # 👇 Put your custom middleware *before* SessionMiddleware
     'accounts.middleware.AdminSeparateSessionMiddleware',
@@ -88,6 +96,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Concurrent checkouts read then write in one transaction; IMMEDIATE takes the write lock up
+        # front so they queue (for up to `timeout` seconds) instead of failing with "database is locked".
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -136,6 +150,16 @@ STATICFILES_DIRS = [
 
 # This is the folder where Django will collect all static files for production
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# collectstatic writes content-hashed copies (custom.3f2a9c1b4d5e.css) plus .gz/.br variants of text
+# files; `pip install brotli` to get the .br ones. StaticAssetMiddleware serves STATIC_ROOT, hashed
+# files as immutable and the rest for STATIC_CACHE_MAX_AGE seconds.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'assets.storage.CompressedManifestStaticFilesStorage'},
+}
+STATIC_COMPRESS_MIN_SIZE = 256  # bytes; smaller files aren't worth compressing
+STATIC_CACHE_MAX_AGE = 60
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 from decouple import config
@@ -160,5 +184,103 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
+# Per-process cache by default. Point this at a shared backend (Redis/Memcached)
+# in production so signal-based invalidation reaches every worker.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'eduverse',
+    }
+}
+
+# Homepage featured carousels: how many items each shows, and how long the cached copy lives
+HOMEPAGE_CAROUSEL_SIZE = 12
+HOMEPAGE_CACHE_TIMEOUT = 60 * 15
+# Curriculum snapshots are invalidated on every module/content change, so they can live long.
+CURRICULUM_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Video heartbeats are buffered per process and written in batches every HEARTBEAT_FLUSH_INTERVAL seconds.
+# A video counts as watched once the position passes HEARTBEAT_COMPLETE_RATIO of its duration.
+HEARTBEAT_FLUSH_INTERVAL = 10
+HEARTBEAT_FLUSH_THREAD = True  # also flush from a timer thread, not only when the next heartbeat arrives
+HEARTBEAT_BATCH_SIZE = 500
+HEARTBEAT_COMPLETE_RATIO = 0.9
+
+# Course videos are served through courses:stream_video, which checks enrollment.
+# Set VIDEO_SENDFILE_BACKEND to 'nginx' (X-Accel-Redirect) or 'xsendfile' (Apache/lighttpd)
+# in production so the front server sends the bytes; None streams them from Django.
+VIDEO_SENDFILE_BACKEND = None
+VIDEO_ACCEL_REDIRECT_PREFIX = '/protected-media/'  # nginx `internal` location aliased to MEDIA_ROOT
+VIDEO_STREAM_CHUNK_SIZE = 64 * 1024
+
+# HLS packaging of uploaded videos (courses/packaging.py). Needs an ffmpeg binary with libx264;
+# without one, videos stay 'pending' and play from the MP4 until `manage.py package_videos` runs.
+FFMPEG_BINARY = 'ffmpeg'
+HLS_SEGMENT_SECONDS = 6
+HLS_WORKERS = 1  # background packaging threads per process
+HLS_TIMEOUT = 60 * 60  # seconds before an ffmpeg run is killed
+HLS_STALE_AFTER = 2 * HLS_TIMEOUT  # seconds 'processing' before package_videos assumes the worker died
+
+# Video duration/resolution is read once after upload (courses/probe.py) and summed into
+# Module/Course.total_duration. Without ffprobe only MP4/MOV headers can be read.
+# `manage.py probe_videos` backfills, `manage.py recompute_video_totals` repairs drifted totals.
+FFPROBE_BINARY = 'ffprobe'
+
+# Resized WebP/JPEG copies of course, live class and profile images, stored next to the originals.
+# After changing the widths, run `manage.py generate_thumbnails --force`.
+THUMBNAIL_WIDTHS = (320, 640, 960)
+THUMBNAIL_QUALITY = 80
+
+# Resumable chunked video uploads. Parts are assembled in VIDEO_UPLOAD_TEMP_DIR and moved into
+# MEDIA_ROOT once complete, so keep it on the same filesystem. Stale parts are removed by
+# `manage.py clean_video_uploads` after VIDEO_UPLOAD_EXPIRY seconds.
+VIDEO_UPLOAD_TEMP_DIR = os.path.join(BASE_DIR, 'upload_parts')
+VIDEO_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+VIDEO_UPLOAD_MAX_SIZE = 5 * 1024 ** 3
+VIDEO_UPLOAD_EXPIRY = 60 * 60 * 24
+
+# Course/live thumbnails, profile pictures and course videos are stored once per distinct content
+# under MEDIA_ROOT/blobs/ (mediastore app). Unreferenced blobs are deleted by `manage.py collect_blobs`
+# once they have been unused for BLOB_GC_GRACE seconds.
+BLOB_GC_GRACE = 60 * 60
+
+# Catalog search. Use 'search.backends.DatabaseBackend' on databases without FTS5.
+SEARCH_BACKEND = 'search.backends.SQLiteFTSBackend'
+SEARCH_RESULT_LIMIT = 100
+# Typeahead prefix index: entry cap (bounds memory) and rebuild interval in seconds. Serving processes
+# build it at startup and rebuild it from a background thread (SUGGEST_INDEX_THREAD).
+SUGGEST_MAX_ENTRIES = 200_000
+SUGGEST_INDEX_TTL = 300
+SUGGEST_INDEX_THREAD = True
+
+# Finance exports (earnings/exports.py, `manage.py export_finance`, admin "Export" actions)
+# stream rows; this many model instances are fetched per database round trip.
+EXPORT_CHUNK_SIZE = 2000
+
+# The admin dashboard (metrics app) reads precomputed totals that enrollment/progress signals keep
+# current. Run `manage.py reconcile_metrics` once after deploying, then nightly (cron) to correct
+# any drift from bulk writes.
+
 STORE_ID = config('STORE_ID')
-STORE_PASSWORD = config('STORE_PASSWORD')
\ No newline at end of file
+STORE_PASSWORD = config('STORE_PASSWORD')
+# SSLCommerz calls go through payments.gateway: one pooled keep-alive session per process,
+# (connect, read) timeouts in seconds, GATEWAY_MAX_RETRIES retries with jittered backoff, and a
+# circuit breaker that fails checkouts fast for GATEWAY_BREAKER_RESET seconds after
+# GATEWAY_BREAKER_THRESHOLD failures in a row. Use https://securepay.sslcommerz.com in production.
+# `manage.py fake_gateway` runs a local stand-in to point this at; `manage.py bench_checkout` load-tests
+# checkout against one.
+SSLCOMMERZ_BASE_URL = config('SSLCOMMERZ_BASE_URL', default='https://sandbox.sslcommerz.com')
+GATEWAY_CONNECT_TIMEOUT = 3.05
+GATEWAY_READ_TIMEOUT = 15
+GATEWAY_MAX_RETRIES = 2
+GATEWAY_BACKOFF = 0.5
+GATEWAY_BREAKER_THRESHOLD = 5
+GATEWAY_BREAKER_RESET = 30
+GATEWAY_POOL_SIZE = 10
+
+# `manage.py reconcile_payments` (cron, hourly or so) re-checks transactions from the last
+# RECONCILE_WINDOW_DAYS days plus any still initiated, RECONCILE_WORKERS gateway lookups at a time,
+# checkpointing every RECONCILE_BATCH_SIZE. Mismatches show up in the admin under Payments.
+RECONCILE_WINDOW_DAYS = 3
+RECONCILE_WORKERS = 8
+RECONCILE_BATCH_SIZE = 200
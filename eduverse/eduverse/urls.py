@@ -34,6 +34,7 @@ urlpatterns = [
     #password Reset
     path('messages/', include('messaging.urls')),
     path('earnings/', include('earnings.urls')),
+    path('search/', include('search.urls')),
     path('password-reset/', auth_views.PasswordResetView.as_view(template_name='accounts/password_reset.html'),
          name='password_reset'),
     path('password-reset/done/',
@@ -1,5 +1,7 @@
 # live/admin.py
 from django.contrib import admin
+from earnings.exports import export_as_csv, export_as_jsonl
+from metrics.models import PlatformMetric, get_metrics
 from .models import LiveClass, LiveClassEnrollment
 
 @admin.register(LiveClass)
@@ -12,4 +14,11 @@ class LiveClassAdmin(admin.ModelAdmin):
 class LiveClassEnrollmentAdmin(admin.ModelAdmin):
     list_display = ('user', 'live_class', 'amount_paid', 'enrolled_at', 'first_message_sent_at')
     list_filter = ('enrolled_at', 'live_class')
-    search_fields = ('user__username', 'live_class__title')
\ No newline at end of file
+    search_fields = ('user__username', 'live_class__title')
+    actions = [export_as_csv, export_as_jsonl]
+    change_list_template = 'live/admin/live_enrollment_change_list.html'
+
+    def changelist_view(self, request, extra_context=None):
+        # Precomputed total, not a SUM over every enrollment on each page load
+        total_revenue = get_metrics()[PlatformMetric.Key.LIVE_REVENUE]
+        return super().changelist_view(request, extra_context={'total_revenue': total_revenue, **(extra_context or {})})
@@ -1,29 +0,0 @@
-# Generated by Django 5.2.7 on 2025-10-15 07:57
-
-import django.db.models.deletion
-from django.conf import settings
-from django.db import migrations, models
-
-
-class Migration(migrations.Migration):
-
-    dependencies = [
-        ('live', '0001_initial'),
-        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
-    ]
-
-    operations = [
-        migrations.CreateModel(
-            name='LiveClassEnrollment',
-            fields=[
-                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('enrolled_at', models.DateTimeField(auto_now_add=True)),
-                ('amount_paid', models.DecimalField(decimal_places=2, max_digits=8)),
-                ('live_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='enrollments', to='live.liveclass')),
-                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
-            ],
-            options={
-                'unique_together': {('user', 'live_class')},
-            },
-        ),
-    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0004_liveclass_category_alter_liveclass_instructor_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='liveclass',
+            index=models.Index(fields=['start_time', 'id'], name='live_start_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='liveclass',
+            index=models.Index(fields=['category', 'start_time', 'id'], name='live_cat_start_id_idx'),
+        ),
+    ]
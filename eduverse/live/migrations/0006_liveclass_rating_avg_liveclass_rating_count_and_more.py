@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Review = apps.get_model('courses', 'Review')
+    LiveClass = apps.get_model('live', 'LiveClass')
+    content_type = ContentType.objects.filter(app_label='live', model='liveclass').first()
+    if content_type is None:
+        return
+    totals = Review.objects.filter(content_type=content_type).order_by().values('object_id').annotate(
+        avg=models.Avg('rating'), count=models.Count('id')
+    )
+    for row in totals:
+        LiveClass.objects.filter(pk=row['object_id']).update(rating_avg=row['avg'], rating_count=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('courses', '0005_course_rating_avg_course_rating_count_and_more'),
+        ('live', '0005_liveclass_live_start_id_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='liveclass',
+            name='rating_avg',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='liveclass',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='liveclass',
+            index=models.Index(fields=['rating_avg', 'created_at'], name='live_rating_idx'),
+        ),
+        migrations.RunPython(populate_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:22
+
+import mediastore.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('live', '0006_liveclass_rating_avg_liveclass_rating_count_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='liveclass',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, storage=mediastore.storage.get_blob_storage, upload_to='live_class_thumbnails/'),
+        ),
+    ]
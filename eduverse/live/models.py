@@ -3,6 +3,7 @@ from django.conf import settings
 from django.urls import reverse
 from django.contrib.contenttypes.fields import GenericRelation
 from django.utils.translation import gettext_lazy as _ # <<<--- ADD THIS IMPORT
+from mediastore.storage import get_blob_storage
 from courses.models import Review
 
 class LiveClass(models.Model):
@@ -20,7 +21,7 @@ class LiveClass(models.Model):
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     start_time = models.DateTimeField()
-    thumbnail = models.ImageField(upload_to='live_class_thumbnails/', blank=True, null=True)
+    thumbnail = models.ImageField(upload_to='live_class_thumbnails/', storage=get_blob_storage, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     # --- New Category Field ---
@@ -30,6 +31,17 @@ class LiveClass(models.Model):
         default=LiveClassCategory.OTHER
     )
     reviews = GenericRelation(Review, related_query_name='live_class')
+    # Denormalized from Review, kept current by the signals in courses.models
+    rating_avg = models.FloatField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['rating_avg', 'created_at'], name='live_rating_idx'),
+            # Keyset pagination walks these (start_time, id) ranges
+            models.Index(fields=['start_time', 'id'], name='live_start_id_idx'),
+            models.Index(fields=['category', 'start_time', 'id'], name='live_cat_start_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -1,3 +1,63 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.tests import QueryBudgetMixin, make_teacher, make_user, make_users, seed_reviews
+from search.backends import get_backend
+from .models import LiveClass, LiveClassEnrollment
+
+
+def seed_live_classes(instructor, count, **fields):
+    start = timezone.now() + timedelta(days=1)
+    LiveClass.objects.bulk_create([
+        LiveClass(instructor=instructor, title=f'Live class {i}', description=f'Session {i}',
+                  price=50 + i, start_time=start + timedelta(hours=i), **fields)
+        for i in range(count)
+    ])
+    return list(LiveClass.objects.filter(instructor=instructor).order_by('pk'))
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid')
+class LiveClassViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.student = make_user('student')
+        cls.live_classes = seed_live_classes(cls.teacher, 60, category=LiveClass.LiveClassCategory.BUSINESS)
+        LiveClassEnrollment.objects.bulk_create([
+            LiveClassEnrollment(user=cls.student, live_class=live_class, amount_paid=live_class.price)
+            for live_class in cls.live_classes[:30]
+        ])
+        learners = make_users('learner', 40)
+        LiveClassEnrollment.objects.bulk_create([
+            LiveClassEnrollment(user=user, live_class=cls.live_classes[0], amount_paid=50) for user in learners
+        ])
+        seed_reviews(cls.live_classes[0], learners)
+        get_backend().rebuild(LiveClass)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_live_class_list(self):
+        self.assertWithinBudget(reverse('live:live_class_list'), max_queries=1)
+
+    def test_live_class_list_search_and_category(self):
+        url = reverse('live:live_class_list') + '?q=session&category=business'
+        response = self.assertWithinBudget(url, max_queries=1)
+        self.assertEqual(len(response.context['classes']), 12)
+
+    def test_live_class_detail(self):
+        self.client.force_login(self.student)
+        self.assertWithinBudget(reverse('live:live_class_detail', args=[self.live_classes[0].pk]), max_queries=6)
+
+    def test_my_live_classes(self):
+        self.client.force_login(self.student)
+        self.assertWithinBudget(reverse('live:my_live_classes'), max_queries=4)
+
+    def test_manage_live_classes(self):
+        self.client.force_login(self.teacher)
+        self.assertWithinBudget(reverse('live:manage_live_classes'), max_queries=4)
@@ -7,9 +7,10 @@ from .models import LiveClass, LiveClassEnrollment
 from django.utils import timezone
 from datetime import timedelta
 from courses.forms import ReviewForm
-from django.db.models import Q
+from django.db.models import Count, Q
 from .models import LiveClass, LiveClassEnrollment# Make sure LiveClassCategory is imported if you defined it in models
-from django.db.models import Q
+from search.backends import get_backend
+from courses.pagination import keyset_paginate
 
 @login_required
 def create_live_class(request):
@@ -29,22 +30,24 @@ def create_live_class(request):
 def live_class_list(request):
     """Displays all live classes, with an optional search filter."""
     # Start with the base queryset
-    queryset = LiveClass.objects.all().order_by('-start_time')
+    queryset = LiveClass.objects.select_related('instructor')
     query = request.GET.get('q', '')
     category = request.GET.get('category', '')
 
     # If a search query is submitted, apply the filter to the current queryset
     if query:
-        queryset = queryset.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        )
+        queryset = get_backend().filter(queryset, query)
 
     # If a category is selected, apply the filter to the ALREADY filtered queryset
     if category:
         queryset = queryset.filter(category=category)
 
+    # Latest start time first, paged by (start_time, id) cursors
+    page = keyset_paginate(request, queryset, ('-start_time', '-id'))
+
     context = {
-        'classes': queryset,
+        'classes': page.object_list,
+        'page': page,
         'categories': LiveClass.LiveClassCategory.choices,
         'current_query': query,
         'current_category': category,
@@ -53,7 +56,7 @@ def live_class_list(request):
 
 
 def live_class_detail(request, pk):
-    live_class = get_object_or_404(LiveClass, pk=pk)
+    live_class = get_object_or_404(LiveClass.objects.select_related('instructor'), pk=pk)
 
     enrollment = None
     if request.user.is_authenticated:
@@ -71,6 +74,7 @@ def live_class_detail(request, pk):
 
     context = {
         'live_class': live_class,
+        'reviews': live_class.reviews.select_related('user'),
         'is_enrolled': is_enrolled,
         'review_form': ReviewForm(),
         'can_review': can_review,
@@ -128,7 +132,7 @@ def my_live_classes_view(request):
     three_days_ago = timezone.now() - timedelta(days=3)
     recent_enrollments = LiveClassEnrollment.objects.filter(
         user=request.user, enrolled_at__gte=three_days_ago
-    ).order_by('-enrolled_at')
+    ).select_related('live_class__instructor').order_by('-enrolled_at')
     context = {'enrollments': recent_enrollments}
     return render(request, 'live/my_live_classes.html', context)
 
@@ -140,7 +144,9 @@ def manage_live_classes_view(request):
     Lists all live classes created by the currently logged-in instructor.
     """
     # Get all live classes where the instructor is the current user
-    instructor_classes = LiveClass.objects.filter(instructor=request.user)
+    instructor_classes = LiveClass.objects.filter(instructor=request.user).annotate(
+        enrollment_count=Count('enrollments')
+    )
 
     context = {
         'live_classes': instructor_classes,
@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from mediastore.models import Blob
+from mediastore.storage import blob_storage
+from thumbnails.variants import delete_variants
+
+
+class Command(BaseCommand):
+    help = "Deletes content-addressed files that no row has referenced for the grace period."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace', type=int, default=None,
+                            help="Seconds a blob must have been unreferenced (default: BLOB_GC_GRACE).")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        grace = options['grace'] if options['grace'] is not None else settings.BLOB_GC_GRACE
+        cutoff = timezone.now() - timedelta(seconds=grace)
+        freed = count = 0
+        for name, size in Blob.objects.filter(refcount=0, updated_at__lt=cutoff).values_list('name', 'size').iterator():
+            if options['dry_run']:
+                count += 1
+                freed += size
+                continue
+            # Re-checked in the DELETE itself, in case the blob was re-used since the query above
+            deleted, _ = Blob.objects.filter(name=name, refcount=0, updated_at__lt=cutoff).delete()
+            if deleted:
+                blob_storage.delete(name)
+                delete_variants(name)
+                count += 1
+                freed += size
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {count} unreferenced blobs ({freed / 1024 ** 2:.1f} MB)."))
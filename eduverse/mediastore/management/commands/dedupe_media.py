@@ -0,0 +1,63 @@
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from mediastore.models import BLOB_FIELDS, change_refcount, register_blob
+from mediastore.storage import blob_name, blob_storage, file_digest, is_blob
+from thumbnails.variants import delete_variants, ensure_variants
+
+
+class Command(BaseCommand):
+    help = ("Moves media uploaded before content addressing into the blob store, "
+            "so duplicate copies collapse into one file.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be merged.")
+
+    def handle(self, *args, **options):
+        moved = merged = saved = 0
+        for model, fields in BLOB_FIELDS.items():
+            for field_name in fields:
+                field = model._meta.get_field(field_name)
+                names = model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}) \
+                    .order_by().values_list(field_name, flat=True).distinct()
+                for old_name in list(names):
+                    # The shared default picture (Profile.image) stays where new rows expect it
+                    if is_blob(old_name) or old_name == field.default or not blob_storage.exists(old_name):
+                        continue
+                    with blob_storage.open(old_name, 'rb') as f:
+                        new_name = blob_name(file_digest(f), os.path.splitext(old_name)[1])
+                    duplicate = blob_storage.exists(new_name)
+                    size = blob_storage.size(old_name)
+                    self.stdout.write(f"{old_name} -> {new_name}{' (duplicate)' if duplicate else ''}")
+                    if duplicate:
+                        merged += 1
+                        saved += size
+                    else:
+                        moved += 1
+                    if not options['dry_run']:
+                        self.migrate_file(model, field, old_name, new_name, size, duplicate)
+        verb = "Would merge" if options['dry_run'] else "Merged"
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} files into the blob store. {verb} {merged} duplicates ({saved / 1024 ** 2:.1f} MB)."))
+
+    def migrate_file(self, model, field, old_name, new_name, size, duplicate):
+        if not duplicate:
+            new_path = blob_storage.path(new_name)
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            try:
+                os.link(blob_storage.path(old_name), new_path)  # no copy on the same filesystem
+            except OSError:
+                shutil.copy2(blob_storage.path(old_name), new_path)
+        with transaction.atomic():
+            register_blob(new_name, size)
+            # .update() skips the refcount signals, so the references are counted here
+            count = model._default_manager.filter(**{field.name: old_name}).update(**{field.name: new_name})
+            change_refcount(new_name, count)
+        # Only once no row points at the old copy is it removed
+        if not any(m._default_manager.filter(**{f: old_name}).exists() for m, fs in BLOB_FIELDS.items() for f in fs):
+            blob_storage.delete(old_name)
+        if isinstance(field, models.ImageField):
+            delete_variants(old_name)
+            ensure_variants(field.attr_class(None, field, new_name))
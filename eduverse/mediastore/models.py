@@ -0,0 +1,114 @@
+from django.db import models
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from accounts.models import Profile
+from courses.models import Course, CourseVideo
+from live.models import LiveClass
+from .storage import is_blob
+
+# File fields stored content-addressed, per model.
+BLOB_FIELDS = {
+    Course: ('thumbnail',),
+    LiveClass: ('thumbnail',),
+    CourseVideo: ('video_file',),
+    Profile: ('image',),
+}
+
+
+class Blob(models.Model):
+    """
+    One content-addressed file and the number of rows pointing at it.
+    Blobs that drop to zero references are deleted by `collect_blobs`
+    after a grace period, so an upload that is just being attached
+    to a row is never collected underneath it.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.PositiveBigIntegerField(default=0)
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)  # last upload or reference change
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
+
+
+def register_blob(name, size):
+    Blob.objects.bulk_create([Blob(name=name, size=size)], ignore_conflicts=True)
+    Blob.objects.filter(name=name).update(updated_at=timezone.now())
+
+
+def change_refcount(name, delta):
+    if not is_blob(name):
+        return  # files from before content addressing are left alone
+    updated = Blob.objects.filter(name=name, refcount__gte=-delta if delta < 0 else 0).update(
+        refcount=F('refcount') + delta, updated_at=timezone.now())
+    if not updated and delta > 0:
+        # A blob placed on disk without going through the storage (e.g. restored from a backup)
+        register_blob(name, 0)
+        Blob.objects.filter(name=name).update(refcount=F('refcount') + delta)
+
+
+def blob_names(instance):
+    """
+    Current file names of the instance's blob fields. Deferred fields come
+    back as None instead of being loaded, so post_init never costs a query.
+    """
+    names = {}
+    for field in BLOB_FIELDS[type(instance)]:
+        if field not in instance.__dict__:
+            names[field] = None
+            continue
+        value = instance.__dict__[field]
+        names[field] = getattr(value, 'name', value) or ''
+    return names
+
+
+@receiver(post_init, sender=Course)
+@receiver(post_init, sender=LiveClass)
+@receiver(post_init, sender=CourseVideo)
+@receiver(post_init, sender=Profile)
+def remember_blob_names(sender, instance, **kwargs):
+    instance._blob_names = blob_names(instance)
+
+
+@receiver(pre_save, sender=Course)
+@receiver(pre_save, sender=LiveClass)
+@receiver(pre_save, sender=CourseVideo)
+@receiver(pre_save, sender=Profile)
+@receiver(pre_delete, sender=Course)
+@receiver(pre_delete, sender=LiveClass)
+@receiver(pre_delete, sender=CourseVideo)
+@receiver(pre_delete, sender=Profile)
+def load_deferred_blob_names(sender, instance, **kwargs):
+    # Only when a row was loaded with .only()/.defer(): read what the database holds before it is overwritten
+    unknown = [field for field, name in instance._blob_names.items() if name is None]
+    if unknown and not instance._state.adding:
+        stored = sender._base_manager.filter(pk=instance.pk).values(*unknown).first() or {}
+        for field in unknown:
+            instance._blob_names[field] = stored.get(field) or ''
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=LiveClass)
+@receiver(post_save, sender=CourseVideo)
+@receiver(post_save, sender=Profile)
+def update_blob_refcounts(sender, instance, created, **kwargs):
+    current = {field: getattr(instance, field).name or '' for field in BLOB_FIELDS[sender]}
+    previous = {} if created else instance._blob_names
+    for field, name in current.items():
+        old_name = previous.get(field, '')
+        if name != old_name:
+            change_refcount(name, 1)
+            change_refcount(old_name, -1)
+    instance._blob_names = current
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=LiveClass)
+@receiver(post_delete, sender=CourseVideo)
+@receiver(post_delete, sender=Profile)
+def release_blobs(sender, instance, **kwargs):
+    for name in instance._blob_names.values():
+        change_refcount(name or '', -1)
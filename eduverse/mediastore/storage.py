@@ -0,0 +1,98 @@
+# mediastore/storage.py
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+# Every content-addressed file lives under this directory of MEDIA_ROOT.
+BLOB_PREFIX = 'blobs'
+
+
+def blob_name(digest, extension):
+    """blobs/3f/a2/3fa2...e1.mp4 - the two fan-out levels keep directories small."""
+    return f'{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}'
+
+
+def is_blob(name):
+    return bool(name) and name.startswith(f'{BLOB_PREFIX}/')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every file under the SHA-256 of its content, so uploading the
+    same bytes twice (a re-uploaded lecture, a shared stock image) keeps one
+    copy on disk. The name passed in only contributes its extension.
+
+    Files are hashed while they are streamed to a temporary file next to
+    the blob tree; if the blob already exists the temporary file is simply
+    dropped. Which rows use a blob is tracked by mediastore.models.Blob.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is the digest, picked in _save; collisions are the point.
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1]
+        source_path = getattr(content, 'temporary_file_path', None)
+        digest = getattr(content, 'sha256', None)
+        temp_path = None
+
+        if source_path is not None:
+            # Large uploads are already on disk: hash them there (unless the
+            # uploader did) and move rather than copy.
+            source_path = content.temporary_file_path()
+            if digest is None:
+                digest = file_digest(content)
+        else:
+            temp_dir = self.path(f'{BLOB_PREFIX}/tmp')
+            os.makedirs(temp_dir, exist_ok=True)
+            hasher = hashlib.sha256()
+            with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) as temp:
+                temp_path = temp.name
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    hasher.update(chunk)
+                    temp.write(chunk)
+            digest = hasher.hexdigest()
+
+        name = blob_name(digest, extension)
+        full_path = self.path(name)
+        try:
+            if not os.path.exists(full_path):
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                if temp_path is not None:
+                    os.replace(temp_path, full_path)
+                    temp_path = None
+                else:
+                    file_move_safe(source_path, full_path, allow_overwrite=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        finally:
+            if temp_path is not None:
+                os.remove(temp_path)
+
+        from .models import register_blob
+        register_blob(name, os.path.getsize(full_path))
+        return name
+
+
+def file_digest(content):
+    hasher = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        hasher.update(chunk)
+    content.seek(0)
+    return hasher.hexdigest()
+
+
+# MEDIA_ROOT/MEDIA_URL are read lazily, so this also follows override_settings in tests.
+blob_storage = ContentAddressedStorage()
+
+
+def get_blob_storage():
+    # Callable form for FileField(storage=...), so migrations refer to it instead of serializing it
+    return blob_storage
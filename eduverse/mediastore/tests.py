@@ -0,0 +1,92 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from courses.models import Course, CourseVideo, Module
+from courses.tests import make_teacher
+from .models import Blob
+from .storage import blob_storage, is_blob
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        # A fresh MEDIA_ROOT per test, so blobs from one test never satisfy another
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_root.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.teacher = make_teacher('teacher')
+        self.module = Module.objects.create(
+            course=Course.objects.create(instructor=self.teacher, title='Servo basics', price=10), title='Intro', order=1)
+
+    def add_video(self, filename, data=b'lecture bytes' * 1000):
+        return CourseVideo.objects.create(module=self.module, title=filename,
+                                          video_file=SimpleUploadedFile(filename, data, content_type='video/mp4'))
+
+    def blob_files(self):
+        return sorted(name for _, _, files in os.walk(blob_storage.path('blobs')) for name in files)
+
+    def test_same_upload_is_stored_once(self):
+        first = self.add_video('TRAFIC_LIGHT.mp4')
+        second = self.add_video('TRAFIC_LIGHT (copy).MP4')
+        self.assertEqual(first.video_file.name, second.video_file.name)
+        self.assertTrue(is_blob(first.video_file.name))
+        self.assertEqual(len(self.blob_files()), 1)
+        self.assertEqual(Blob.objects.get(name=first.video_file.name).refcount, 2)
+
+        other = self.add_video('other.mp4', b'different lecture')
+        self.assertNotEqual(other.video_file.name, first.video_file.name)
+        self.assertEqual(len(self.blob_files()), 2)
+
+    def test_refcounts_follow_replacements_and_deletes(self):
+        video = self.add_video('a.mp4')
+        old_name = video.video_file.name
+        video.video_file = SimpleUploadedFile('b.mp4', b'replacement')
+        video.save()
+        self.assertEqual(Blob.objects.get(name=old_name).refcount, 0)
+        self.assertEqual(Blob.objects.get(name=video.video_file.name).refcount, 1)
+
+        # Deferred file fields are resolved without losing track of the reference
+        CourseVideo.objects.defer('video_file').get(pk=video.pk).delete()
+        self.assertEqual(Blob.objects.get(name=video.video_file.name).refcount, 0)
+
+    def test_collect_removes_only_stale_unreferenced_blobs(self):
+        kept = self.add_video('kept.mp4')
+        dropped = self.add_video('dropped.mp4', b'dropped')
+        dropped_name = dropped.video_file.name
+        dropped.delete()
+
+        call_command('collect_blobs', stdout=StringIO())
+        self.assertTrue(blob_storage.exists(dropped_name))  # still inside the grace period
+
+        Blob.objects.filter(name=dropped_name).update(updated_at=timezone.now() - timedelta(days=1))
+        call_command('collect_blobs', stdout=StringIO())
+        self.assertFalse(blob_storage.exists(dropped_name))
+        self.assertFalse(Blob.objects.filter(name=dropped_name).exists())
+        self.assertTrue(blob_storage.exists(kept.video_file.name))
+
+    def test_dedupe_merges_legacy_copies(self):
+        data = b'servo motor lecture'
+        legacy = [default_storage.save(f'course_videos/{name}', ContentFile(data))
+                  for name in ('TRAFIC_LIGHT.mp4', 'TRAFIC_LIGHT_4cWEdHh.mp4')]
+        for name in legacy:
+            CourseVideo.objects.bulk_create([CourseVideo(module=self.module, title=name, video_file=name)])
+
+        call_command('dedupe_media', stdout=StringIO())
+        names = set(CourseVideo.objects.values_list('video_file', flat=True))
+        self.assertEqual(len(names), 1)
+        blob = Blob.objects.get(name=names.pop())
+        self.assertEqual(blob.refcount, 2)
+        with blob_storage.open(blob.name) as f:
+            self.assertEqual(f.read(), data)
+        self.assertFalse(any(default_storage.exists(name) for name in legacy))
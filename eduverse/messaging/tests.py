@@ -1,3 +1,39 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from courses.tests import QueryBudgetMixin, make_teacher, make_user, make_users
+from live.tests import seed_live_classes
+from .models import Conversation, Message
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid')
+class MessagingViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.student = make_user('student')
+        live_classes = seed_live_classes(cls.teacher, 10)
+        students = [cls.student] + make_users('learner', 29)
+        Conversation.objects.bulk_create([
+            Conversation(live_class=live_classes[i % 10], student=student, teacher=cls.teacher)
+            for i, student in enumerate(students)
+        ])
+        cls.conversation = Conversation.objects.get(student=cls.student)
+        Message.objects.bulk_create([
+            Message(conversation=cls.conversation, sender=cls.student if i % 2 else cls.teacher,
+                    content=f'Message {i}')
+            for i in range(100)
+        ])
+
+    def test_inbox(self):
+        self.client.force_login(self.teacher)
+        response = self.assertWithinBudget(reverse('messaging:inbox'), max_queries=4)
+        self.assertEqual(len(response.context['conversations']), 30)
+
+    def test_conversation_detail(self):
+        self.client.force_login(self.student)
+        url = reverse('messaging:conversation_detail', args=[self.conversation.pk])
+        self.assertWithinBudget(url, max_queries=6)
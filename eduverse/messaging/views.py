@@ -31,13 +31,15 @@ def start_conversation_view(request, class_pk):
 def inbox_view(request):
     conversations = Conversation.objects.filter(
         Q(student=request.user) | Q(teacher=request.user)
-    ).order_by('-created_at')
+    ).select_related('live_class', 'student', 'teacher').order_by('-created_at')
     return render(request, 'messaging/inbox.html', {'conversations': conversations})
 
 
 @login_required
 def conversation_detail_view(request, conversation_id):
-    conversation = get_object_or_404(Conversation, id=conversation_id)
+    conversation = get_object_or_404(
+        Conversation.objects.select_related('live_class', 'student', 'teacher'), id=conversation_id
+    )
 
     # Authorization check
     if request.user != conversation.student and request.user != conversation.teacher:
@@ -90,4 +92,7 @@ def conversation_detail_view(request, conversation_id):
     messages_to_mark_read = conversation.messages.filter(is_read=False).exclude(sender=request.user)
     messages_to_mark_read.update(is_read=True)
 
-    return render(request, 'messaging/conversation_detail.html', {'conversation': conversation})
\ No newline at end of file
+    return render(request, 'messaging/conversation_detail.html', {
+        'conversation': conversation,
+        'conversation_messages': conversation.messages.select_related('sender'),
+    })
\ No newline at end of file
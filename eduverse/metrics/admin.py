@@ -0,0 +1,64 @@
+# metrics/admin.py
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+
+from .models import PlatformMetric
+from .reconcile import reconcile_metrics
+
+
+@admin.register(PlatformMetric)
+class PlatformMetricAdmin(admin.ModelAdmin):
+    """The changelist is the platform dashboard: one read of the metrics table."""
+    change_list_template = 'admin/metrics/dashboard.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        custom = [
+            path('reconcile/', self.admin_site.admin_view(self.process_reconcile),
+                 name='metrics_platformmetric_reconcile'),
+        ]
+        return custom + super().get_urls()
+
+    def process_reconcile(self, request):
+        if request.method != 'POST' or not request.user.is_superuser:
+            return redirect('admin:metrics_platformmetric_changelist')
+        drift = reconcile_metrics()
+        if drift:
+            messages.warning(request, "Corrected: " + ", ".join(
+                f"{PlatformMetric.Key(key).label} {stored} → {actual}" for key, (stored, actual) in drift.items()))
+        else:
+            messages.success(request, "All metrics matched the source tables.")
+        return redirect('admin:metrics_platformmetric_changelist')
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        rows = {metric.key: metric for metric in PlatformMetric.objects.all()}
+        Key = PlatformMetric.Key
+        money = {Key.REVENUE, Key.COURSE_REVENUE, Key.LIVE_REVENUE, Key.PLATFORM_FEES}
+        values = {key: rows[key].value if key in rows else 0 for key in Key.values}
+        course_enrollments = values[Key.COURSE_ENROLLMENTS]
+        context = {
+            **self.admin_site.each_context(request),
+            'title': "Platform metrics",
+            'opts': self.model._meta,
+            # (label, value, is a count rather than BDT)
+            'cards': [(Key(key).label, value, key not in money) for key, value in values.items()],
+            'completion_rate': 100 * values[Key.COURSE_COMPLETIONS] / course_enrollments if course_enrollments else 0,
+            'last_reconciled': max((m.reconciled_at for m in rows.values() if m.reconciled_at), default=None),
+            'can_reconcile': request.user.is_superuser,
+            **(extra_context or {}),
+        }
+        request.current_app = self.admin_site.name
+        return TemplateResponse(request, self.change_list_template, context)
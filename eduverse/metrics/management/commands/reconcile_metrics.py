@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from metrics.models import PlatformMetric
+from metrics.reconcile import reconcile_metrics
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard metrics from the source tables and correct any drift."
+
+    def handle(self, *args, **options):
+        drift = reconcile_metrics()
+        for key, (stored, actual) in drift.items():
+            self.stdout.write(f"{PlatformMetric.Key(key).label}: {stored} -> {actual}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Reconciled {len(PlatformMetric.Key.values)} metrics, {len(drift)} corrected."))
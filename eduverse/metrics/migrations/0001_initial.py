@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformMetric',
+            fields=[
+                ('key', models.CharField(choices=[('revenue', 'Total revenue'), ('course_revenue', 'Course revenue'), ('live_revenue', 'Live class revenue'), ('platform_fees', 'Platform fees'), ('course_enrollments', 'Course enrollments'), ('live_enrollments', 'Live class enrollments'), ('learners', 'Active learners'), ('course_completions', 'Course completions')], max_length=30, primary_key=True, serialize=False)),
+                ('value', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['key'],
+            },
+        ),
+    ]
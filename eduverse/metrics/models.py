@@ -0,0 +1,131 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from courses.models import CourseProgress, Enrollment
+from live.models import LiveClassEnrollment
+
+
+class PlatformMetric(models.Model):
+    """
+    One platform-wide number. Kept current by the receivers below and
+    corrected by `manage.py reconcile_metrics` (metrics/reconcile.py).
+    """
+    class Key(models.TextChoices):
+        REVENUE = 'revenue', 'Total revenue'
+        COURSE_REVENUE = 'course_revenue', 'Course revenue'
+        LIVE_REVENUE = 'live_revenue', 'Live class revenue'
+        PLATFORM_FEES = 'platform_fees', 'Platform fees'
+        COURSE_ENROLLMENTS = 'course_enrollments', 'Course enrollments'
+        LIVE_ENROLLMENTS = 'live_enrollments', 'Live class enrollments'
+        LEARNERS = 'learners', 'Active learners'  # users with at least one enrollment
+        COURSE_COMPLETIONS = 'course_completions', 'Course completions'
+
+    key = models.CharField(max_length=30, choices=Key.choices, primary_key=True)
+    value = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['key']
+
+    def __str__(self):
+        return f"{self.get_key_display()}: {self.value}"
+
+
+def get_metrics():
+    """{key: value} for every metric; missing rows read as 0 until the first reconcile."""
+    values = dict(PlatformMetric.objects.values_list('key', 'value'))
+    return {key: values.get(key, 0) for key in PlatformMetric.Key.values}
+
+
+def bump_metrics(changes):
+    """Adds {key: delta} to the metric rows with F() updates, creating rows on first use."""
+    for key, delta in changes.items():
+        if not delta:
+            continue
+        if PlatformMetric.objects.filter(key=key).update(value=F('value') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                PlatformMetric.objects.create(key=key, value=delta)
+        except IntegrityError:
+            PlatformMetric.objects.filter(key=key).update(value=F('value') + delta)
+
+
+def enrollment_count(user_id):
+    return Enrollment.objects.filter(user_id=user_id).count() + LiveClassEnrollment.objects.filter(user_id=user_id).count()
+
+
+def enrollment_changes(instance, sign, previous=None):
+    """The metric deltas of adding (sign=1) or removing (sign=-1) one enrollment."""
+    is_course = isinstance(instance, Enrollment)
+    amount, fee = instance.amount_paid, instance.platform_fee
+    if previous is not None:
+        # An edit: only the money moved
+        amount, fee = amount - previous[0], fee - previous[1]
+    Key = PlatformMetric.Key
+    changes = {
+        Key.REVENUE: amount * sign,
+        Key.COURSE_REVENUE if is_course else Key.LIVE_REVENUE: amount * sign,
+        Key.PLATFORM_FEES: fee * sign,
+    }
+    if previous is None:
+        changes[Key.COURSE_ENROLLMENTS if is_course else Key.LIVE_ENROLLMENTS] = sign
+        # First enrollment in, or last one out, changes the learner count
+        if enrollment_count(instance.user_id) == (1 if sign > 0 else 0):
+            changes[Key.LEARNERS] = sign
+    return changes
+
+
+def count_bulk_enrollments(user_id, enrollments):
+    """
+    What count_enrollment would have bumped for enrollments of one user made
+    with bulk_create(), in one update per metric. Call after the rows exist.
+    """
+    Key = PlatformMetric.Key
+    changes = defaultdict(Decimal)
+    for enrollment in enrollments:
+        is_course = isinstance(enrollment, Enrollment)
+        changes[Key.REVENUE] += enrollment.amount_paid
+        changes[Key.COURSE_REVENUE if is_course else Key.LIVE_REVENUE] += enrollment.amount_paid
+        changes[Key.PLATFORM_FEES] += enrollment.platform_fee
+        changes[Key.COURSE_ENROLLMENTS if is_course else Key.LIVE_ENROLLMENTS] += 1
+    if enrollments and enrollment_count(user_id) == len(enrollments):
+        changes[Key.LEARNERS] = 1
+    bump_metrics(changes)
+
+
+@receiver(pre_save, sender=Enrollment)
+@receiver(pre_save, sender=LiveClassEnrollment)
+def remember_enrollment_amounts(sender, instance, **kwargs):
+    # The payment split is sometimes filled in after the row is created
+    instance._previous_amounts = None
+    if instance.pk:
+        instance._previous_amounts = sender.objects.filter(pk=instance.pk).values_list(
+            'amount_paid', 'platform_fee').first()
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_save, sender=LiveClassEnrollment)
+def count_enrollment(sender, instance, created, **kwargs):
+    previous = None if created else getattr(instance, '_previous_amounts', None)
+    if created or previous is not None:
+        bump_metrics(enrollment_changes(instance, 1, previous))
+
+
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_delete, sender=LiveClassEnrollment)
+def uncount_enrollment(sender, instance, **kwargs):
+    bump_metrics(enrollment_changes(instance, -1))
+
+
+@receiver(post_save, sender=CourseProgress)
+def count_course_completion(sender, instance, update_fields=None, **kwargs):
+    # courses.progress.record_completion saves completed_at alone, exactly once per finished course
+    if update_fields and 'completed_at' in update_fields and instance.completed_at is not None:
+        bump_metrics({PlatformMetric.Key.COURSE_COMPLETIONS: 1})
@@ -0,0 +1,73 @@
+# metrics/reconcile.py
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from courses.curriculum import get_curriculum
+from courses.models import CourseProgress, Enrollment
+from courses.progress import is_complete
+from live.models import LiveClassEnrollment
+from .models import PlatformMetric
+
+Key = PlatformMetric.Key
+
+
+def mark_missed_completions(batch_size=1000):
+    """
+    Sets completed_at on finished courses that record_completion never saw
+    (progress from before completions were tracked). Only bitsets built for
+    the current curriculum layout are trusted. Returns how many were marked.
+    """
+    pending = defaultdict(list)
+    rows = CourseProgress.objects.filter(completed_at__isnull=True).values_list('pk', 'course_id', 'layout',
+                                                                                'completed_bits')
+    for pk, course_id, layout, completed_bits in rows.iterator(chunk_size=batch_size):
+        pending[course_id].append((pk, layout, int.from_bytes(bytes(completed_bits), 'little')))
+    finished = []
+    for course_id, progress_rows in pending.items():
+        curriculum = get_curriculum(course_id)
+        finished += [pk for pk, layout, bits in progress_rows
+                     if layout == curriculum['layout'] and is_complete(bits, curriculum)]
+    for start in range(0, len(finished), batch_size):
+        CourseProgress.objects.filter(pk__in=finished[start:start + batch_size], completed_at__isnull=True) \
+            .update(completed_at=F('updated_at'))
+    return len(finished)
+
+
+def compute_metrics():
+    """Every metric recomputed from the source tables. This is the full scan the table exists to avoid."""
+    course = Enrollment.objects.aggregate(revenue=Sum('amount_paid'), fees=Sum('platform_fee'))
+    live = LiveClassEnrollment.objects.aggregate(revenue=Sum('amount_paid'), fees=Sum('platform_fee'))
+    learners = Enrollment.objects.values('user_id').union(LiveClassEnrollment.objects.values('user_id')).count()
+    course_revenue, live_revenue = course['revenue'] or Decimal(0), live['revenue'] or Decimal(0)
+    return {
+        Key.REVENUE: course_revenue + live_revenue,
+        Key.COURSE_REVENUE: course_revenue,
+        Key.LIVE_REVENUE: live_revenue,
+        Key.PLATFORM_FEES: (course['fees'] or 0) + (live['fees'] or 0),
+        Key.COURSE_ENROLLMENTS: Enrollment.objects.count(),
+        Key.LIVE_ENROLLMENTS: LiveClassEnrollment.objects.count(),
+        Key.LEARNERS: learners,
+        Key.COURSE_COMPLETIONS: CourseProgress.objects.filter(completed_at__isnull=False).count(),
+    }
+
+
+def reconcile_metrics():
+    """
+    Overwrites the metric rows with freshly computed values and returns the
+    drift that was corrected, {key: (stored, actual)}, for keys that differed.
+    The table is locked for the duration so no increment lands in between.
+    """
+    mark_missed_completions()
+    now = timezone.now()
+    with transaction.atomic():
+        stored = {metric.key: metric.value for metric in PlatformMetric.objects.select_for_update()}
+        actual = compute_metrics()
+        PlatformMetric.objects.bulk_create(
+            [PlatformMetric(key=key, value=value, reconciled_at=now) for key, value in actual.items()],
+            update_conflicts=True, unique_fields=['key'], update_fields=['value', 'reconciled_at', 'updated_at'],
+        )
+    return {key: (stored.get(key, 0), value) for key, value in actual.items() if stored.get(key, 0) != value}
@@ -0,0 +1,132 @@
+import io
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from courses.models import CourseProgress, CourseVideo, Enrollment, TextContent
+from courses.tests import make_teacher, make_user, make_users, seed_courses, seed_curriculum
+from live.models import LiveClassEnrollment
+from live.tests import seed_live_classes
+from .models import PlatformMetric, get_metrics
+from .reconcile import reconcile_metrics
+
+Key = PlatformMetric.Key
+
+
+class PlatformMetricTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.student = make_user('student')
+        cls.courses = seed_courses(cls.teacher, 2)
+        cls.live_class = seed_live_classes(cls.teacher, 1)[0]
+
+    def enroll(self, course, user=None):
+        return Enrollment.objects.create(user=user or self.student, course=course, amount_paid=course.price,
+                                         instructor_share=course.price * Decimal('0.8'),
+                                         platform_fee=course.price * Decimal('0.2'))
+
+    def test_enrollments_update_metrics(self):
+        first = self.enroll(self.courses[0])
+        self.enroll(self.courses[1])
+        LiveClassEnrollment.objects.create(user=self.student, live_class=self.live_class, amount_paid=50,
+                                           platform_fee=10)
+        metrics = get_metrics()
+        self.assertEqual(metrics[Key.REVENUE], Decimal('251.00'))
+        self.assertEqual(metrics[Key.COURSE_REVENUE], Decimal('201.00'))
+        self.assertEqual(metrics[Key.LIVE_REVENUE], Decimal('50.00'))
+        self.assertEqual(metrics[Key.PLATFORM_FEES], Decimal('50.20'))
+        self.assertEqual((metrics[Key.COURSE_ENROLLMENTS], metrics[Key.LIVE_ENROLLMENTS]), (2, 1))
+        self.assertEqual(metrics[Key.LEARNERS], 1)
+
+        # A refund-style edit only moves the money
+        first.amount_paid = Decimal('0')
+        first.platform_fee = Decimal('0')
+        first.save()
+        metrics = get_metrics()
+        self.assertEqual(metrics[Key.REVENUE], Decimal('151.00'))
+        self.assertEqual(metrics[Key.COURSE_ENROLLMENTS], 2)
+
+        Enrollment.objects.filter(user=self.student).delete()
+        LiveClassEnrollment.objects.filter(user=self.student).delete()
+        metrics = get_metrics()
+        self.assertEqual((metrics[Key.REVENUE], metrics[Key.LEARNERS], metrics[Key.COURSE_ENROLLMENTS]), (0, 0, 0))
+        self.assertEqual(reconcile_metrics(), {})
+
+    @override_settings(SESSION_COOKIE_NAME='frontend_sessionid')
+    def test_finishing_a_course_counts_once(self):
+        course = self.courses[0]
+        seed_curriculum(course, modules=1, items_per_module=1)
+        self.enroll(course)
+        self.client.force_login(self.student)
+        video_type, text_type = ContentType.objects.get_for_models(CourseVideo, TextContent).values()
+        items = [(video_type, CourseVideo.objects.get(module__course=course)),
+                 (text_type, TextContent.objects.get(module__course=course))]
+
+        def complete(content_type, item):
+            self.client.post(reverse('courses:mark_as_complete', args=[content_type.pk, item.pk]))
+
+        complete(*items[0])
+        self.assertEqual(get_metrics()[Key.COURSE_COMPLETIONS], 0)
+        complete(*items[1])
+        complete(*items[1])
+        self.assertEqual(get_metrics()[Key.COURSE_COMPLETIONS], 1)
+        self.assertIsNotNone(CourseProgress.objects.get(user=self.student, course=course).completed_at)
+
+    def test_reconcile_corrects_bulk_writes(self):
+        self.enroll(self.courses[0])
+        users = make_users('bulk', 3)
+        # bulk_create skips the signals, so the dashboard falls behind until reconciled
+        Enrollment.objects.bulk_create([
+            Enrollment(user=user, course=self.courses[1], amount_paid=101, platform_fee=20) for user in users
+        ])
+        self.assertEqual(get_metrics()[Key.COURSE_ENROLLMENTS], 1)
+
+        out = io.StringIO()
+        call_command('reconcile_metrics', stdout=out)
+        self.assertIn('Course enrollments: 1.00 -> 4', out.getvalue())
+        metrics = get_metrics()
+        self.assertEqual((metrics[Key.COURSE_ENROLLMENTS], metrics[Key.LEARNERS]), (4, 4))
+        self.assertEqual(metrics[Key.REVENUE], Decimal('403.00'))
+        self.assertIsNotNone(PlatformMetric.objects.get(key=Key.REVENUE).reconciled_at)
+        self.assertEqual(reconcile_metrics(), {})
+
+
+# AdminSeparateSessionMiddleware switches to this cookie under /admin/
+@override_settings(SESSION_COOKIE_NAME='admin_sessionid')
+class DashboardTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'test-pass-123')
+        teacher = make_teacher('teacher')
+        course = seed_courses(teacher, 1)[0]
+        Enrollment.objects.bulk_create([
+            Enrollment(user=user, course=course, amount_paid=100, platform_fee=20) for user in make_users('s', 50)
+        ])
+        reconcile_metrics()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_dashboard_reads_only_the_metrics_table(self):
+        url = reverse('admin:metrics_platformmetric_changelist')
+        self.client.get(url)
+        # Session, user and the teacher-status context processor, then the metric rows;
+        # nothing scales with enrollments
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertContains(response, 'BDT. 5,000.00')
+        self.assertContains(response, 'Course enrollments')
+
+    def test_reconcile_button(self):
+        Enrollment.objects.filter(user__username='s0').delete()
+        PlatformMetric.objects.filter(key=Key.COURSE_ENROLLMENTS).update(value=7)
+        response = self.client.post(reverse('admin:metrics_platformmetric_reconcile'), follow=True)
+        self.assertContains(response, 'Course enrollments 7.00 → 49')
+        self.assertEqual(get_metrics()[Key.COURSE_ENROLLMENTS], 49)
@@ -1,3 +1,57 @@
+# payments/admin.py
 from django.contrib import admin
+from .models import PaymentItem, PaymentTransaction, ReconciliationMismatch, ReconciliationRun
 
-# Register your models here.
+
+class PaymentItemInline(admin.TabularInline):
+    model = PaymentItem
+    fields = ('course', 'live_class', 'amount')
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PaymentTransaction)
+class PaymentTransactionAdmin(admin.ModelAdmin):
+    list_display = ('tran_id', 'user', 'product_type', 'amount', 'status', 'created_at', 'processed_at')
+    list_filter = ('status', 'product_type')
+    search_fields = ('tran_id', 'val_id', 'user__username')
+    # Status only changes through the gateway callbacks (payments/processing.py)
+    readonly_fields = ('tran_id', 'user', 'product_type', 'course', 'live_class', 'amount', 'currency', 'status',
+                       'val_id', 'failure_reason', 'created_at', 'updated_at', 'processed_at')
+    inlines = [PaymentItemInline]
+
+
+class ReconciliationMismatchInline(admin.TabularInline):
+    model = ReconciliationMismatch
+    fields = ('transaction', 'kind', 'local_status', 'gateway_status', 'detail')
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+
+
+# Written by `manage.py reconcile_payments` (payments/reconcile.py)
+@admin.register(ReconciliationRun)
+class ReconciliationRunAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'status', 'checked', 'mismatch_count', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('started_at', 'since', 'finished_at', 'status', 'last_pk', 'checked', 'mismatch_count', 'error')
+    inlines = [ReconciliationMismatchInline]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ReconciliationMismatch)
+class ReconciliationMismatchAdmin(admin.ModelAdmin):
+    list_display = ('transaction', 'kind', 'local_status', 'gateway_status', 'created_at')
+    list_filter = ('kind', 'local_status')
+    search_fields = ('transaction__tran_id',)
+    list_select_related = ('transaction',)
+    readonly_fields = ('run', 'transaction', 'kind', 'local_status', 'gateway_status', 'detail', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
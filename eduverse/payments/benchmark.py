@@ -0,0 +1,151 @@
+# payments/benchmark.py
+"""
+End-to-end checkout load test: concurrent customers go from the initiate
+view through the (fake) gateway to the success callback, against the
+configured database. Used by `manage.py bench_checkout`.
+"""
+import queue
+import threading
+import time
+import uuid
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.models import Course
+from live.models import LiveClass
+from .fakegateway import PAY_PATH
+from .models import PaymentTransaction
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers (None when it's empty)."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def seed_customers(customers, products, prefix=None):
+    """
+    A teacher with `products` courses and as many live classes, and
+    `customers` users to buy them. Everything hangs off users named
+    `prefix`*, so deleting those cleans up. Returns (prefix, [(user, initiate URL), ...]).
+    """
+    prefix = prefix or f'bench-{uuid.uuid4().hex[:8]}-'
+    teacher = User.objects.create(username=f'{prefix}teacher')
+    Course.objects.bulk_create([
+        Course(instructor=teacher, title=f'Benchmark course {i}', description='Benchmark', price=100 + i)
+        for i in range(products)
+    ])
+    start = timezone.now() + timedelta(days=1)
+    LiveClass.objects.bulk_create([
+        LiveClass(instructor=teacher, title=f'Benchmark live class {i}', description='Benchmark', price=50 + i,
+                  start_time=start + timedelta(hours=i))
+        for i in range(products)
+    ])
+    urls = [reverse('payments:initiate_payment', args=[pk])
+            for pk in Course.objects.filter(instructor=teacher).values_list('pk', flat=True)]
+    urls += [reverse('payments:initiate_live_class_payment', args=[pk])
+             for pk in LiveClass.objects.filter(instructor=teacher).values_list('pk', flat=True)]
+    # create(), not bulk_create(): the initiate views need the profile the post_save signal makes
+    users = [User.objects.create(username=f'{prefix}user{i}') for i in range(customers)]
+    return prefix, [(user, urls[i % len(urls)]) for i, user in enumerate(users)]
+
+
+def remove_customers(prefix):
+    User.objects.filter(username__startswith=prefix).delete()
+
+
+def run_flow(client, gateway, url):
+    """
+    One customer's checkout: initiate view, payment page, success/fail callback.
+    Returns (outcome, {step: seconds}). The customer's own time on the payment
+    page isn't measured.
+    """
+    started = time.perf_counter()
+    response = client.get(url)
+    initiated = time.perf_counter()
+    location = response.get('Location', '')
+    if response.status_code != 302 or not location.startswith(gateway.url + PAY_PATH):
+        return 'gateway_error', {'initiate': initiated - started}
+
+    callback_url, data = gateway.pay(location[len(gateway.url + PAY_PATH):])
+    called_back = time.perf_counter()
+    response = client.post(urlsplit(callback_url).path, data)
+    finished = time.perf_counter()
+    timings = {'initiate': initiated - started, 'callback': finished - called_back,
+               'total': initiated - started + finished - called_back}
+    if response.status_code != 200:
+        return 'error', timings
+    status = PaymentTransaction.objects.filter(tran_id=data['tran_id']).values_list('status', flat=True).first()
+    if status == PaymentTransaction.Status.FULFILLED:
+        return 'enrolled', timings
+    return 'declined' if data['status'] == 'FAILED' else 'error', timings
+
+
+def run_benchmark(gateway, flows, concurrency):
+    """
+    Runs the (user, initiate URL) flows on `concurrency` threads, each with
+    its own test client and database connection. Returns a report dict:
+    outcome counts, wall time, enrollments/s and p50/p95/p99 per step.
+    """
+    pending = queue.Queue()
+    for flow in flows:
+        pending.put(flow)
+    results = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        client = Client()
+        try:
+            while True:
+                try:
+                    user, url = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    client.force_login(user)
+                    outcome = run_flow(client, gateway, url)
+                except Exception as exc:
+                    outcome = ('error', {})
+                    with lock:
+                        errors.append(f"{type(exc).__name__}: {exc}")
+                with lock:
+                    results.append(outcome)
+        finally:
+            connections.close_all()
+
+    # The test client talks to the site as 'testserver'; callbacks must come back to it
+    with override_settings(SSLCOMMERZ_BASE_URL=gateway.url, SESSION_COOKIE_NAME='frontend_sessionid',
+                           ALLOWED_HOSTS=['testserver']):
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+    outcomes = {}
+    for outcome, _ in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    latency = {}
+    for step in ('initiate', 'callback', 'total'):
+        samples = [timings[step] for _, timings in results if step in timings]
+        latency[step] = {pct: percentile(samples, pct) for pct in (50, 95, 99)}
+    return {
+        'flows': len(results),
+        'outcomes': outcomes,
+        'elapsed': elapsed,
+        'enrollments_per_second': outcomes.get('enrolled', 0) / elapsed if elapsed else 0,
+        'latency': latency,
+        'errors': errors,
+    }
@@ -0,0 +1,211 @@
+# payments/fakegateway.py
+"""
+A local stand-in for SSLCommerz, for development and benchmarks.
+
+It speaks the parts of the protocol the payments app uses: the session API
+(INITIATE_PATH), a hosted "payment page" that posts the customer back to
+success_url/fail_url the way the real one does, and the validation and
+transaction query APIs.
+Point SSLCOMMERZ_BASE_URL at it (`manage.py fake_gateway` prints the URL).
+"""
+import html
+import json
+import random
+import threading
+import time
+import uuid
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from django.utils import timezone
+
+from .gateway import INITIATE_PATH, TRANSACTION_QUERY_PATH, VALIDATION_PATH
+
+PAY_PATH = '/gwprocess/v4/pay/'
+
+# Fields the session API refuses to go without
+REQUIRED_FIELDS = ('store_id', 'store_passwd', 'total_amount', 'currency', 'tran_id',
+                   'success_url', 'fail_url', 'cancel_url')
+
+
+class FakeGateway:
+    """
+    Threaded HTTP server playing SSLCommerz. `latency` seconds (+/- `jitter`
+    of it) are added to every API call; `error_rate` of session requests are
+    answered 503 and `decline_rate` of payments come back failed.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, decline_rate=0.0,
+                 seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.decline_rate = decline_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sessions = {}  # sessionkey -> (the posted checkout form, its attempt record)
+        self.payments = {}  # val_id -> validation record
+        self.attempts = {}  # tran_id -> [attempt record, ...] for the transaction query API
+        self.stats = {'sessions': 0, 'errors': 0, 'payments': 0, 'declined': 0, 'validations': 0, 'queries': 0}
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.url = f'http://{host}:{self.server.server_port}'
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def chance(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+    def delay(self):
+        if self.latency:
+            with self.lock:
+                spread = self.random.uniform(-self.jitter, self.jitter)
+            time.sleep(max(0.0, self.latency * (1 + spread)))
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    # ---------- The protocol ----------
+
+    def create_session(self, form):
+        """(HTTP status, JSON body) for a session API call."""
+        self.delay()
+        if self.chance(self.error_rate):
+            self.count('errors')
+            return 503, {'status': 'FAILED', 'failedreason': 'Service temporarily unavailable'}
+        missing = [name for name in REQUIRED_FIELDS if not form.get(name)]
+        if missing:
+            return 200, {'status': 'FAILED', 'failedreason': f"Missing {', '.join(missing)}"}
+        sessionkey = uuid.uuid4().hex.upper()
+        attempt = {'status': 'PENDING', 'tran_id': form['tran_id'], 'val_id': '', 'amount': form['total_amount'],
+                   'currency': form['currency']}
+        with self.lock:
+            self.sessions[sessionkey] = form, attempt
+            self.attempts.setdefault(form['tran_id'], []).append(attempt)
+        self.count('sessions')
+        return 200, {
+            'status': 'SUCCESS',
+            'sessionkey': sessionkey,
+            'GatewayPageURL': f'{self.url}{PAY_PATH}{sessionkey}',
+        }
+
+    def pay(self, sessionkey):
+        """
+        What the customer's browser is sent back with after the payment page:
+        (callback URL, form data), or None for an unknown or already used session.
+        """
+        with self.lock:
+            form, attempt = self.sessions.pop(sessionkey, (None, None))
+        if form is None:
+            return None
+        tran_id, amount = form['tran_id'], form['total_amount']
+        if self.chance(self.decline_rate):
+            self.count('declined')
+            with self.lock:
+                attempt['status'] = 'FAILED'
+            return form['fail_url'], {'tran_id': tran_id, 'status': 'FAILED', 'error': 'Declined by the issuer',
+                                      'amount': amount, 'currency': form['currency']}
+        val_id = timezone.now().strftime('%y%m%d%H%M%S') + uuid.uuid4().hex[:10]
+        payment = {
+            'status': 'VALID',
+            'tran_id': tran_id,
+            'val_id': val_id,
+            'amount': amount,
+            'store_amount': str((Decimal(amount) * Decimal('0.975')).quantize(Decimal('0.01'))),
+            'currency': form['currency'],
+            'bank_tran_id': uuid.uuid4().hex[:20],
+            'card_type': 'VISA-Dutch Bangla',
+            'tran_date': timezone.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with self.lock:
+            self.payments[val_id] = payment
+            attempt.update(status='VALID', val_id=val_id, bank_tran_id=payment['bank_tran_id'])
+        self.count('payments')
+        return form['success_url'], payment
+
+    def validation(self, val_id):
+        self.delay()
+        self.count('validations')
+        with self.lock:
+            payment = self.payments.get(val_id)
+            if payment is None:
+                return 200, {'status': 'INVALID_TRANSACTION', 'val_id': val_id}
+            # The real API says VALIDATED for a payment that was looked up before
+            reply = {**payment, 'status': 'VALIDATED' if payment.get('validated') else 'VALID'}
+            payment['validated'] = True
+        reply.pop('validated', None)
+        return 200, reply
+
+    def transaction_query(self, tran_id):
+        self.delay()
+        self.count('queries')
+        with self.lock:
+            attempts = [dict(attempt) for attempt in self.attempts.get(tran_id, [])]
+        return 200, {'APIConnect': 'DONE', 'no_of_trans_found': len(attempts), 'element': attempts}
+
+    # ---------- HTTP ----------
+
+    def handler_class(self):
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                form = {name: values[0] for name, values in parse_qs(self.rfile.read(length).decode()).items()}
+                if urlsplit(self.path).path == INITIATE_PATH:
+                    self.send(*gateway.create_session(form))
+                else:
+                    self.send(404, {'status': 'FAILED', 'failedreason': 'Not found'})
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                query = {name: values[0] for name, values in parse_qs(url.query).items()}
+                if url.path == VALIDATION_PATH:
+                    self.send(*gateway.validation(query.get('val_id', '')))
+                elif url.path == TRANSACTION_QUERY_PATH:
+                    self.send(*gateway.transaction_query(query.get('tran_id', '')))
+                elif url.path.startswith(PAY_PATH):
+                    callback = gateway.pay(url.path[len(PAY_PATH):])
+                    if callback is None:
+                        self.send(404, {'status': 'FAILED', 'failedreason': 'Unknown or expired session'})
+                    else:
+                        self.send_page(*callback)
+                else:
+                    self.send(404, {'status': 'FAILED', 'failedreason': 'Not found'})
+
+            def send(self, status, payload, content_type='application/json'):
+                data = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def send_page(self, action, fields):
+                # A browser posts this straight back to the shop, like the real payment page
+                inputs = ''.join(f'<input type="hidden" name="{html.escape(name)}" value="{html.escape(str(value))}">'
+                                 for name, value in fields.items())
+                self.send(200, f'<form method="post" action="{html.escape(action)}">{inputs}</form>'
+                               '<script>document.forms[0].submit()</script>', 'text/html')
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
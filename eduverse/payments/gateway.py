@@ -0,0 +1,184 @@
+# payments/gateway.py
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+INITIATE_PATH = '/gwprocess/v4/api.php'
+VALIDATION_PATH = '/validator/api/validationserverAPI.php'
+TRANSACTION_QUERY_PATH = '/validator/api/merchantTransIDvalidationAPI.php'
+
+# Responses that mean "try again", not "your request is wrong"
+RETRY_STATUSES = {502, 503, 504}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class GatewayError(Exception):
+    pass
+
+
+class GatewayUnavailable(GatewayError):
+    """The gateway is down or too slow; the circuit breaker may be open."""
+
+
+class CircuitBreaker:
+    """
+    Stops calling the gateway after `threshold` failures in a row, so a
+    gateway outage costs one fast error per checkout instead of a worker
+    blocked for the full timeout. After `reset_after` seconds a single
+    trial call is let through; its result closes or re-opens the breaker.
+    """
+
+    def __init__(self, threshold, reset_after):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_running or time.monotonic() - self.opened_at < self.reset_after:
+                return False
+            self.trial_running = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def end_trial(self):
+        # For calls that ended in an unexpected error: no verdict, but the next trial may go ahead
+        with self.lock:
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+
+class GatewayClient:
+    """
+    SSLCommerz client sharing one keep-alive connection pool per process,
+    so checkouts reuse TLS connections. Every call is bounded by the
+    connect/read timeouts; failed connections and 502/503/504s are retried
+    with jittered exponential backoff.
+    """
+
+    def __init__(self, base_url=None, connect_timeout=None, read_timeout=None, max_retries=None,
+                 backoff=None, pool_size=None, breaker=None):
+        self.base_url = (base_url or getattr(settings, 'SSLCOMMERZ_BASE_URL', 'https://sandbox.sslcommerz.com')).rstrip('/')
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else getattr(settings, 'GATEWAY_CONNECT_TIMEOUT', 3.05),
+            read_timeout if read_timeout is not None else getattr(settings, 'GATEWAY_READ_TIMEOUT', 15),
+        )
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'GATEWAY_MAX_RETRIES', 2)
+        self.backoff = backoff if backoff is not None else getattr(settings, 'GATEWAY_BACKOFF', 0.5)
+        self.breaker = breaker or CircuitBreaker(
+            getattr(settings, 'GATEWAY_BREAKER_THRESHOLD', 5), getattr(settings, 'GATEWAY_BREAKER_RESET', 30))
+
+        pool_size = pool_size or getattr(settings, 'GATEWAY_POOL_SIZE', 10)
+        self.session = requests.Session()
+        # Retries are done below, where the breaker can see them
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def request(self, method, path, idempotent=False, **kwargs):
+        """
+        Returns the decoded JSON body. A read timeout is only retried for
+        idempotent calls: a POST that timed out may already have been processed.
+        """
+        if not self.breaker.allow():
+            raise GatewayUnavailable("The payment gateway is temporarily unavailable.")
+        url = self.base_url + path
+        settled = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                retryable = False
+                try:
+                    response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                except (requests.ConnectionError, requests.ConnectTimeout) as exc:
+                    error, retryable = exc, True
+                except requests.ReadTimeout as exc:
+                    error, retryable = exc, idempotent
+                except requests.RequestException as exc:
+                    error = exc
+                else:
+                    if response.status_code in RETRY_STATUSES:
+                        error, retryable = f"HTTP {response.status_code}", True
+                    else:
+                        self.breaker.record_success()
+                        settled = True
+                        try:
+                            return response.json()
+                        except ValueError:
+                            raise GatewayError(f"Unexpected gateway response (HTTP {response.status_code}).")
+                if not retryable or attempt == self.max_retries:
+                    break
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+            self.breaker.record_failure()
+            settled = True
+            raise GatewayUnavailable(f"The payment gateway did not respond: {error}")
+        finally:
+            if not settled:
+                # Anything else that escaped must not leave a trial call "running" forever
+                self.breaker.end_trial()
+
+    def initiate_session(self, post_body):
+        """Creates a checkout session; returns the gateway's JSON (status, GatewayPageURL, ...)."""
+        return self.request('POST', INITIATE_PATH, data=post_body)
+
+    def validate(self, val_id):
+        """Looks up a payment the gateway redirected back with, by its val_id."""
+        return self.request('GET', VALIDATION_PATH, idempotent=True, params={
+            'val_id': val_id,
+            'store_id': settings.STORE_ID,
+            'store_passwd': settings.STORE_PASSWORD,
+            'format': 'json',
+        })
+
+    def query_transaction(self, tran_id):
+        """Every payment attempt the gateway has for one of our tran_ids, paid or not ('element' list)."""
+        return self.request('GET', TRANSACTION_QUERY_PATH, idempotent=True, params={
+            'tran_id': tran_id,
+            'store_id': settings.STORE_ID,
+            'store_passwd': settings.STORE_PASSWORD,
+            'format': 'json',
+        })
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GatewayClient()
+    return _client
+
+
+@receiver(setting_changed)
+def reset_client(setting, **kwargs):
+    # Lets tests point the shared client at a stand-in server with override_settings
+    global _client
+    if setting.startswith(('GATEWAY_', 'SSLCOMMERZ_')):
+        _client = None
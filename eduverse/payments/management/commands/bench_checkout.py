@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.benchmark import remove_customers, run_benchmark, seed_customers
+from payments.fakegateway import FakeGateway
+
+
+class Command(BaseCommand):
+    help = ("Load-tests checkout: concurrent customers go from the initiate views through a local fake "
+            "gateway to the success callback. Reports latency percentiles and enrollments per second.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=200, help="Checkouts to run (one per customer).")
+        parser.add_argument('--concurrency', type=int, default=8, help="Checkouts in flight at once.")
+        parser.add_argument('--products', type=int, default=5, help="Courses and live classes to spread them over.")
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds the fake gateway adds per call.")
+        parser.add_argument('--jitter', type=float, default=0.0)
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help="Fraction of gateway session requests answered with a 503.")
+        parser.add_argument('--decline-rate', type=float, default=0.0, help="Fraction of payments declined.")
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--keep', action='store_true',
+                            help="Leave the benchmark users, products and enrollments in the database.")
+
+    def handle(self, *args, **options):
+        if options['customers'] < 1 or options['concurrency'] < 1 or options['products'] < 1:
+            raise CommandError("--customers, --concurrency and --products must be at least 1.")
+        prefix, flows = seed_customers(options['customers'], options['products'])
+        try:
+            with FakeGateway(latency=options['latency'], jitter=options['jitter'], error_rate=options['error_rate'],
+                             decline_rate=options['decline_rate'], seed=options['seed']) as gateway:
+                report = run_benchmark(gateway, flows, options['concurrency'])
+        finally:
+            if options['keep']:
+                self.stdout.write(f"Kept the benchmark data (users named {prefix}*).")
+            else:
+                remove_customers(prefix)
+
+        outcomes = ', '.join(f"{name}: {count}" for name, count in sorted(report['outcomes'].items()))
+        self.stdout.write(f"{report['flows']} checkouts in {report['elapsed']:.2f}s ({outcomes})")
+        for step, percentiles in report['latency'].items():
+            if percentiles[50] is not None:
+                self.stdout.write(f"{step:>9}: " + "  ".join(
+                    f"p{pct} {seconds * 1000:.1f}ms" for pct, seconds in percentiles.items()))
+        for error in report['errors'][:5]:
+            self.stderr.write(error)
+        self.stdout.write(self.style.SUCCESS(f"{report['enrollments_per_second']:.1f} enrollments/s"))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payments.fakegateway import FakeGateway
+
+
+class Command(BaseCommand):
+    help = "Runs a local stand-in for SSLCommerz (session, payment page and validation APIs)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8089)
+        parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every API call.")
+        parser.add_argument('--jitter', type=float, default=0.0,
+                            help="Latency varies by up to this fraction either way (0.2 = +/-20%%).")
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help="Fraction of session requests answered with a 503.")
+        parser.add_argument('--decline-rate', type=float, default=0.0,
+                            help="Fraction of payments sent back to fail_url.")
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        gateway = FakeGateway(options['host'], options['port'], latency=options['latency'],
+                              jitter=options['jitter'], error_rate=options['error_rate'],
+                              decline_rate=options['decline_rate'], seed=options['seed'])
+        gateway.start()
+        self.stdout.write(self.style.SUCCESS(f"Fake SSLCommerz listening on {gateway.url}"))
+        self.stdout.write(f"Run the site with SSLCOMMERZ_BASE_URL={gateway.url} to use it. Ctrl-C stops it.")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            gateway.stop()
+            self.stdout.write(", ".join(f"{name}: {count}" for name, count in gateway.stats.items()))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payments.models import ReconciliationRun
+from payments.reconcile import begin_run, reconcile
+
+
+class Command(BaseCommand):
+    help = ("Checks recent and still-initiated payments against the gateway's validation APIs and records "
+            "mismatches, fulfilling payments whose success callback never arrived. Picks up an interrupted run where it stopped.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Check transactions from this many days back (default RECONCILE_WINDOW_DAYS).")
+        parser.add_argument('--workers', type=int, default=None, help="Gateway lookups in flight at once.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Transactions per checkpoint.")
+        parser.add_argument('--new', action='store_true', help="Start a new run even if the last one didn't finish.")
+
+    def handle(self, *args, **options):
+        run = begin_run(options['days'], resume=not options['new'])
+        if run.last_pk:
+            self.stdout.write(f"Resuming the run from {run.started_at:%Y-%m-%d %H:%M} after {run.checked} transactions.")
+        run = reconcile(run, workers=options['workers'], batch_size=options['batch_size'])
+        for mismatch in run.mismatches.select_related('transaction'):
+            self.stdout.write(f"{mismatch.transaction.tran_id}: {mismatch.get_kind_display()} ({mismatch.detail})")
+        summary = f"Checked {run.checked} transactions, {run.mismatch_count} mismatches."
+        if run.status == ReconciliationRun.Status.INTERRUPTED:
+            raise CommandError(f"{summary} Stopped: {run.error}. Run the command again to resume.")
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('since', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('finished', 'Finished'), ('interrupted', 'Interrupted')], default='running', max_length=12)),
+                ('last_pk', models.PositiveBigIntegerField(default=0)),
+                ('checked', models.PositiveIntegerField(default=0)),
+                ('mismatch_count', models.PositiveIntegerField(default=0)),
+                ('error', models.CharField(blank=True, max_length=255)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReconciliationMismatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('not_paid', 'Fulfilled, but not paid at the gateway'), ('unfulfilled', 'Paid at the gateway, but not fulfilled'), ('amount', 'Amount or currency differs'), ('wrong_transaction', 'val_id belongs to another transaction')], max_length=20)),
+                ('local_status', models.CharField(max_length=10)),
+                ('gateway_status', models.CharField(blank=True, max_length=30)),
+                ('detail', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mismatches', to='payments.paymenttransaction')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='mismatches', to='payments.reconciliationrun')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
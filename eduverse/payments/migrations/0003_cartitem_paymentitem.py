@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_courseprogress_completed_at'),
+        ('live', '0007_blob_storage'),
+        ('payments', '0002_reconciliationrun_reconciliationmismatch'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymenttransaction',
+            name='product_type',
+            field=models.CharField(choices=[('course', 'Course'), ('live', 'Live class'), ('cart', 'Cart')], max_length=10),
+        ),
+        migrations.CreateModel(
+            name='PaymentItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='courses.course')),
+                ('live_class', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='live.liveclass')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='payments.paymenttransaction')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('added_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='courses.course')),
+                ('live_class', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='live.liveclass')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['added_at'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'course'), name='unique_cart_course'), models.UniqueConstraint(fields=('user', 'live_class'), name='unique_cart_live_class'), models.CheckConstraint(condition=models.Q(models.Q(('course__isnull', False), ('live_class__isnull', True)), models.Q(('course__isnull', True), ('live_class__isnull', False)), _connector='OR'), name='cart_item_one_product')],
+            },
+        ),
+    ]
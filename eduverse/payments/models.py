@@ -1,3 +1,165 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+from courses.models import Course
+from live.models import LiveClass
+
+
+class InvalidTransition(Exception):
+    pass
+
+
+class PaymentTransaction(models.Model):
+    """
+    One checkout sent to SSLCommerz, created before the gateway is called.
+    tran_id is what the gateway echoes back in its callbacks.
+    """
+    class Status(models.TextChoices):
+        INITIATED = 'initiated', 'Initiated'
+        FULFILLED = 'fulfilled', 'Fulfilled'  # paid; enrollment and earning created
+        FAILED = 'failed', 'Failed'
+        CANCELLED = 'cancelled', 'Cancelled'
+
+    # A late success callback still wins over an earlier fail/cancel; fulfilled is final
+    TRANSITIONS = {
+        Status.INITIATED: {Status.FULFILLED, Status.FAILED, Status.CANCELLED},
+        Status.FAILED: {Status.FULFILLED},
+        Status.CANCELLED: {Status.FULFILLED},
+        Status.FULFILLED: set(),
+    }
+
+    class Product(models.TextChoices):
+        COURSE = 'course', 'Course'
+        LIVE = 'live', 'Live class'
+        CART = 'cart', 'Cart'  # several products, listed in PaymentItem
+
+    tran_id = models.CharField(max_length=64, unique=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='payment_transactions')
+    product_type = models.CharField(max_length=10, choices=Product.choices)
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True)
+    live_class = models.ForeignKey(LiveClass, on_delete=models.SET_NULL, null=True, blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    currency = models.CharField(max_length=3, default='BDT')
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.INITIATED, db_index=True)
+    val_id = models.CharField(max_length=64, blank=True)  # the gateway's id for the payment, from the callback
+    failure_reason = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.tran_id} ({self.status})"
+
+    @property
+    def product(self):
+        if self.product_type == self.Product.CART:
+            return None
+        return self.course if self.product_type == self.Product.COURSE else self.live_class
+
+    def can_move_to(self, status):
+        return status in self.TRANSITIONS[self.status]
+
+    def move_to(self, status, **fields):
+        """Changes the status in memory; the caller saves, under the row lock."""
+        if not self.can_move_to(status):
+            raise InvalidTransition(f"{self.tran_id}: {self.status} -> {status}")
+        self.status = status
+        self.processed_at = timezone.now()
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+
+class PaymentItem(models.Model):
+    """One course or live class paid for by a cart transaction, at the price it was sold for."""
+    transaction = models.ForeignKey(PaymentTransaction, on_delete=models.CASCADE, related_name='items')
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True)
+    live_class = models.ForeignKey(LiveClass, on_delete=models.SET_NULL, null=True, blank=True)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+
+    def __str__(self):
+        return f"{self.transaction.tran_id}: {self.product}"
+
+    @property
+    def product(self):
+        return self.course or self.live_class
+
+
+class CartItem(models.Model):
+    """A course or live class a user means to buy; the whole cart is paid in one checkout."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cart_items')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True)
+    live_class = models.ForeignKey(LiveClass, on_delete=models.CASCADE, null=True, blank=True)
+    added_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['added_at']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'course'], name='unique_cart_course'),
+            models.UniqueConstraint(fields=['user', 'live_class'], name='unique_cart_live_class'),
+            models.CheckConstraint(
+                condition=models.Q(course__isnull=False, live_class__isnull=True)
+                | models.Q(course__isnull=True, live_class__isnull=False),
+                name='cart_item_one_product',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.product}"
+
+    @property
+    def product(self):
+        return self.course or self.live_class
+
+
+class ReconciliationRun(models.Model):
+    """
+    One pass of `manage.py reconcile_payments`. The transactions it covers
+    are fixed when it starts (see payments/reconcile.py), and last_pk is the
+    checkpoint an interrupted run resumes from.
+    """
+    class Status(models.TextChoices):
+        RUNNING = 'running', 'Running'
+        FINISHED = 'finished', 'Finished'
+        INTERRUPTED = 'interrupted', 'Interrupted'
+
+    started_at = models.DateTimeField(default=timezone.now)
+    since = models.DateTimeField()  # transactions created from here on, plus every one still initiated
+    finished_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=12, choices=Status.choices, default=Status.RUNNING)
+    last_pk = models.PositiveBigIntegerField(default=0)
+    checked = models.PositiveIntegerField(default=0)
+    mismatch_count = models.PositiveIntegerField(default=0)
+    error = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Reconciliation {self.started_at:%Y-%m-%d %H:%M} ({self.status})"
+
+
+class ReconciliationMismatch(models.Model):
+    """A transaction whose local state disagrees with what the gateway reports."""
+    class Kind(models.TextChoices):
+        NOT_PAID = 'not_paid', 'Fulfilled, but not paid at the gateway'
+        UNFULFILLED = 'unfulfilled', 'Paid at the gateway, but not fulfilled'
+        AMOUNT = 'amount', 'Amount or currency differs'
+        WRONG_TRANSACTION = 'wrong_transaction', 'val_id belongs to another transaction'
+
+    run = models.ForeignKey(ReconciliationRun, on_delete=models.CASCADE, related_name='mismatches')
+    transaction = models.ForeignKey(PaymentTransaction, on_delete=models.CASCADE, related_name='mismatches')
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    local_status = models.CharField(max_length=10)
+    gateway_status = models.CharField(max_length=30, blank=True)
+    detail = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.transaction.tran_id}: {self.get_kind_display()}"
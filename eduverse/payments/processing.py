@@ -0,0 +1,217 @@
+# payments/processing.py
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from courses.models import Enrollment
+from earnings.models import Earning, bulk_create_earnings
+from live.models import LiveClassEnrollment
+from metrics.models import count_bulk_enrollments
+from .gateway import get_client
+from .models import CartItem, PaymentItem, PaymentTransaction, ReconciliationMismatch
+
+INSTRUCTOR_SHARE = Decimal('0.80')  # the platform keeps the rest
+
+# Gateway statuses of a completed payment
+PAID = ('VALID', 'VALIDATED')
+
+
+def start_transaction(user, product_type, product):
+    """Records a checkout before the gateway is called, so every callback has a row to land on."""
+    is_course = product_type == PaymentTransaction.Product.COURSE
+    return PaymentTransaction.objects.create(
+        tran_id=f"{product_type}_{user.id}_{product.pk}_{uuid.uuid4().hex[:12]}",
+        user=user,
+        product_type=product_type,
+        course=product if is_course else None,
+        live_class=None if is_course else product,
+        amount=product.price,
+    )
+
+
+def start_cart_transaction(user, items):
+    """One transaction for a whole cart (CartItems), with a PaymentItem per product at today's price."""
+    items = [item for item in items if item.product is not None]
+    txn = PaymentTransaction.objects.create(
+        tran_id=f"{PaymentTransaction.Product.CART}_{user.id}_{len(items)}_{uuid.uuid4().hex[:12]}",
+        user=user,
+        product_type=PaymentTransaction.Product.CART,
+        amount=sum((item.product.price for item in items), Decimal(0)),
+    )
+    PaymentItem.objects.bulk_create([
+        PaymentItem(transaction=txn, course=item.course, live_class=item.live_class, amount=item.product.price)
+        for item in items
+    ])
+    return txn
+
+
+def payment_split(amount):
+    """amount_paid/instructor_share/platform_fee of an enrollment sold for `amount`."""
+    instructor_share = (amount * INSTRUCTOR_SHARE).quantize(Decimal('0.01'))
+    return {'amount_paid': amount, 'instructor_share': instructor_share, 'platform_fee': amount - instructor_share}
+
+
+def owned_products(user_id, items):
+    """(course ids, live class ids) among the items the user is already enrolled in."""
+    owned_courses = set(Enrollment.objects.filter(
+        user_id=user_id, course__in=[item.course_id for item in items if item.course_id],
+    ).values_list('course_id', flat=True))
+    owned_classes = set(LiveClassEnrollment.objects.filter(
+        user_id=user_id, live_class__in=[item.live_class_id for item in items if item.live_class_id],
+    ).values_list('live_class_id', flat=True))
+    return owned_courses, owned_classes
+
+
+def enroll_items(txn):
+    """
+    Enrolls a cart transaction's buyer in everything it paid for, with bulk
+    inserts: the enrollments, then every instructor's earnings. Products the
+    user already has (or that were deleted) are skipped. Returns False if
+    nothing in the cart could be delivered.
+    """
+    items = [item for item in txn.items.select_related('course', 'live_class')
+             if item.product is not None]
+    if not items:
+        return False
+    # Only the cart's row is locked, so a product can still be bought on its
+    # own between reading what the user owns and inserting. Every conflict
+    # adds an owned product, so this ends after at most one retry per item.
+    for attempt in range(len(items) + 1):
+        owned_courses, owned_classes = owned_products(txn.user_id, items)
+        sold = []  # (enrollment, product)
+        for item in items:
+            if item.course_id and item.course_id not in owned_courses:
+                sold.append((Enrollment(user_id=txn.user_id, course=item.course, **payment_split(item.amount)),
+                             item.course))
+            elif item.live_class_id and item.live_class_id not in owned_classes:
+                sold.append((LiveClassEnrollment(user_id=txn.user_id, live_class=item.live_class,
+                                                 **payment_split(item.amount)), item.live_class))
+        enrollments = [enrollment for enrollment, _ in sold]
+        try:
+            with transaction.atomic():
+                # bulk_create() sets the pks the earnings point at
+                Enrollment.objects.bulk_create([e for e in enrollments if isinstance(e, Enrollment)])
+                LiveClassEnrollment.objects.bulk_create(
+                    [e for e in enrollments if isinstance(e, LiveClassEnrollment)])
+            break
+        except IntegrityError:
+            if attempt == len(items):
+                raise
+    # bulk_create() skips signals, so the metrics, balances and rollups are
+    # brought up to date in bulk as well
+    count_bulk_enrollments(txn.user_id, enrollments)
+    bulk_create_earnings([
+        Earning(teacher_id=product.instructor_id, amount=enrollment.instructor_share, source_enrollment=enrollment)
+        for enrollment, product in sold
+    ])
+    CartItem.objects.filter(user_id=txn.user_id).filter(
+        Q(course__in=[item.course_id for item in items if item.course_id])
+        | Q(live_class__in=[item.live_class_id for item in items if item.live_class_id])
+    ).delete()
+    return True
+
+
+def enroll(txn):
+    """Creates the enrollment and the instructor's earning. Returns False if the product is gone."""
+    if txn.product_type == PaymentTransaction.Product.CART:
+        return enroll_items(txn)
+    product = txn.product
+    if product is None:
+        return False
+    split = payment_split(txn.amount)
+    if txn.product_type == PaymentTransaction.Product.COURSE:
+        enrollment, created = Enrollment.objects.get_or_create(user_id=txn.user_id, course=product, defaults=split)
+    else:
+        enrollment, created = LiveClassEnrollment.objects.get_or_create(
+            user_id=txn.user_id, live_class=product, defaults=split)
+    # Already enrolled some other way (e.g. by an admin): nothing was earned from this payment
+    if created:
+        Earning.objects.create(teacher=product.instructor, amount=split['instructor_share'],
+                               source_enrollment=enrollment)
+    return True
+
+
+def fulfil(tran_id, val_id=''):
+    """
+    Delivers a paid transaction; callbacks go through confirm_payment() first.
+    Returns (transaction or None, whether this call fulfilled it).
+
+    Duplicate callbacks for a fulfilled transaction are answered from one
+    indexed read; otherwise the row is locked so concurrent callbacks for
+    the same tran_id run one after the other and only the first enrolls.
+    """
+    txn = PaymentTransaction.objects.filter(tran_id=tran_id).only('pk', 'status', 'user').first()
+    if txn is None or txn.status == PaymentTransaction.Status.FULFILLED:
+        return txn, False
+
+    with transaction.atomic():
+        txn = PaymentTransaction.objects.select_for_update().select_related('course', 'live_class').get(pk=txn.pk)
+        if not txn.can_move_to(PaymentTransaction.Status.FULFILLED):
+            return txn, False
+        if enroll(txn):
+            txn.move_to(PaymentTransaction.Status.FULFILLED, val_id=val_id)
+        elif txn.can_move_to(PaymentTransaction.Status.FAILED):
+            txn.move_to(PaymentTransaction.Status.FAILED, val_id=val_id, failure_reason="Product no longer exists.")
+        else:
+            return txn, False
+        txn.save(update_fields=['status', 'val_id', 'failure_reason', 'processed_at', 'updated_at'])
+    return txn, txn.status == PaymentTransaction.Status.FULFILLED
+
+
+def as_amount(value):
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError):
+        return None
+
+
+def payment_mismatch(txn, record):
+    """
+    Why a gateway payment record (validation API reply or transaction query
+    element) doesn't prove `txn` was paid: (mismatch kind, gateway status,
+    detail), or None if it does. `txn` is a dict with tran_id, val_id, amount and currency.
+    """
+    Kind = ReconciliationMismatch.Kind
+    status = str(record.get('status', ''))[:30]
+    if status not in PAID:
+        return Kind.NOT_PAID, status, f"val_id {txn['val_id']} is not a payment."
+    if record.get('tran_id') != txn['tran_id']:
+        return Kind.WRONG_TRANSACTION, status, f"val_id {txn['val_id']} is for {record.get('tran_id')}."
+    if as_amount(record.get('amount')) != txn['amount'] or record.get('currency') != txn['currency']:
+        return Kind.AMOUNT, status, (f"Gateway has {record.get('amount')} {record.get('currency')}, "
+                                     f"we have {txn['amount']} {txn['currency']}.")
+    return None
+
+
+def confirm_payment(tran_id, val_id):
+    """
+    Handles a success callback. Anyone can post one, so the transaction is
+    only fulfilled once the validation API says val_id is a completed payment
+    of this tran_id, for its amount and currency (for a cart, the sum of its
+    items). Returns (transaction or None, whether this call fulfilled it).
+
+    Raises GatewayError if the gateway can't be asked; the transaction then
+    stays initiated until the callback is retried or reconcile_payments runs.
+    """
+    txn = PaymentTransaction.objects.filter(tran_id=tran_id).values(
+        'pk', 'tran_id', 'val_id', 'status', 'amount', 'currency').first()
+    if txn is None or not val_id:
+        return None, False
+    if txn['status'] == PaymentTransaction.Status.FULFILLED:
+        # A retried callback: already confirmed, no need to ask the gateway again
+        if txn['val_id'] != val_id:
+            return None, False
+        return fulfil(tran_id)
+    if payment_mismatch({**txn, 'val_id': val_id}, get_client().validate(val_id)) is not None:
+        return None, False
+    return fulfil(tran_id, val_id)
+
+
+def mark_unsuccessful(tran_id, status, reason=''):
+    """Fail/cancel callbacks and gateway errors. Only moves transactions that are still initiated."""
+    return PaymentTransaction.objects.filter(
+        tran_id=tran_id, status=PaymentTransaction.Status.INITIATED,
+    ).update(status=status, failure_reason=reason[:255], processed_at=timezone.now(), updated_at=timezone.now())
@@ -0,0 +1,125 @@
+# payments/reconcile.py
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .gateway import GatewayClient, GatewayError
+from .models import PaymentTransaction, ReconciliationMismatch, ReconciliationRun
+from .processing import PAID, fulfil, payment_mismatch
+
+Status = PaymentTransaction.Status
+Kind = ReconciliationMismatch.Kind
+
+
+def begin_run(days=None, resume=True):
+    """
+    The latest run that didn't finish (resumed from its checkpoint), or a
+    new one covering transactions from the last `days` days.
+    """
+    if resume:
+        run = ReconciliationRun.objects.exclude(status=ReconciliationRun.Status.FINISHED).first()
+        if run is not None:
+            return run
+    days = days if days is not None else getattr(settings, 'RECONCILE_WINDOW_DAYS', 3)
+    now = timezone.now()
+    return ReconciliationRun.objects.create(started_at=now, since=now - timedelta(days=days))
+
+
+def candidates(run):
+    """Recent transactions and every one still initiated, created before the run began, in checkpoint order."""
+    return PaymentTransaction.objects.filter(
+        Q(created_at__gte=run.since) | Q(status=Status.INITIATED), created_at__lt=run.started_at,
+    ).order_by('pk')
+
+
+def lookup(client, txn):
+    """The gateway's record of a transaction: by val_id once fulfilled, otherwise every attempt for its tran_id."""
+    if txn['status'] == Status.FULFILLED and txn['val_id']:
+        return client.validate(txn['val_id'])
+    return client.query_transaction(txn['tran_id'])
+
+
+def compare(txn, reply):
+    """(kind, gateway status, detail) when the gateway's reply disagrees with the transaction, else None."""
+    if 'element' not in reply:
+        return payment_mismatch(txn, reply)
+    attempts = reply.get('element') or []
+    paid = [attempt for attempt in attempts if attempt.get('status') in PAID]
+    if txn['status'] != Status.FULFILLED:
+        if not paid:
+            return None
+        # Only an attempt that would have passed confirm_payment() counts as paid
+        for attempt in paid:
+            if payment_mismatch({**txn, 'val_id': attempt.get('val_id', '')}, attempt) is None:
+                return Kind.UNFULFILLED, attempt['status'], f"Paid with val_id {attempt.get('val_id', '')}."
+        return payment_mismatch({**txn, 'val_id': paid[0].get('val_id', '')}, paid[0])
+    if not paid:
+        statuses = ', '.join(attempt.get('status', '') for attempt in attempts) or 'NOT_FOUND'
+        return Kind.NOT_PAID, statuses[:30], "No paid attempt for this tran_id."
+    return payment_mismatch(txn, paid[0])
+
+
+def settle(txn, reply):
+    """
+    Fulfils a transaction the gateway says was paid but whose success
+    callback never got through. Returns the detail for its mismatch.
+    """
+    val_id = next(attempt.get('val_id', '') for attempt in reply['element']
+                  if payment_mismatch({**txn, 'val_id': attempt.get('val_id', '')}, attempt) is None)
+    settled, fulfilled_now = fulfil(txn['tran_id'], val_id)
+    if fulfilled_now:
+        return f"Paid with val_id {val_id}; fulfilled by this run."
+    status = settled.get_status_display() if settled is not None else 'gone'
+    return f"Paid with val_id {val_id}; not fulfilled ({status})."
+
+
+def reconcile(run, client=None, workers=None, batch_size=None):
+    """
+    Checks the run's transactions against the gateway, `workers` lookups at
+    a time, and records mismatches. Transactions paid at the gateway but
+    never fulfilled here are fulfilled on the way. Progress is saved after every batch; if
+    the gateway fails the run is left INTERRUPTED at its last checkpoint.
+    """
+    workers = workers or getattr(settings, 'RECONCILE_WORKERS', 8)
+    batch_size = batch_size or getattr(settings, 'RECONCILE_BATCH_SIZE', 200)
+    # Its own client, with a connection per worker and no effect on the checkout breaker
+    client = client or GatewayClient(pool_size=workers)
+    rows = candidates(run).values('pk', 'tran_id', 'val_id', 'status', 'amount', 'currency')
+    run.status = ReconciliationRun.Status.RUNNING
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = list(rows.filter(pk__gt=run.last_pk)[:batch_size])
+            if not batch:
+                break
+            try:
+                replies = list(pool.map(lambda txn: lookup(client, txn), batch))
+            except GatewayError as exc:
+                run.status = ReconciliationRun.Status.INTERRUPTED
+                run.error = str(exc)[:255]
+                run.save(update_fields=['status', 'error'])
+                return run
+            mismatches = []
+            for txn, reply in zip(batch, replies):
+                found = compare(txn, reply)
+                if found is not None:
+                    kind, gateway_status, detail = found
+                    if kind == Kind.UNFULFILLED:
+                        detail = settle(txn, reply)
+                    mismatches.append(ReconciliationMismatch(
+                        run=run, transaction_id=txn['pk'], kind=kind, local_status=txn['status'],
+                        gateway_status=gateway_status, detail=detail[:255]))
+            with transaction.atomic():
+                ReconciliationMismatch.objects.bulk_create(mismatches)
+                run.last_pk = batch[-1]['pk']
+                run.checked += len(batch)
+                run.mismatch_count += len(mismatches)
+                run.save(update_fields=['status', 'last_pk', 'checked', 'mismatch_count'])
+    run.status = ReconciliationRun.Status.FINISHED
+    run.finished_at = timezone.now()
+    run.error = ''
+    run.save(update_fields=['status', 'finished_at', 'error'])
+    return run
@@ -1,3 +1,544 @@
-from django.test import TestCase
+import io
+import json
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from courses.models import Enrollment
+from courses.tests import TemporaryMediaMixin, make_teacher, make_user, seed_courses
+from earnings.models import Earning, MonthlyEarning, TeacherBalance
+from earnings.rollups import rebuild_rollups
+from live.models import LiveClassEnrollment
+from live.tests import seed_live_classes
+from metrics.models import PlatformMetric, get_metrics
+from metrics.reconcile import reconcile_metrics
+from .benchmark import percentile, remove_customers, run_benchmark, seed_customers
+from .fakegateway import FakeGateway
+from .gateway import INITIATE_PATH, CircuitBreaker, GatewayClient, GatewayError, GatewayUnavailable
+from .models import CartItem, InvalidTransition, PaymentTransaction, ReconciliationMismatch, ReconciliationRun
+from . import processing
+from .processing import fulfil, mark_unsuccessful, start_transaction
+from .reconcile import begin_run, reconcile
+
+
+class StandInGateway:
+    """
+    A local HTTP server playing SSLCommerz. Each request takes the next
+    scripted (status, body, delay) reply; the last one repeats.
+    """
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.requests = []
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, like the real gateway
+
+            def handle_one(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length).decode()
+                gateway.requests.append((self.command, urlsplit(self.path).path, parse_qs(body), self.client_address))
+                status, payload, delay = gateway.replies.pop(0) if len(gateway.replies) > 1 else gateway.replies[0]
+                time.sleep(delay)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = handle_one
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+SESSION_CREATED = (200, {'status': 'SUCCESS', 'GatewayPageURL': 'https://pay.example/abc'}, 0)
+UNAVAILABLE = (503, {}, 0)
+
+
+class GatewayClientTests(SimpleTestCase):
+
+    def client_for(self, gateway, **options):
+        options = {'max_retries': 2, 'backoff': 0, 'read_timeout': 0.5, **options}
+        return GatewayClient(base_url=gateway.url, **options)
+
+    def test_reuses_one_connection(self):
+        with StandInGateway(SESSION_CREATED) as gateway:
+            client = self.client_for(gateway)
+            for _ in range(3):
+                self.assertEqual(client.initiate_session({'tran_id': 't1'})['status'], 'SUCCESS')
+        self.assertEqual(len({address for *_, address in gateway.requests}), 1)
+        self.assertEqual(gateway.requests[0][1:3], (INITIATE_PATH, {'tran_id': ['t1']}))
+
+    def test_retries_unavailable_responses(self):
+        with StandInGateway(UNAVAILABLE, UNAVAILABLE, SESSION_CREATED) as gateway:
+            self.assertEqual(self.client_for(gateway).initiate_session({})['status'], 'SUCCESS')
+        self.assertEqual(len(gateway.requests), 3)
+
+    def test_slow_post_is_not_retried(self):
+        with StandInGateway((200, {}, 1)) as gateway:
+            with self.assertRaises(GatewayUnavailable):
+                self.client_for(gateway, read_timeout=0.2).initiate_session({})
+        self.assertEqual(len(gateway.requests), 1)
+
+    def test_breaker_opens_after_repeated_failures(self):
+        breaker = CircuitBreaker(threshold=2, reset_after=60)
+        with StandInGateway(UNAVAILABLE) as gateway:
+            client = self.client_for(gateway, max_retries=0, breaker=breaker)
+            for _ in range(2):
+                self.assertRaises(GatewayUnavailable, client.initiate_session, {})
+            self.assertTrue(breaker.is_open)
+            self.assertRaises(GatewayUnavailable, client.initiate_session, {})
+        # The third call never reached the gateway
+        self.assertEqual(len(gateway.requests), 2)
+
+    def test_breaker_lets_one_trial_through_after_reset(self):
+        breaker = CircuitBreaker(threshold=1, reset_after=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())  # trial still running
+        breaker.record_success()
+        self.assertFalse(breaker.is_open)
+
+    def test_unexpected_error_during_trial_does_not_wedge_the_breaker(self):
+        breaker = CircuitBreaker(threshold=1, reset_after=0)
+        breaker.record_failure()
+        client = GatewayClient(base_url='http://127.0.0.1:1', breaker=breaker)
+        with mock.patch.object(client.session, 'request', side_effect=RuntimeError('bad header')):
+            with self.assertRaises(RuntimeError):
+                client.validate('v1')
+        self.assertTrue(breaker.is_open)
+        self.assertTrue(breaker.allow())  # the next trial goes ahead
+
+    def test_unreachable_gateway(self):
+        with self.assertRaises(GatewayError):
+            GatewayClient(base_url='http://127.0.0.1:1', max_retries=1, backoff=0).initiate_session({})
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid', GATEWAY_BACKOFF=0, GATEWAY_READ_TIMEOUT=1)
+class InitiatePaymentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = seed_courses(make_teacher('teacher'), 1)[0]
+        cls.student = make_user('student')
+
+    def setUp(self):
+        self.client.force_login(self.student)
+
+    def test_redirects_to_gateway_page(self):
+        with StandInGateway(SESSION_CREATED) as gateway, override_settings(SSLCOMMERZ_BASE_URL=gateway.url):
+            response = self.client.get(reverse('payments:initiate_payment', args=[self.course.pk]))
+        self.assertRedirects(response, 'https://pay.example/abc', fetch_redirect_response=False)
+        form = gateway.requests[0][2]
+        self.assertEqual(form['total_amount'], [str(self.course.price)])
+        txn = PaymentTransaction.objects.get(tran_id=form['tran_id'][0])
+        self.assertEqual((txn.user, txn.course, txn.status), (self.student, self.course, 'initiated'))
+
+    def test_gateway_down_returns_to_course(self):
+        with StandInGateway(UNAVAILABLE) as gateway, override_settings(SSLCOMMERZ_BASE_URL=gateway.url):
+            response = self.client.get(reverse('payments:initiate_payment', args=[self.course.pk]), follow=True)
+        self.assertRedirects(response, self.course.get_absolute_url())
+        self.assertContains(response, 'Could not connect to payment gateway')
+        self.assertEqual(PaymentTransaction.objects.get().status, PaymentTransaction.Status.FAILED)
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid')
+class PaymentCallbackTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.course = seed_courses(cls.teacher, 1)[0]
+        cls.course.price = 1000
+        cls.course.save(update_fields=['price'])
+        cls.student = make_user('student')
+
+    def setUp(self):
+        self.txn = start_transaction(self.student, PaymentTransaction.Product.COURSE, self.course)
+        self.gateway = FakeGateway()
+        self.gateway.start()
+        self.addCleanup(self.gateway.stop)
+        settings_override = override_settings(SSLCOMMERZ_BASE_URL=self.gateway.url, STORE_ID='store',
+                                              STORE_PASSWORD='secret', GATEWAY_BACKOFF=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def pay(self, amount=None):
+        """Pays for self.txn at the fake gateway; returns the success callback data."""
+        session = GatewayClient(base_url=self.gateway.url).initiate_session({
+            **CHECKOUT_FORM, 'tran_id': self.txn.tran_id, 'total_amount': str(amount or self.txn.amount)})
+        return self.gateway.pay(session['sessionkey'])[1]
+
+    def callback(self, name, **data):
+        return self.client.post(reverse(f'payments:payment_{name}'), {'tran_id': self.txn.tran_id, **data})
+
+    def test_duplicate_success_callbacks_enroll_once(self):
+        data = self.pay()
+        for _ in range(3):
+            self.assertContains(self.client.post(reverse('payments:payment_success'), data), 'Payment Successful')
+        enrollment = Enrollment.objects.get(user=self.student, course=self.course)
+        self.assertEqual((enrollment.instructor_share, enrollment.platform_fee), (800, 200))
+        self.assertEqual(Earning.objects.get().amount, 800)
+        self.txn.refresh_from_db()
+        self.assertEqual((self.txn.status, self.txn.val_id), ('fulfilled', data['val_id']))
+        # Retries were answered without asking the gateway again
+        self.assertEqual(self.gateway.stats['validations'], 1)
+
+    def test_handled_transaction_is_one_query(self):
+        fulfil(self.txn.tran_id)
+        with self.assertNumQueries(1):
+            self.assertEqual(fulfil(self.txn.tran_id)[1], False)
+
+    def test_late_success_beats_fail_but_not_the_reverse(self):
+        self.callback('fail')
+        self.txn.refresh_from_db()
+        self.assertEqual(self.txn.status, 'failed')
+        self.client.post(reverse('payments:payment_success'), self.pay())
+        self.callback('cancel')
+        self.txn.refresh_from_db()
+        self.assertEqual(self.txn.status, 'fulfilled')
+        with self.assertRaises(InvalidTransition):
+            self.txn.move_to(PaymentTransaction.Status.FAILED)
+
+    def test_forged_callbacks_do_not_enroll(self):
+        underpaid = self.pay(amount='1.00')
+        for forged in [
+            {},  # no status, no val_id
+            {'status': 'VALID'},
+            {'status': 'VALID', 'val_id': 'made-up'},
+            {'status': 'VALID', 'val_id': underpaid['val_id']},  # a real payment, for the wrong amount
+        ]:
+            self.assertContains(self.callback('success', **forged), 'could not confirm')
+        other = start_transaction(self.student, PaymentTransaction.Product.COURSE, self.course)
+        # A real payment of this amount, replayed against another transaction
+        data = self.pay()
+        self.client.post(reverse('payments:payment_success'), {**data, 'tran_id': other.tran_id})
+        self.assertFalse(Enrollment.objects.exists())
+        self.assertEqual(PaymentTransaction.objects.filter(status='initiated').count(), 2)
+
+    def test_unknown_or_invalid_callbacks_do_not_enroll(self):
+        response = self.client.post(reverse('payments:payment_success'),
+                                    {'tran_id': f'course_{self.student.pk}_{self.course.pk}_forged',
+                                     'status': 'VALID', 'val_id': self.pay()['val_id']})
+        self.assertContains(response, 'could not confirm')
+        self.callback('success', status='INVALID_TRANSACTION')
+        self.assertFalse(Enrollment.objects.exists())
+        self.txn.refresh_from_db()
+        self.assertEqual(self.txn.status, 'failed')
+
+    def test_gateway_down_leaves_the_transaction_open(self):
+        data = self.pay()
+        with override_settings(SSLCOMMERZ_BASE_URL='http://127.0.0.1:1', GATEWAY_MAX_RETRIES=0):
+            self.assertContains(self.client.post(reverse('payments:payment_success'), data), 'could not confirm')
+        self.txn.refresh_from_db()
+        self.assertEqual(self.txn.status, 'initiated')
+        self.client.post(reverse('payments:payment_success'), data)
+        self.assertTrue(Enrollment.objects.filter(user=self.student, course=self.course).exists())
+
+
+CHECKOUT_FORM = {
+    'store_id': 'store', 'store_passwd': 'secret', 'total_amount': '100.00', 'currency': 'BDT', 'tran_id': 't1',
+    'success_url': 'http://shop/success/', 'fail_url': 'http://shop/fail/', 'cancel_url': 'http://shop/cancel/',
+}
+
+
+@override_settings(STORE_ID='store', STORE_PASSWORD='secret')
+class FakeGatewayTests(SimpleTestCase):
+
+    def test_checkout_and_validation(self):
+        with FakeGateway() as gateway:
+            client = GatewayClient(base_url=gateway.url, backoff=0)
+            session = client.initiate_session(CHECKOUT_FORM)
+            self.assertEqual(session['status'], 'SUCCESS')
+            sessionkey = session['GatewayPageURL'].rsplit('/', 1)[1]
+            callback_url, payment = gateway.pay(sessionkey)
+            self.assertEqual(callback_url, 'http://shop/success/')
+            self.assertEqual((payment['status'], payment['tran_id'], payment['amount']), ('VALID', 't1', '100.00'))
+            self.assertIsNone(gateway.pay(sessionkey))  # sessions are single use
+            self.assertEqual(client.validate(payment['val_id'])['status'], 'VALID')
+            self.assertEqual(client.validate(payment['val_id'])['status'], 'VALIDATED')
+            self.assertEqual(client.validate('unknown')['status'], 'INVALID_TRANSACTION')
+            self.assertEqual(client.initiate_session({'tran_id': 't2'})['status'], 'FAILED')
+
+    def test_failure_injection(self):
+        with FakeGateway(error_rate=1) as gateway:
+            with self.assertRaises(GatewayUnavailable):
+                GatewayClient(base_url=gateway.url, max_retries=1, backoff=0).initiate_session(CHECKOUT_FORM)
+        self.assertEqual(gateway.stats['errors'], 2)
+        with FakeGateway(decline_rate=1) as gateway:
+            session = GatewayClient(base_url=gateway.url).initiate_session(CHECKOUT_FORM)
+            callback_url, payment = gateway.pay(session['sessionkey'])
+        self.assertEqual((callback_url, payment['status']), ('http://shop/fail/', 'FAILED'))
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual([percentile(samples, pct) for pct in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(percentile([0.3], 99), 0.3)
+        self.assertIsNone(percentile([], 50))
+
+
+# The flows run on their own threads and database connections, so nothing can be wrapped in a test
+# transaction. The in-memory test database can't queue writers the way the file database does, hence
+# one thread.
+class CheckoutBenchmarkTests(TemporaryMediaMixin, TransactionTestCase):
+
+    def test_flows_end_in_enrollments(self):
+        prefix, flows = seed_customers(customers=6, products=2)
+        with FakeGateway(decline_rate=0.5, seed=3) as gateway:
+            report = run_benchmark(gateway, flows, concurrency=1)
+        outcomes = report['outcomes']
+        self.assertEqual(report['flows'], 6)
+        self.assertEqual(outcomes.get('enrolled', 0) + outcomes.get('declined', 0), 6, report['errors'])
+        self.assertEqual(outcomes.get('enrolled', 0), gateway.stats['payments'])
+        self.assertEqual(
+            Enrollment.objects.filter(user__username__startswith=prefix).count()
+            + LiveClassEnrollment.objects.filter(user__username__startswith=prefix).count(),
+            outcomes['enrolled'],
+        )
+        self.assertIsNotNone(report['latency']['total'][95])
+
+        remove_customers(prefix)
+        self.assertFalse(PaymentTransaction.objects.exists())
+        self.assertFalse(TeacherBalance.objects.exists())
+
+
+@override_settings(STORE_ID='store', STORE_PASSWORD='secret')
+class PaymentReconciliationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.courses = seed_courses(make_teacher('teacher'), 6)
+        cls.student = make_user('student')
+
+    def setUp(self):
+        self.gateway = FakeGateway()
+        self.gateway.start()
+        self.addCleanup(self.gateway.stop)
+        self.client_ = GatewayClient(base_url=self.gateway.url, max_retries=0, backoff=0)
+
+    def checkout(self, course, amount=None, declined=False):
+        """A transaction taken through the fake gateway; returns it with the callback data."""
+        txn = start_transaction(self.student, PaymentTransaction.Product.COURSE, course)
+        self.gateway.decline_rate = 1 if declined else 0
+        session = self.client_.initiate_session(
+            {**CHECKOUT_FORM, 'tran_id': txn.tran_id, 'total_amount': str(amount or txn.amount)})
+        _, data = self.gateway.pay(session['sessionkey'])
+        return txn, data
+
+    def test_mismatches_are_recorded(self):
+        paid, data = self.checkout(self.courses[0])
+        fulfil(paid.tran_id, data['val_id'])
+        lost_callback, _ = self.checkout(self.courses[1])
+        forged = start_transaction(self.student, PaymentTransaction.Product.COURSE, self.courses[2])
+        fulfil(forged.tran_id, 'made-up-val-id')
+        declined, _ = self.checkout(self.courses[3], declined=True)
+        mark_unsuccessful(declined.tran_id, PaymentTransaction.Status.FAILED)
+        underpaid, data = self.checkout(self.courses[4], amount='1.00')
+        fulfil(underpaid.tran_id, data['val_id'])
+        old = start_transaction(self.student, PaymentTransaction.Product.COURSE, self.courses[5])
+        fulfil(old.tran_id, 'made-up-val-id')
+        PaymentTransaction.objects.filter(pk=old.pk).update(created_at=old.created_at - timedelta(days=30))
+
+        run = reconcile(begin_run(days=3), client=self.client_, workers=3, batch_size=2)
+        self.assertEqual((run.status, run.checked, run.mismatch_count), ('finished', 5, 3))
+        found = {m.transaction.tran_id: m.kind for m in run.mismatches.select_related('transaction')}
+        self.assertEqual(found, {
+            lost_callback.tran_id: ReconciliationMismatch.Kind.UNFULFILLED,
+            forged.tran_id: ReconciliationMismatch.Kind.NOT_PAID,
+            underpaid.tran_id: ReconciliationMismatch.Kind.AMOUNT,
+        })
+
+    def test_paid_transactions_are_fulfilled(self):
+        lost_callback, data = self.checkout(self.courses[0])
+        underpaid, _ = self.checkout(self.courses[1], amount='1.00')
+        run = reconcile(begin_run(days=3), client=self.client_, workers=2)
+        details = {m.transaction.tran_id: (m.kind, m.detail) for m in run.mismatches.select_related('transaction')}
+        self.assertEqual(details[lost_callback.tran_id], (
+            ReconciliationMismatch.Kind.UNFULFILLED, f"Paid with val_id {data['val_id']}; fulfilled by this run."))
+        self.assertEqual(details[underpaid.tran_id][0], ReconciliationMismatch.Kind.AMOUNT)
+        lost_callback.refresh_from_db()
+        self.assertEqual((lost_callback.status, lost_callback.val_id), ('fulfilled', data['val_id']))
+        self.assertTrue(Enrollment.objects.filter(user=self.student, course=self.courses[0]).exists())
+        # An underpayment is only reported
+        underpaid.refresh_from_db()
+        self.assertEqual(underpaid.status, 'initiated')
+        self.assertFalse(Enrollment.objects.filter(user=self.student, course=self.courses[1]).exists())
+
+        # Nothing left to settle the next time round
+        run = reconcile(begin_run(days=3, resume=False), client=self.client_, workers=2)
+        kinds = set(run.mismatches.values_list('kind', flat=True))
+        self.assertEqual(kinds, {ReconciliationMismatch.Kind.AMOUNT})
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        first, data = self.checkout(self.courses[0])
+        fulfil(first.tran_id, data['val_id'])
+        for course in self.courses[1:4]:
+            self.checkout(course)
+        dead = GatewayClient(base_url='http://127.0.0.1:1', max_retries=0)
+        run = reconcile(begin_run(days=3), client=dead, workers=2, batch_size=2)
+        self.assertEqual((run.status, run.last_pk, run.checked), ('interrupted', 0, 0))
+
+        # Pretend the first transaction was checked before the gateway went away
+        ReconciliationRun.objects.filter(pk=run.pk).update(last_pk=first.pk, checked=1)
+        lookups = self.gateway.stats['validations'] + self.gateway.stats['queries']
+        resumed = reconcile(begin_run(days=3), client=self.client_, workers=2, batch_size=2)
+        self.assertEqual(resumed.pk, run.pk)
+        self.assertEqual((resumed.status, resumed.checked, resumed.mismatch_count), ('finished', 4, 3))
+        self.assertEqual(self.gateway.stats['validations'] + self.gateway.stats['queries'] - lookups, 3)
+        self.assertEqual(begin_run(days=3).status, 'running')  # finished runs aren't resumed
+
+    def test_command(self):
+        self.checkout(self.courses[0])
+        out = io.StringIO()
+        with override_settings(SSLCOMMERZ_BASE_URL=self.gateway.url):
+            call_command('reconcile_payments', '--workers', '2', stdout=out)
+        self.assertIn('Paid at the gateway, but not fulfilled', out.getvalue())
+        self.assertIn('fulfilled by this run', out.getvalue())
+        with override_settings(SSLCOMMERZ_BASE_URL='http://127.0.0.1:1', GATEWAY_MAX_RETRIES=0):
+            with self.assertRaisesMessage(CommandError, 'Run the command again to resume'):
+                call_command('reconcile_payments', '--new', stdout=io.StringIO())
+
+
+@override_settings(SESSION_COOKIE_NAME='frontend_sessionid', STORE_ID='store', STORE_PASSWORD='secret',
+                   GATEWAY_BACKOFF=0)
+class CartCheckoutTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        cls.other_teacher = make_teacher('other')
+        cls.courses = seed_courses(cls.teacher, 3) + seed_courses(cls.other_teacher, 1)
+        cls.live_class = seed_live_classes(cls.teacher, 1)[0]
+        cls.student = make_user('student')
+
+    def setUp(self):
+        self.client.force_login(self.student)
+        self.gateway = FakeGateway()
+        self.gateway.start()
+        self.addCleanup(self.gateway.stop)
+        settings_override = override_settings(SSLCOMMERZ_BASE_URL=self.gateway.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def fill_cart(self):
+        for course in self.courses:
+            self.client.post(reverse('payments:add_to_cart', args=['course', course.pk]))
+        self.client.post(reverse('payments:add_to_cart', args=['live', self.live_class.pk]))
+
+    def checkout(self):
+        """Pays for the cart through the fake gateway; returns the callback data."""
+        response = self.client.post(reverse('payments:initiate_cart_payment'))
+        sessionkey = response['Location'].rsplit('/', 1)[1]
+        callback_url, data = self.gateway.pay(sessionkey)
+        response = self.client.post(urlsplit(callback_url).path, data)
+        self.assertTemplateUsed(response, 'payments/payment_success.html')
+        return data
+
+    def test_cart_page_hides_what_the_user_owns(self):
+        self.fill_cart()
+        self.client.post(reverse('payments:add_to_cart', args=['course', self.courses[0].pk]))  # no duplicate
+        Enrollment.objects.create(user=self.student, course=self.courses[1], amount_paid=0)
+        response = self.client.get(reverse('payments:cart'))
+        self.assertEqual(len(response.context['items']), 4)
+        self.assertEqual(response.context['total'], Decimal('352.00'))  # 100 + 102 + 100 + 50
+        self.assertEqual(self.client.post(reverse('payments:add_to_cart', args=['book', 1])).status_code, 404)
+
+    def test_one_session_and_one_callback_for_the_whole_cart(self):
+        self.fill_cart()
+        data = self.checkout()
+        self.assertEqual(self.gateway.stats['sessions'], 1)
+        self.assertEqual(data['amount'], '453.00')
+        txn = PaymentTransaction.objects.get(tran_id=data['tran_id'])
+        self.assertEqual((txn.product_type, txn.status, txn.items.count()), ('cart', 'fulfilled', 5))
+
+        self.assertEqual(Enrollment.objects.filter(user=self.student).count(), 4)
+        self.assertTrue(LiveClassEnrollment.objects.filter(user=self.student, live_class=self.live_class).exists())
+        self.assertFalse(CartItem.objects.filter(user=self.student).exists())
+        # 80% of 100 + 101 + 102 + 50 and of 100, with balances and rollups kept as the signals would
+        self.assertEqual(TeacherBalance.objects.get(teacher=self.teacher).total_earned, Decimal('282.40'))
+        self.assertEqual(TeacherBalance.objects.get(teacher=self.other_teacher).total_earned, Decimal('80.00'))
+        rollups = set(MonthlyEarning.objects.values_list('teacher', 'product_type', 'product_id', 'amount', 'sales'))
+        self.assertEqual(len(rollups), 5)
+        rebuild_rollups()
+        self.assertEqual(set(MonthlyEarning.objects.values_list('teacher', 'product_type', 'product_id', 'amount',
+                                                                'sales')), rollups)
+        self.assertEqual(get_metrics()[PlatformMetric.Key.REVENUE], Decimal('453.00'))
+        self.assertEqual(reconcile_metrics(), {})
+
+        # The gateway retrying the callback changes nothing
+        self.client.post(reverse('payments:payment_success'), data)
+        self.assertEqual(Earning.objects.count(), 5)
+
+    def test_already_owned_products_are_not_sold_twice(self):
+        self.fill_cart()
+        response = self.client.post(reverse('payments:initiate_cart_payment'))
+        # Bought separately while the cart payment was open
+        Enrollment.objects.create(user=self.student, course=self.courses[0], amount_paid=100)
+        callback_url, data = self.gateway.pay(response['Location'].rsplit('/', 1)[1])
+        self.client.post(urlsplit(callback_url).path, data)
+        self.assertEqual(Enrollment.objects.filter(user=self.student).count(), 4)
+        self.assertEqual(Earning.objects.count(), 4)
+        self.assertEqual(reconcile_metrics(), {})
+
+    def test_cart_paid_for_less_than_its_items_does_not_enroll(self):
+        self.fill_cart()
+        self.client.post(reverse('payments:initiate_cart_payment'))
+        txn = PaymentTransaction.objects.get()
+        # A second session for the same tran_id, for a fraction of the cart
+        session = GatewayClient(base_url=self.gateway.url).initiate_session({
+            **CHECKOUT_FORM, 'tran_id': txn.tran_id, 'total_amount': '100.00'})
+        _, data = self.gateway.pay(session['sessionkey'])
+        self.assertContains(self.client.post(reverse('payments:payment_success'), data), 'could not confirm')
+        self.assertFalse(Enrollment.objects.exists())
+        txn.refresh_from_db()
+        self.assertEqual((txn.status, txn.amount), ('initiated', Decimal('453.00')))
+
+    def test_product_bought_during_fulfilment_is_dropped(self):
+        self.fill_cart()
+        response = self.client.post(reverse('payments:initiate_cart_payment'))
+        callback_url, data = self.gateway.pay(response['Location'].rsplit('/', 1)[1])
+        real_owned_products = processing.owned_products
+
+        def bought_after_the_read(user_id, items):
+            # The single-course checkout commits right after the cart read what the user owns
+            if not Enrollment.objects.filter(user=self.student).exists():
+                Enrollment.objects.create(user=self.student, course=self.courses[0], amount_paid=100)
+                return set(), set()
+            return real_owned_products(user_id, items)
+
+        with mock.patch.object(processing, 'owned_products', side_effect=bought_after_the_read):
+            response = self.client.post(urlsplit(callback_url).path, data)
+        self.assertTemplateUsed(response, 'payments/payment_success.html')
+        self.assertEqual(Enrollment.objects.filter(user=self.student).count(), 4)
+        self.assertEqual(Earning.objects.count(), 4)
+        self.assertEqual(reconcile_metrics(), {})
+
+    def test_empty_cart(self):
+        response = self.client.post(reverse('payments:initiate_cart_payment'), follow=True)
+        self.assertContains(response, 'Your cart is empty')
+        self.assertFalse(PaymentTransaction.objects.exists())
 
-# Create your tests here.
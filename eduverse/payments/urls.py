@@ -8,6 +8,10 @@ urlpatterns = [
     path('checkout/<int:course_pk>/', views.checkout_page, name='checkout'),
     path('initiate/<int:course_pk>/', views.initiate_payment, name='initiate_payment'),
     path('initiate-live/<int:class_pk>/', views.initiate_live_class_payment, name='initiate_live_class_payment'),
+    path('cart/', views.cart_view, name='cart'),
+    path('cart/add/<str:product_type>/<int:pk>/', views.add_to_cart, name='add_to_cart'),
+    path('cart/remove/<int:item_pk>/', views.remove_from_cart, name='remove_from_cart'),
+    path('cart/checkout/', views.initiate_cart_payment, name='initiate_cart_payment'),
     path('success/', views.payment_success, name='payment_success'),
     path('fail/', views.payment_fail, name='payment_fail'),
     path('cancel/', views.payment_cancel, name='payment_cancel'),
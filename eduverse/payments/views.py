@@ -1,17 +1,19 @@
 # payments/views.py
+from decimal import Decimal
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.conf import settings
+from django.http import Http404
 from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
-import requests # Use the requests library directly
-import uuid
-from earnings.models import Earning
-from courses.models import Course, Enrollment
+from django.views.decorators.http import require_POST
+from courses.models import Course
 from live.models import LiveClass, LiveClassEnrollment
-from django.contrib.auth.models import User
-from decimal import Decimal
+from .gateway import GatewayError, get_client
+from .models import CartItem, PaymentTransaction
+from .processing import PAID, confirm_payment, mark_unsuccessful, start_cart_transaction, start_transaction
 @login_required
 def checkout_page(request, course_pk):
     course = get_object_or_404(Course, pk=course_pk)
@@ -19,17 +21,14 @@ def checkout_page(request, course_pk):
     return render(request, 'payments/checkout.html', {'course': course})
 
 
-@login_required
-def initiate_payment(request, course_pk):
-    course = get_object_or_404(Course, pk=course_pk)
-    api_url = "https://sandbox.sslcommerz.com/gwprocess/v4/api.php"
-
-    post_body = {
+def gateway_form(request, txn, product_name, product_category):
+    """The session request SSLCommerz needs for a transaction."""
+    return {
         'store_id': settings.STORE_ID,
         'store_passwd': settings.STORE_PASSWORD,
-        'total_amount': str(course.price),
+        'total_amount': str(txn.amount),
         'currency': "BDT",
-        'tran_id': f"course_{request.user.id}_{course.pk}_{uuid.uuid4().hex[:6]}",
+        'tran_id': txn.tran_id,
         'success_url': request.build_absolute_uri(reverse('payments:payment_success')),
         'fail_url': request.build_absolute_uri(reverse('payments:payment_fail')),
         'cancel_url': request.build_absolute_uri(reverse('payments:payment_cancel')),
@@ -37,142 +36,142 @@ def initiate_payment(request, course_pk):
         # Customer Information
         'cus_name': request.user.get_full_name() or request.user.username,
         'cus_email': request.user.email,
-
-        # 👇 ADD THIS BLOCK OF CUSTOMER DETAILS 👇
         'cus_phone': request.user.profile.phone_number or '01700000000',
         'cus_add1': request.user.profile.location or 'Dhaka',
         'cus_city': request.user.profile.location or 'Dhaka',
         'cus_country': 'Bangladesh',
 
         # Product Information
-        'product_name': course.title,
-        'product_category': 'E-Learning Course',
+        'product_name': product_name,
+        'product_category': product_category,
         'product_profile': 'general',
         'shipping_method': 'NO',
     }
 
+
+def redirect_to_gateway(request, txn, post_body, fallback):
+    """Opens the gateway session and sends the customer to it, or back to `fallback` with an error."""
     try:
-        response = requests.post(api_url, data=post_body)
-        response_json = response.json()
+        response_json = get_client().initiate_session(post_body)
         if response_json.get('status') == 'SUCCESS':
             return redirect(response_json.get('GatewayPageURL'))
         else:
-            messages.error(request, f"Gateway Error: {response_json.get('failedreason', 'Unknown error')}")
-    except Exception as e:
+            reason = response_json.get('failedreason', 'Unknown error')
+            mark_unsuccessful(txn.tran_id, PaymentTransaction.Status.FAILED, reason)
+            messages.error(request, f"Gateway Error: {reason}")
+    except GatewayError as e:
+        mark_unsuccessful(txn.tran_id, PaymentTransaction.Status.FAILED, str(e))
         messages.error(request, f"Could not connect to payment gateway. Error: {e}")
 
-    return redirect('courses:course_detail', pk=course.pk)
+    return redirect(fallback)
+
+
+@login_required
+def initiate_payment(request, course_pk):
+    course = get_object_or_404(Course, pk=course_pk)
+    txn = start_transaction(request.user, PaymentTransaction.Product.COURSE, course)
+    post_body = gateway_form(request, txn, course.title, 'E-Learning Course')
+    return redirect_to_gateway(request, txn, post_body, course.get_absolute_url())
 
 
 @login_required
 def initiate_live_class_payment(request, class_pk):
     live_class = get_object_or_404(LiveClass, pk=class_pk)
-    api_url = "https://sandbox.sslcommerz.com/gwprocess/v4/api.php"
+    txn = start_transaction(request.user, PaymentTransaction.Product.LIVE, live_class)
+    post_body = gateway_form(request, txn, live_class.title, 'Live Class')
+    return redirect_to_gateway(request, txn, post_body, live_class.get_absolute_url())
 
-    post_body = {
-        'store_id': settings.STORE_ID,
-        'store_passwd': settings.STORE_PASSWORD,
-        'total_amount': str(live_class.price),
-        'currency': "BDT",
-        'tran_id': f"live_{request.user.id}_{live_class.pk}_{uuid.uuid4().hex[:6]}",
-        'success_url': request.build_absolute_uri(reverse('payments:payment_success')),
-        'fail_url': request.build_absolute_uri(reverse('payments:payment_fail')),
-        'cancel_url': request.build_absolute_uri(reverse('payments:payment_cancel')),
 
-        # Customer Information
-        'cus_name': request.user.get_full_name() or request.user.username,
-        'cus_email': request.user.email,
+def cart_items(user):
+    """The user's cart, without anything they have since enrolled in."""
+    items = list(user.cart_items.select_related('course', 'live_class'))
+    owned_courses = set(user.user_enrollments.values_list('course_id', flat=True))
+    owned_classes = set(LiveClassEnrollment.objects.filter(user=user).values_list('live_class_id', flat=True))
+    return [item for item in items
+            if item.course_id not in owned_courses and item.live_class_id not in owned_classes]
 
-        # 👇 ADD THIS BLOCK OF CUSTOMER DETAILS 👇
-        'cus_phone': request.user.profile.phone_number or '01700000000',
-        'cus_add1': request.user.profile.location or 'Dhaka',
-        'cus_city': request.user.profile.location or 'Dhaka',
-        'cus_country': 'Bangladesh',
 
-        # Product Information
-        'product_name': live_class.title,
-        'product_category': 'Live Class',
-        'product_profile': 'general',
-        'shipping_method': 'NO',
-    }
+@login_required
+def cart_view(request):
+    items = cart_items(request.user)
+    return render(request, 'payments/cart.html', {
+        'items': items,
+        'total': sum((item.product.price for item in items), Decimal(0)),
+    })
 
-    try:
-        response = requests.post(api_url, data=post_body)
-        response_json = response.json()
-        if response_json.get('status') == 'SUCCESS':
-            return redirect(response_json.get('GatewayPageURL'))
-        else:
-            messages.error(request, f"Gateway Error: {response_json.get('failedreason', 'Unknown error')}")
-    except Exception as e:
-        messages.error(request, f"Could not connect to payment gateway. Error: {e}")
 
-    return redirect('live:live_class_detail', pk=live_class.pk)
+@login_required
+@require_POST
+def add_to_cart(request, product_type, pk):
+    if product_type == PaymentTransaction.Product.COURSE:
+        product = get_object_or_404(Course, pk=pk)
+        CartItem.objects.get_or_create(user=request.user, course=product)
+    elif product_type == PaymentTransaction.Product.LIVE:
+        product = get_object_or_404(LiveClass, pk=pk)
+        CartItem.objects.get_or_create(user=request.user, live_class=product)
+    else:
+        raise Http404
+    messages.success(request, f"{product.title} is in your cart.")
+    return redirect('payments:cart')
+
+
+@login_required
+@require_POST
+def remove_from_cart(request, item_pk):
+    CartItem.objects.filter(pk=item_pk, user=request.user).delete()
+    return redirect('payments:cart')
+
+
+@login_required
+@require_POST
+def initiate_cart_payment(request):
+    """One gateway session, and one callback, for everything in the cart."""
+    items = cart_items(request.user)
+    if not items:
+        messages.warning(request, "Your cart is empty.")
+        return redirect('payments:cart')
+    txn = start_cart_transaction(request.user, items)
+    names = ', '.join(item.product.title for item in items)
+    post_body = gateway_form(request, txn, names[:255], 'E-Learning')
+    return redirect_to_gateway(request, txn, post_body, reverse('payments:cart'))
 
 
 @csrf_exempt
 def payment_success(request):
     if request.method == 'POST':
         payment_data = request.POST
-        tran_id = payment_data.get('tran_id')
-        try:
-            parts = tran_id.split('_')
-            product_type, user_id, product_id = parts[0], parts[1], parts[2]
-            user = User.objects.get(pk=user_id)
-
-            enrollment_obj = None
-            instructor = None
-
-            if product_type == 'course':
-                course = Course.objects.get(pk=product_id)
-                instructor = course.instructor
-                enrollment, created = Enrollment.objects.get_or_create(
-                    user=user, course=course, defaults={'amount_paid': course.price}
-                )
-                if created: enrollment_obj = enrollment
-
-            elif product_type == 'live':
-                live_class = LiveClass.objects.get(pk=product_id)
-                instructor = live_class.instructor
-                enrollment, created = LiveClassEnrollment.objects.get_or_create(
-                    user=user, live_class=live_class, defaults={'amount_paid': live_class.price}
-                )
-                if created: enrollment_obj = enrollment
-
-            # If a new enrollment was created, process the earnings
-            if enrollment_obj and instructor:
-                # Calculate 80/20 split
-                instructor_share = enrollment_obj.amount_paid * Decimal('0.80')
-                platform_fee = enrollment_obj.amount_paid * Decimal('0.20')
-
-                # Update the enrollment object with the split
-                enrollment_obj.instructor_share = instructor_share
-                enrollment_obj.platform_fee = platform_fee
-                enrollment_obj.save()
-
-                # Create a record of the earning for the instructor
-                Earning.objects.create(
-                    teacher=instructor,
-                    amount=instructor_share,
-                    source_enrollment=enrollment_obj
-                )
-
+        tran_id, val_id = payment_data.get('tran_id', ''), payment_data.get('val_id', '')
+        status = payment_data.get('status', '')
+        txn = None
+        # Only what the validation API confirms counts; gateway retries and
+        # duplicate callbacks are safe, fulfil() enrolls at most once per tran_id
+        if status in PAID and val_id:
+            try:
+                txn, _ = confirm_payment(tran_id, val_id)
+            except GatewayError:
+                # Still initiated; a retried callback or reconcile_payments settles it
+                txn = None
+        elif status and status not in PAID:
+            mark_unsuccessful(tran_id, PaymentTransaction.Status.FAILED, f"Gateway status {status}")
+
+        if txn is not None and txn.status == PaymentTransaction.Status.FULFILLED:
             return render(request, 'payments/payment_success.html', {
                 'payment_data': payment_data,
-                'user': user
+                'user': txn.user
             })
-
-        except Exception as e:
-            messages.error(request, f"Error processing enrollment: {e}")
-            return render(request, 'payments/payment_fail.html')
+        messages.error(request, "We could not confirm this payment.")
 
     return render(request, 'payments/payment_fail.html')
 
 @csrf_exempt
 def payment_fail(request):
+    mark_unsuccessful(request.POST.get('tran_id', ''), PaymentTransaction.Status.FAILED,
+                      request.POST.get('error', ''))
     messages.error(request, "Your payment has failed.")
     return render(request, 'payments/payment_fail.html')
 
 @csrf_exempt
 def payment_cancel(request):
+    mark_unsuccessful(request.POST.get('tran_id', ''), PaymentTransaction.Status.CANCELLED)
     messages.warning(request, "Your payment was canceled.")
-    return render(request, 'payments/payment_fail.html')
\ No newline at end of file
+    return render(request, 'payments/payment_fail.html')
@@ -0,0 +1,172 @@
+# search/backends.py
+import re
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+# Models that take part in catalog search, and the fields we index for them.
+INDEXED_MODELS = ('courses.Course', 'live.LiveClass')
+INDEXED_FIELDS = ('title', 'description')
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def indexed_models():
+    return [apps.get_model(label) for label in INDEXED_MODELS]
+
+
+def tokenize(query):
+    """Splits a raw search string into lowercase word tokens."""
+    return TOKEN_RE.findall((query or '').lower())
+
+
+class BaseSearchBackend:
+    """
+    Interface every search backend implements.
+
+    `filter` narrows a queryset to the matching rows and keeps its ordering,
+    `rank` returns the best matches ordered by relevance.
+    """
+
+    def index(self, obj):
+        pass
+
+    def remove(self, obj):
+        pass
+
+    def rebuild(self, model, batch_size=2000):
+        # Backends without an index of their own have nothing to rebuild.
+        return 0
+
+    def filter(self, queryset, query):
+        raise NotImplementedError
+
+    def rank(self, queryset, query, limit=None):
+        raise NotImplementedError
+
+    def result_limit(self, limit):
+        return limit or getattr(settings, 'SEARCH_RESULT_LIMIT', 100)
+
+
+class DatabaseBackend(BaseSearchBackend):
+    """
+    Fallback backend that uses plain icontains lookups.
+    Needs no index, but every search scans the whole table.
+    """
+
+    def _match(self, query):
+        condition = Q()
+        for token in tokenize(query):
+            condition &= Q(title__icontains=token) | Q(description__icontains=token)
+        return condition
+
+    def filter(self, queryset, query):
+        if not tokenize(query):
+            return queryset.none()
+        return queryset.filter(self._match(query))
+
+    def rank(self, queryset, query, limit=None):
+        # Title matches are ranked above description-only matches.
+        return self.filter(queryset, query).annotate(
+            search_rank=Case(
+                When(title__icontains=query, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        ).order_by('search_rank', '-pk')[:self.result_limit(limit)]
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    Backend that keeps an SQLite FTS5 table per indexed model.
+
+    The FTS rowid is the model's primary key, so single-row updates
+    and deletes are index lookups rather than scans.
+    """
+    # Relative weight of each column in INDEXED_FIELDS when ranking with bm25.
+    weights = (10.0, 1.0)
+
+    def table_name(self, model):
+        return f"search_{model._meta.app_label}_{model._meta.model_name}_fts"
+
+    def match_expression(self, query):
+        # Each token becomes a quoted prefix term, so user input can never
+        # break the FTS5 query syntax and partial words still match.
+        return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+    def insert_sql(self, table):
+        placeholders = ', '.join(['%s'] * (len(INDEXED_FIELDS) + 1))
+        return f"INSERT INTO {table} (rowid, {', '.join(INDEXED_FIELDS)}) VALUES ({placeholders})"
+
+    def index(self, obj):
+        table = self.table_name(type(obj))
+        values = [getattr(obj, field) or '' for field in INDEXED_FIELDS]
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [obj.pk])
+            cursor.execute(self.insert_sql(table), [obj.pk, *values])
+
+    def remove(self, obj):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table_name(type(obj))} WHERE rowid = %s", [obj.pk])
+
+    def rebuild(self, model, batch_size=2000):
+        table = self.table_name(model)
+        insert_sql = self.insert_sql(table)
+        rows = model._default_manager.order_by().values_list('pk', *INDEXED_FIELDS)
+        count = 0
+        batch = []
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table}")
+            for row in rows.iterator(chunk_size=batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    cursor.executemany(insert_sql, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(insert_sql, batch)
+                count += len(batch)
+            # Merge the b-tree segments left behind by the bulk insert.
+            cursor.execute(f"INSERT INTO {table} ({table}) VALUES ('optimize')")
+        return count
+
+    def filter(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset.none()
+        table = self.table_name(queryset.model)
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {table} WHERE {table} MATCH %s", [expression])
+        )
+
+    def rank(self, queryset, query, limit=None):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset.none()
+        table = self.table_name(queryset.model)
+        weights = ', '.join(str(weight) for weight in self.weights)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {table} WHERE {table} MATCH %s "
+                f"ORDER BY bm25({table}, {weights}) LIMIT %s",
+                [expression, self.result_limit(limit)],
+            )
+            ranked_ids = [row[0] for row in cursor.fetchall()]
+        if not ranked_ids:
+            return queryset.none()
+        # Keep the bm25 order when loading the matching objects.
+        return queryset.filter(pk__in=ranked_ids).order_by(
+            Case(*[When(pk=pk, then=Value(position)) for position, pk in enumerate(ranked_ids)],
+                 output_field=IntegerField())
+        )
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    backend_path = getattr(settings, 'SEARCH_BACKEND', 'search.backends.SQLiteFTSBackend')
+    return import_string(backend_path)()
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from search.backends import get_backend, indexed_models
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index for courses and live classes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help="Number of rows written to the index per batch.")
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        for model in indexed_models():
+            count = backend.rebuild(model, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Indexed {count} {model._meta.label} rows."
+            ))
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+# One FTS5 table per indexed model; the rowid mirrors the model's primary key.
+FTS_TABLES = ('search_courses_course_fts', 'search_live_liveclass_fts')
+
+
+def create_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in FTS_TABLES:
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+            f"title, description, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+
+
+def drop_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in FTS_TABLES:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+def populate_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for label, table in (('courses.Course', FTS_TABLES[0]), ('live.LiveClass', FTS_TABLES[1])):
+        model = apps.get_model(label)
+        rows = model.objects.values_list('pk', 'title', 'description')
+        with schema_editor.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {table} (rowid, title, description) VALUES (%s, %s, %s)",
+                list(rows),
+            )
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('courses', '0003_alter_userprogress_unique_together_and_more'),
+        ('live', '0004_liveclass_category_alter_liveclass_instructor_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_tables, drop_fts_tables),
+        migrations.RunPython(populate_fts_tables, migrations.RunPython.noop),
+    ]
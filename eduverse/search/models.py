@@ -0,0 +1,27 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from courses.models import Course
+from live.models import LiveClass
+from .backends import get_backend
+from .suggest import suggestion_index
+
+# The search app has no models of its own; it keeps the full-text index
+# and the typeahead prefix index in step with the catalog models.
+
+def suggestion_kind(model):
+    return 'course' if model is Course else 'live_class'
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=LiveClass)
+def update_search_index(sender, instance, **kwargs):
+    get_backend().index(instance)
+    # The prefix index picks up new rows itself when it is first built
+    if suggestion_index.built_at is not None:
+        suggestion_index.add(suggestion_kind(sender), instance.pk, instance.title)
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=LiveClass)
+def remove_from_search_index(sender, instance, **kwargs):
+    get_backend().remove(instance)
+    suggestion_index.discard(suggestion_kind(sender), instance.pk)
@@ -0,0 +1,179 @@
+# search/suggest.py
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.urls import reverse
+
+from .backends import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Longest key we keep per entry; suggestions only ever need the start of a title.
+KEY_LENGTH = 60
+# Only the first few words of a title get their own entry, which bounds entries per title.
+MAX_WORDS_PER_TITLE = 6
+
+
+class PrefixIndex:
+    """
+    In-memory prefix index over catalog titles and categories.
+
+    Keys live in one sorted list, so a lookup is a bisect plus a short
+    forward scan. Every word of a title starts its own key, so "pyth"
+    also finds "Learn Python". The number of keys is capped by
+    SUGGEST_MAX_ENTRIES; once the cap is hit new titles are skipped
+    until the next rebuild.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._keys = []
+        self._entries = []
+        self._owned = {}
+        self._lock = threading.RLock()
+        self.built_at = None
+        self.truncated = False
+
+    def _make_keys(self, text):
+        words = tokenize(text)[:MAX_WORDS_PER_TITLE]
+        return sorted({' '.join(words[i:])[:KEY_LENGTH] for i in range(len(words))})
+
+    def _max_entries(self):
+        return self.max_entries or getattr(settings, 'SUGGEST_MAX_ENTRIES', 200_000)
+
+    def build(self, items):
+        """Replaces the whole index with `items`, an iterable of (kind, key, label)."""
+        pairs = []
+        owned = {}
+        truncated = False
+        limit = self._max_entries()
+        for kind, key, label in items:
+            keys = self._make_keys(label)
+            if len(pairs) + len(keys) > limit:
+                truncated = True
+                break
+            entry = (kind, key, label)
+            owned[(kind, key)] = keys
+            pairs.extend((k, entry) for k in keys)
+        pairs.sort(key=lambda pair: pair[0])
+        with self._lock:
+            self._keys = [pair[0] for pair in pairs]
+            self._entries = [pair[1] for pair in pairs]
+            self._owned = owned
+            self.truncated = truncated
+            self.built_at = time.monotonic()
+
+    def discard(self, kind, key):
+        with self._lock:
+            for k in self._owned.pop((kind, key), ()):
+                i = bisect_left(self._keys, k)
+                while i < len(self._keys) and self._keys[i] == k:
+                    if self._entries[i][:2] == (kind, key):
+                        del self._keys[i]
+                        del self._entries[i]
+                        break
+                    i += 1
+
+    def add(self, kind, key, label):
+        with self._lock:
+            self.discard(kind, key)
+            keys = self._make_keys(label)
+            if len(self._keys) + len(keys) > self._max_entries():
+                self.truncated = True
+                return
+            entry = (kind, key, label)
+            self._owned[(kind, key)] = keys
+            for k in keys:
+                i = bisect_left(self._keys, k)
+                self._keys.insert(i, k)
+                self._entries.insert(i, entry)
+
+    def lookup(self, query, limit=8):
+        prefix = ' '.join(tokenize(query))[:KEY_LENGTH]
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            i = bisect_left(self._keys, prefix)
+            while i < len(self._keys) and self._keys[i].startswith(prefix) and len(results) < limit:
+                entry = self._entries[i]
+                if entry[:2] not in seen:
+                    seen.add(entry[:2])
+                    results.append(entry)
+                i += 1
+        return results
+
+    def __len__(self):
+        return len(self._keys)
+
+
+suggestion_index = PrefixIndex()
+
+
+def catalog_items():
+    from courses.models import Course
+    from live.models import LiveClass
+
+    for value, label in Course.Category.choices:
+        yield 'course_category', value, str(label)
+    for value, label in LiveClass.LiveClassCategory.choices:
+        yield 'live_category', value, str(label)
+    for pk, title in Course.objects.order_by().values_list('pk', 'title').iterator(chunk_size=2000):
+        yield 'course', pk, title
+    for pk, title in LiveClass.objects.order_by().values_list('pk', 'title').iterator(chunk_size=2000):
+        yield 'live_class', pk, title
+
+
+_refresher = None
+
+
+def start_suggestion_refresher():
+    """
+    Builds the index from a daemon thread and rebuilds it every
+    SUGGEST_INDEX_TTL seconds, so changes made by other worker processes
+    are picked up without a request ever waiting on a build. Started by
+    the WSGI/ASGI entry points; saves and deletes in this process are
+    applied as they happen by the search signals.
+    """
+    global _refresher
+    if _refresher is not None or not getattr(settings, 'SUGGEST_INDEX_THREAD', True):
+        return
+    _refresher = threading.Thread(target=_refresh_forever, name='suggest-refresh', daemon=True)
+    _refresher.start()
+
+
+def _refresh_forever():
+    from django.db import close_old_connections
+
+    while True:
+        try:
+            suggestion_index.build(catalog_items())
+        except Exception:
+            # e.g. the tables don't exist yet; try again next interval
+            logger.exception("Could not build the suggestion index")
+        close_old_connections()
+        time.sleep(getattr(settings, 'SUGGEST_INDEX_TTL', 300))
+
+
+def get_suggestion_index():
+    """
+    Returns the process-wide index. Processes without the refresher
+    thread (tests, shells) build it on first use instead.
+    """
+    if suggestion_index.built_at is None and _refresher is None:
+        suggestion_index.build(catalog_items())
+    return suggestion_index
+
+
+def suggestion_url(kind, key):
+    if kind == 'course':
+        return reverse('courses:course_detail', kwargs={'pk': key})
+    if kind == 'live_class':
+        return reverse('live:live_class_detail', kwargs={'pk': key})
+    if kind == 'course_category':
+        return reverse('courses:category_view', kwargs={'category_name': key})
+    return f"{reverse('live:live_class_list')}?category={key}"
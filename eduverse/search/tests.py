@@ -0,0 +1,122 @@
+import io
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from courses.models import Course
+from courses.tests import QueryBudgetMixin, make_teacher, seed_courses
+from live.models import LiveClass
+from .backends import DatabaseBackend, SQLiteFTSBackend
+from . import suggest
+from .suggest import suggestion_index
+
+
+class SearchBackendTests(TestCase):
+    backend = SQLiteFTSBackend()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.teacher = make_teacher('teacher')
+        # create(), not bulk_create(): the post_save signal indexes them
+        cls.cooking = Course.objects.create(instructor=cls.teacher, title='Cooking for coders', price=10,
+                                            description='Recipes written in Python, served hot.')
+        cls.beginners = Course.objects.create(instructor=cls.teacher, title='Python for beginners', price=10,
+                                              description='Variables, loops and functions.')
+        cls.advanced = Course.objects.create(instructor=cls.teacher, title='Advanced Python', price=10,
+                                             description='Python internals: the Python data model.')
+        cls.live_class = LiveClass.objects.create(instructor=cls.teacher, title='Python office hours', price=5,
+                                                  description='Bring your questions.',
+                                                  start_time=timezone.now() + timedelta(days=1))
+
+    def titles(self, queryset):
+        return [obj.title for obj in queryset]
+
+    def test_rank_puts_title_matches_first(self):
+        ranked = self.titles(self.backend.rank(Course.objects.all(), 'python'))
+        self.assertEqual(set(ranked[:2]), {'Advanced Python', 'Python for beginners'})
+        self.assertEqual(ranked[2], 'Cooking for coders')
+        self.assertEqual(self.titles(self.backend.rank(Course.objects.all(), 'python', limit=1)), ranked[:1])
+
+    def test_filter_matches_every_token_as_a_prefix(self):
+        self.assertEqual(self.titles(self.backend.filter(Course.objects.all(), 'pyth begin')), ['Python for beginners'])
+        self.assertEqual(self.titles(self.backend.filter(LiveClass.objects.all(), 'office')), ['Python office hours'])
+        # FTS5 syntax in the query is just text
+        self.assertEqual(self.titles(self.backend.filter(Course.objects.all(), 'coders" OR "nothing')), [])
+        self.assertFalse(self.backend.filter(Course.objects.all(), '*?!').exists())
+        self.assertFalse(self.backend.rank(Course.objects.all(), '').exists())
+
+    def test_index_follows_saves_and_deletes(self):
+        self.beginners.title = 'Rust for beginners'
+        self.beginners.save()
+        self.assertEqual(self.titles(self.backend.filter(Course.objects.all(), 'rust')), ['Rust for beginners'])
+        self.assertNotIn(self.beginners.pk, self.backend.filter(Course.objects.all(), 'python')
+                         .values_list('pk', flat=True))
+        self.advanced.delete()
+        self.live_class.delete()
+        self.assertEqual(self.titles(self.backend.filter(Course.objects.all(), 'python')), ['Cooking for coders'])
+        self.assertFalse(self.backend.filter(LiveClass.objects.all(), 'python').exists())
+
+    def test_rebuild_search_index_indexes_bulk_created_rows(self):
+        seed_courses(self.teacher, 3)  # bulk_create: no signals, so not in the index yet
+        self.assertFalse(self.backend.filter(Course.objects.all(), 'description').exists())
+        out = io.StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 6 courses.Course rows.', out.getvalue())
+        self.assertIn('Indexed 1 live.LiveClass rows.', out.getvalue())
+        self.assertEqual(self.backend.filter(Course.objects.all(), 'description').count(), 3)
+        self.assertEqual(self.backend.filter(Course.objects.all(), 'python').count(), 3)
+
+    def test_database_backend_fallback(self):
+        backend = DatabaseBackend()
+        # Every word has to appear, in either field
+        self.assertEqual(self.titles(backend.filter(Course.objects.order_by('pk'), 'PYTHON for')),
+                         ['Cooking for coders', 'Python for beginners'])
+        ranked = self.titles(backend.rank(Course.objects.all(), 'python'))
+        self.assertEqual(ranked, ['Advanced Python', 'Python for beginners', 'Cooking for coders'])
+        self.assertFalse(backend.filter(Course.objects.all(), '  ').exists())
+        self.assertEqual(backend.rebuild(Course), 0)
+
+
+class SuggestViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_courses(make_teacher('teacher'), 500)
+
+    def setUp(self):
+        suggestion_index.built_at = None
+
+    def test_suggest_builds_index_once(self):
+        self.assertWithinBudget(reverse('search:suggest') + '?q=cour', max_queries=2)
+        response = self.assertWithinBudget(reverse('search:suggest') + '?q=course 1', max_queries=0, max_seconds=0.05)
+        self.assertEqual(len(response.json()['suggestions']), 8)
+
+    def test_suggest_follows_catalog_changes(self):
+        self.client.get(reverse('search:suggest') + '?q=x')
+        course = Course.objects.create(instructor=Course.objects.first().instructor, title='Quantum basics',
+                                       description='Physics', price=10)
+        response = self.client.get(reverse('search:suggest') + '?q=quan')
+        self.assertEqual([item['label'] for item in response.json()['suggestions']], ['Quantum basics'])
+        course.delete()
+        response = self.client.get(reverse('search:suggest') + '?q=quan')
+        self.assertEqual(response.json()['suggestions'], [])
+
+    def test_refresher_builds_the_index_off_the_request_path(self):
+        with mock.patch.object(suggest, '_refresher', None), mock.patch.object(suggest.threading, 'Thread') as thread:
+            suggest.start_suggestion_refresher()
+            thread.assert_called_once_with(target=suggest._refresh_forever, name='suggest-refresh', daemon=True)
+            thread.return_value.start.assert_called_once_with()
+            # Until the thread's first build is done requests get no suggestions, rather than waiting
+            response = self.assertWithinBudget(reverse('search:suggest') + '?q=cour', max_queries=0)
+            self.assertEqual(response.json()['suggestions'], [])
+
+        # One round of the thread's loop
+        with mock.patch.object(suggest.time, 'sleep', side_effect=SystemExit), self.assertRaises(SystemExit):
+            suggest._refresh_forever()
+        self.assertIsNotNone(suggestion_index.built_at)
+        response = self.assertWithinBudget(reverse('search:suggest') + '?q=course 1', max_queries=0)
+        self.assertEqual(len(response.json()['suggestions']), 8)
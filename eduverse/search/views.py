@@ -0,0 +1,26 @@
+# search/views.py
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from .suggest import get_suggestion_index, suggestion_url
+
+KIND_LABELS = {
+    'course': 'Course',
+    'live_class': 'Live class',
+    'course_category': 'Course category',
+    'live_category': 'Live class category',
+}
+
+
+@require_GET
+def suggest_view(request):
+    """
+    Typeahead endpoint for the search boxes: ?q=pyth returns matching
+    course and live class titles and categories from the in-memory index.
+    """
+    query = request.GET.get('q', '')
+    matches = get_suggestion_index().lookup(query, limit=8)
+    suggestions = [
+        {'label': label, 'type': kind, 'type_label': KIND_LABELS[kind], 'url': suggestion_url(kind, key)}
+        for kind, key, label in matches
+    ]
+    return JsonResponse({'query': query, 'suggestions': suggestions})
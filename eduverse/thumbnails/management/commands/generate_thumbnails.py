@@ -0,0 +1,28 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from thumbnails.variants import IMAGE_FIELDS, ensure_variants, generate_variants
+
+
+class Command(BaseCommand):
+    help = "Creates the resized WebP/JPEG variants of course, live class and profile images that don't have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Regenerate variants that already exist (e.g. after changing THUMBNAIL_WIDTHS).")
+
+    def handle(self, *args, **options):
+        for label, field_name in IMAGE_FIELDS:
+            model = apps.get_model(label)
+            # Many rows share one file (e.g. the default profile picture), so work per distinct name
+            names = model._default_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True}) \
+                .order_by().values_list(field_name, flat=True).distinct()
+            field = model._meta.get_field(field_name)
+            created = 0
+            for name in names.iterator():
+                field_file = field.attr_class(None, field, name)
+                if options['force'] and field_file.storage.exists(name):
+                    generate_variants(name, field_file.storage)
+                    created += 1
+                elif ensure_variants(field_file):
+                    created += 1
+            self.stdout.write(self.style.SUCCESS(f"Generated variants for {created} {label}.{field_name} images."))
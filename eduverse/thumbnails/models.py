@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
+from django.dispatch import receiver
+from accounts.models import Profile
+from courses.models import Course
+from live.models import LiveClass
+from .variants import discard_variants, ensure_variants
+
+# The thumbnails app has no models of its own; it renders the resized
+# variants of course, live class and profile images when they are saved,
+# and drops the old ones when an image is replaced.
+
+IMAGE_FIELD = {Course: 'thumbnail', LiveClass: 'thumbnail', Profile: 'image'}
+
+
+def image_name(instance):
+    """The instance's image name, or None if the field is deferred (post_init never costs a query)."""
+    field = IMAGE_FIELD[type(instance)]
+    if field not in instance.__dict__:
+        return None
+    value = instance.__dict__[field]
+    return getattr(value, 'name', value) or ''
+
+
+@receiver(post_init, sender=Course)
+@receiver(post_init, sender=LiveClass)
+@receiver(post_init, sender=Profile)
+def remember_image_name(sender, instance, **kwargs):
+    instance._image_name = image_name(instance)
+
+
+def replace_variants(instance, created):
+    # Profiles are saved on every login: nothing to do unless the image itself changed
+    name = image_name(instance)
+    previous = '' if created else instance._image_name
+    if name is None or name == previous:
+        return
+    instance._image_name = name
+    field_file = getattr(instance, IMAGE_FIELD[type(instance)])
+    # After commit, so a rolled back upload never leaves variants behind
+    transaction.on_commit(lambda: ensure_variants(field_file))
+    if previous:
+        transaction.on_commit(lambda: discard_variants(previous))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=LiveClass)
+@receiver(post_save, sender=Profile)
+def make_image_variants(sender, instance, created, **kwargs):
+    replace_variants(instance, created)
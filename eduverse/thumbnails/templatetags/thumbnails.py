@@ -0,0 +1,39 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+from ..variants import FORMATS, has_variants, variant_name, variant_storage, widths
+
+register = template.Library()
+
+# Bootstrap card grids: 3-4 columns on desktop, 2 on tablets, 1 on phones
+DEFAULT_SIZES = '(min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw'
+
+
+def srcset(field_file, extension):
+    return ', '.join(
+        f'{variant_storage.url(variant_name(field_file.name, width, extension))} {width}w' for width in sorted(widths())
+    )
+
+
+@register.simple_tag
+def responsive_image(field_file, alt='', css_class='', sizes=DEFAULT_SIZES, **attrs):
+    """
+    {% responsive_image course.thumbnail alt=course.title css_class="card-img-top" %}
+
+    Renders a <picture> with WebP and JPEG srcsets of the resized variants,
+    so the browser downloads the smallest one that fills the slot. Images
+    without variants (yet) are rendered as a plain <img> of the original.
+    """
+    if not field_file:
+        return ''
+    extra = format_html_join('', ' {}="{}"', attrs.items())
+    if not has_variants(field_file.name):
+        return format_html('<img src="{}" class="{}" alt="{}"{}>', field_file.url, css_class, alt, extra)
+
+    (webp, _, webp_type), (jpeg, _, _) = FORMATS
+    fallback = variant_name(field_file.name, sorted(widths())[len(widths()) // 2], jpeg)
+    return format_html(
+        '<picture><source type="{}" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy" decoding="async"{}></picture>',
+        webp_type, srcset(field_file, webp), sizes,
+        variant_storage.url(fallback), srcset(field_file, jpeg), sizes, css_class, alt, extra,
+    )
@@ -0,0 +1,112 @@
+import os
+import tempfile
+from io import BytesIO
+
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from courses.models import Course
+from courses.tests import make_teacher
+from .variants import generate_variants, has_variants, variant_name, widths
+
+
+def png_upload(name='cover.png', size=(1920, 1080), mode='RGBA'):
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(THUMBNAIL_WIDTHS=(320, 640))
+class ThumbnailVariantTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.TemporaryDirectory()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root.name)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.media_root.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.teacher = make_teacher('teacher')
+
+    def create_course(self, upload):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Course.objects.create(instructor=self.teacher, title='Design', description='...', price=10,
+                                         thumbnail=upload)
+
+    def test_upload_creates_resized_webp_and_jpeg(self):
+        course = self.create_course(png_upload())
+        name = course.thumbnail.name
+        self.assertTrue(has_variants(name))
+        for width in (320, 640):
+            for extension, image_format in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+                with default_storage.open(variant_name(name, width, extension)) as f:
+                    image = Image.open(f)
+                    self.assertEqual((image.format, image.width), (image_format, width))
+        # Much smaller than the original
+        self.assertLess(default_storage.size(variant_name(name, 320, 'jpg')), default_storage.size(name))
+
+    def test_small_images_are_not_upscaled(self):
+        course = self.create_course(png_upload('icon.png', size=(200, 100), mode='RGB'))
+        with default_storage.open(variant_name(course.thumbnail.name, 640, 'webp')) as f:
+            self.assertEqual(Image.open(f).size, (200, 100))
+
+    def test_tag_renders_srcset(self):
+        course = self.create_course(png_upload())
+        html = Template('{% load thumbnails %}{% responsive_image course.thumbnail alt=course.title css_class="card-img-top" %}') \
+            .render(Context({'course': course}))
+        root = os.path.splitext(course.thumbnail.url)[0]
+        self.assertIn(f'<source type="image/webp" srcset="{root}.320w.webp 320w, {root}.640w.webp 640w"', html)
+        self.assertIn(f'srcset="{root}.320w.jpg 320w, {root}.640w.jpg 640w"', html)
+        self.assertIn('class="card-img-top" alt="Design" loading="lazy"', html)
+
+    def test_tag_falls_back_to_original_without_variants(self):
+        course = Course(instructor=self.teacher, title='Raw', price=10)
+        course.thumbnail.name = default_storage.save('course_thumbnails/raw.png', png_upload())
+        html = Template('{% load thumbnails %}{% responsive_image course.thumbnail alt="Raw" %}').render(Context({'course': course}))
+        self.assertEqual(html, f'<img src="{course.thumbnail.url}" class="" alt="Raw">')
+        generate_variants(course.thumbnail.name)
+        self.assertIn('<picture>', Template('{% load thumbnails %}{% responsive_image t %}').render(Context({'t': course.thumbnail})))
+
+    def test_replacing_an_image_deletes_its_variants(self):
+        course = self.create_course(png_upload())
+        old_name = course.thumbnail.name
+        # Another course showing the same (content-addressed) picture keeps the shared variants
+        other = self.create_course(png_upload())
+        self.assertEqual(other.thumbnail.name, old_name)
+        with self.captureOnCommitCallbacks(execute=True):
+            other.thumbnail = png_upload('new.png', size=(800, 600), mode='RGB')
+            other.save()
+        self.assertTrue(has_variants(old_name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            course.thumbnail = png_upload('new.png', size=(800, 600), mode='RGB')
+            course.save()
+        self.assertTrue(has_variants(course.thumbnail.name))
+        for width in widths():
+            for extension in ('webp', 'jpg'):
+                self.assertFalse(default_storage.exists(variant_name(old_name, width, extension)))
+
+        # Saving without touching the image keeps its variants, and costs no extra work
+        for reloaded in (course, Course.objects.get(pk=course.pk)):
+            with self.captureOnCommitCallbacks() as callbacks, CaptureQueriesContext(connection) as queries:
+                reloaded.title = 'Renamed'
+                reloaded.save(update_fields=['title'])
+            self.assertEqual(callbacks, [])
+            self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('SELECT')])
+        deferred = Course.objects.only('pk', 'title').get(pk=course.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            deferred.save(update_fields=['title'])
+        self.assertEqual(callbacks, [])
+        self.assertTrue(has_variants(course.thumbnail.name))
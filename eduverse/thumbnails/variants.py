@@ -0,0 +1,110 @@
+# thumbnails/variants.py
+import os
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Image fields that get resized variants, as (app_label.Model, field name).
+IMAGE_FIELDS = (
+    ('courses.Course', 'thumbnail'),
+    ('live.LiveClass', 'thumbnail'),
+    ('accounts.Profile', 'image'),
+)
+
+# Variants have fixed names derived from the original, so they are written through the plain
+# media storage even when the original lives in the content-addressed blob store.
+variant_storage = default_storage
+
+# Output formats: (file extension, Pillow format, content type)
+FORMATS = (
+    ('webp', 'WEBP', 'image/webp'),
+    ('jpg', 'JPEG', 'image/jpeg'),
+)
+
+
+def widths():
+    return getattr(settings, 'THUMBNAIL_WIDTHS', (320, 640, 960))
+
+
+def variant_name(name, width, extension):
+    """course_thumbnails/intro.png -> course_thumbnails/intro.640w.webp, next to the original."""
+    root, _ = os.path.splitext(name)
+    return f'{root}.{width}w.{extension}'
+
+
+def has_variants(name):
+    # Variants are always written as a full set, and the largest JPEG goes last.
+    return variant_storage.exists(variant_name(name, max(widths()), FORMATS[-1][0]))
+
+
+def generate_variants(name, storage=default_storage):
+    """
+    Writes every width x format of the image stored at `name`. Variants are
+    never upscaled, so a small original just gets re-encoded copies.
+    Returns the list of names written.
+    """
+    quality = getattr(settings, 'THUMBNAIL_QUALITY', 80)
+    with storage.open(name, 'rb') as f:
+        original = Image.open(f)
+        original = ImageOps.exif_transpose(original)  # phone photos carry their rotation in EXIF
+        original.load()
+
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if 'transparency' in original.info or original.mode in ('LA', 'P') else 'RGB')
+
+    written = []
+    # Smallest first, so has_variants() only sees the set once it is complete
+    for width in sorted(widths()):
+        resized = original.copy()
+        resized.thumbnail((width, width * 10), Image.LANCZOS)
+        for extension, image_format, _ in FORMATS:
+            image = resized
+            if image_format == 'JPEG' and image.mode == 'RGBA':
+                # JPEG has no alpha channel; flatten onto white like a page background
+                background = Image.new('RGB', image.size, (255, 255, 255))
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            buffer = BytesIO()
+            image.save(buffer, image_format, quality=quality, optimize=image_format == 'JPEG')
+            target = variant_name(name, width, extension)
+            if variant_storage.exists(target):
+                variant_storage.delete(target)
+            written.append(variant_storage.save(target, ContentFile(buffer.getvalue())))
+    return written
+
+
+def delete_variants(name):
+    for width in widths():
+        for extension, _, _ in FORMATS:
+            variant_storage.delete(variant_name(name, width, extension))
+
+
+def in_use(name):
+    """Whether any image field still points at `name`; content-addressed files can be shared by many rows."""
+    return any(apps.get_model(label)._base_manager.filter(**{field: name}).exists() for label, field in IMAGE_FIELDS)
+
+
+def discard_variants(name):
+    """Deletes the variants of a replaced or cleared image, unless another row still shows it."""
+    if not name or in_use(name):
+        return False
+    delete_variants(name)
+    return True
+
+
+def ensure_variants(field_file):
+    """Generates variants for an uploaded image unless they already exist."""
+    if not field_file or not field_file.name or not field_file.storage.exists(field_file.name):
+        return False
+    if has_variants(field_file.name):
+        return False
+    try:
+        generate_variants(field_file.name, field_file.storage)
+    except OSError:
+        # Not an image Pillow can read (PIL errors are OSErrors); templates fall back to the original
+        return False
+    return True